@@ -0,0 +1,193 @@
+"""Admission control for the slow endpoints.
+
+Generation and refresh jobs are sync handlers that hold a threadpool thread for seconds to
+minutes. Each is assigned to a lane (``ADMISSION_LANES``) that runs at most ``limit`` of its
+requests at once. Up to ``queue`` more wait on the event loop, without holding a thread, for
+at most ``max_wait`` seconds. A request that finds the queue full gets 429 and one that waits
+too long gets 503, both with a ``Retry-After`` estimated from the lane's recent run times.
+
+Every other route belongs to the interactive lane and is never queued. The threadpool is
+sized so that ``INTERACTIVE_RESERVE`` threads stay free when every lane is at its limit.
+"""
+
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import anyio.to_thread
+
+from .constants import ADMISSION_LANES, INTERACTIVE_RESERVE
+
+
+# Weight of the newest run time in a lane's moving average.
+EWMA_ALPHA = 0.2
+
+
+class Lane:
+    """A concurrency limit and bounded FIFO wait queue. Only used from the event loop."""
+
+    def __init__(self, name: str, limit: int, queue: int, max_wait: float):
+        self.name = name
+        self.limit = max(int(limit), 1)
+        self.max_queue = max(int(queue), 0)
+        self.max_wait = float(max_wait)
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self.wait_ms_total = 0.0
+        self.mean_run_s = 0.0
+
+    def retry_after(self) -> int:
+        """Seconds until a request sent now could probably start."""
+        if not self.mean_run_s:
+            return 1
+        return max(math.ceil(self.mean_run_s * (len(self.waiters) + 1) / self.limit), 1)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot, waiting if needed. Returns ``None`` once admitted, else why not."""
+        started = time.perf_counter()
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+        elif len(self.waiters) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            return "queue_full"
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters.append(waiter)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+            except asyncio.TimeoutError:
+                if waiter.done():
+                    # The slot was handed over just as the wait expired
+                    self.release(0.0)
+                else:
+                    self.waiters.remove(waiter)
+                    waiter.cancel()
+                self.rejected["timeout"] += 1
+                return "timeout"
+            except BaseException:
+                # Client gone while queued: give up the place or the slot handed over
+                if waiter.done() and not waiter.cancelled():
+                    self.release(0.0)
+                elif waiter in self.waiters:
+                    self.waiters.remove(waiter)
+                raise
+        self.admitted += 1
+        self.wait_ms_total += (time.perf_counter() - started) * 1000
+        return None
+
+    def release(self, run_s: float) -> None:
+        if run_s:
+            self.mean_run_s = run_s if not self.mean_run_s else self.mean_run_s + EWMA_ALPHA * (run_s - self.mean_run_s)
+        # Hand the slot straight to the oldest waiter, so a newcomer cannot jump the queue
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "lane": self.name,
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self.waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "mean_wait_ms": round(self.wait_ms_total / self.admitted, 1) if self.admitted else 0.0,
+            "mean_run_s": round(self.mean_run_s, 2),
+        }
+
+
+_lanes: Dict[str, Lane] = {
+    name: Lane(name, spec["limit"], spec["queue"], spec["max_wait"]) for name, spec in ADMISSION_LANES.items()
+}
+_routes: Dict[str, Lane] = {route: _lanes[name] for name, spec in ADMISSION_LANES.items() for route in spec["routes"]}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that sends requests for lane routes through their lane."""
+
+    def __init__(self, app):
+        self.app = app
+        self._threadpool_sized = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if not self._threadpool_sized:
+            self._size_threadpool()
+        lane = _routes.get(f"{scope['method']} {scope['path']}")
+        if lane is None:
+            return await self.app(scope, receive, send)
+        rejected = await lane.acquire()
+        if rejected is not None:
+            return await _reject(send, lane, rejected)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(time.perf_counter() - started)
+
+    def _size_threadpool(self) -> None:
+        # Must run on the event loop: the limiter belongs to it
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        limiter.total_tokens = max(limiter.total_tokens, sum(lane.limit for lane in _lanes.values()) + INTERACTIVE_RESERVE)
+        self._threadpool_sized = True
+
+
+async def _reject(send, lane: Lane, reason: str) -> None:
+    status = 429 if reason == "queue_full" else 503
+    detail = "Too many requests are queued" if reason == "queue_full" else "Timed out waiting for capacity"
+    body = json.dumps({"detail": f"{detail}; retry later."}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(lane.retry_after()).encode()),
+        (b"x-admission-lane", lane.name.encode()),
+    ]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def admission_stats() -> List[Dict[str, object]]:
+    """Concurrency, queue depth and rejections per lane since process start."""
+    return [lane.stats() for lane in _lanes.values()]
+
+
+def render_prometheus() -> str:
+    """Lane metrics in Prometheus text exposition format."""
+    lines = [
+        "# HELP taskpilot_admission_active Requests running per admission lane.",
+        "# TYPE taskpilot_admission_active gauge",
+    ]
+    lines += [f'taskpilot_admission_active{{lane="{lane.name}"}} {lane.active}' for lane in _lanes.values()]
+    lines += [
+        "# HELP taskpilot_admission_queue_depth Requests waiting per admission lane.",
+        "# TYPE taskpilot_admission_queue_depth gauge",
+    ]
+    lines += [f'taskpilot_admission_queue_depth{{lane="{lane.name}"}} {len(lane.waiters)}' for lane in _lanes.values()]
+    lines += [
+        "# HELP taskpilot_admission_admitted_total Requests admitted per admission lane.",
+        "# TYPE taskpilot_admission_admitted_total counter",
+    ]
+    lines += [f'taskpilot_admission_admitted_total{{lane="{lane.name}"}} {lane.admitted}' for lane in _lanes.values()]
+    lines += [
+        "# HELP taskpilot_admission_rejected_total Requests turned away per admission lane and reason.",
+        "# TYPE taskpilot_admission_rejected_total counter",
+    ]
+    for lane in _lanes.values():
+        for reason, count in sorted(lane.rejected.items()):
+            lines.append(f'taskpilot_admission_rejected_total{{lane="{lane.name}",reason="{reason}"}} {count}')
+    lines += [
+        "# HELP taskpilot_admission_wait_ms_total Time admitted requests spent queued.",
+        "# TYPE taskpilot_admission_wait_ms_total counter",
+    ]
+    lines += [f'taskpilot_admission_wait_ms_total{{lane="{lane.name}"}} {lane.wait_ms_total:.1f}' for lane in _lanes.values()]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,53 @@
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, Optional
+
+# zlib only looks back 32 KiB, so a preset dictionary larger than that is wasted.
+MAX_DICTIONARY_SIZE = 32 * 1024
+MAX_NGRAM = 4
+
+_TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+def train_dictionary(samples: Iterable[str], size: int = MAX_DICTIONARY_SIZE) -> bytes:
+    """Build a zlib preset dictionary from the phrases that recur most across ``samples``.
+
+    Each recurring phrase is scored by ``occurrences * length`` (an estimate of the bytes it
+    saves). The most valuable phrases go last, because zlib encodes nearby matches more
+    cheaply.
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        tokens = _TOKEN_PATTERN.findall(sample)
+        seen = set()
+        for n in range(1, MAX_NGRAM + 1):
+            for start in range(len(tokens) - n + 1):
+                seen.add("".join(tokens[start : start + n]))
+        # Count each phrase once per sample so one long post cannot dominate the dictionary.
+        counts.update(seen)
+
+    ranked = sorted(
+        (phrase for phrase, count in counts.items() if count > 1 and len(phrase) > 3),
+        key=lambda phrase: counts[phrase] * len(phrase),
+        reverse=True,
+    )
+    chosen = []
+    used = 0
+    for phrase in ranked:
+        encoded = phrase.encode()
+        if used + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        used += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+def compress(text: str, zdict: Optional[bytes] = None) -> bytes:
+    compressor = zlib.compressobj(level=9, zdict=zdict) if zdict else zlib.compressobj(level=9)
+    return compressor.compress(text.encode()) + compressor.flush()
+
+
+def decompress(data: bytes, zdict: Optional[bytes] = None) -> str:
+    decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+    return (decompressor.decompress(data) + decompressor.flush()).decode()
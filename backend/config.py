@@ -1,11 +1,46 @@
 import configparser
+import json
+import os
+from contextlib import contextmanager
 from threading import Lock
-from typing import Dict
+from typing import Dict, Iterator, List
 
-from .constants import CONFIG_FILE, DEFAULT_CONFIG, GROQ_DEFAULT_MODEL, GROQ_DEPRECATED_MODELS
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+from .constants import CONFIG_FILE, DEFAULT_CONFIG, GROQ_DEFAULT_MODEL, GROQ_DEPRECATED_MODELS, LOCAL_MODEL_PREFIX
 from .crypto import decrypt_value, encrypt_value, get_master_key
 
 _config_lock = Lock()
+# Writers hold an flock on this file so read-modify-write cycles from different worker
+# processes cannot interleave. Readers need no lock because writes are atomic renames.
+_LOCK_FILE = CONFIG_FILE.with_name(CONFIG_FILE.name + ".lock")
+
+
+@contextmanager
+def _write_lock() -> Iterator[None]:
+    with _config_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(_LOCK_FILE, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_atomic(cfg: configparser.ConfigParser) -> None:
+    """Write the config to a temp file and rename it over the old one."""
+    temp_path = CONFIG_FILE.with_name(f".{CONFIG_FILE.name}.{os.getpid()}.tmp")
+    with temp_path.open("w") as fh:
+        cfg.write(fh)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(temp_path, CONFIG_FILE)
 
 
 def _ensure_defaults(cfg: configparser.ConfigParser) -> None:
@@ -26,20 +61,52 @@ def _ensure_defaults(cfg: configparser.ConfigParser) -> None:
     elif not model_value:
         cfg["GROQ"]["model"] = GROQ_DEFAULT_MODEL
 
+    # Local models are recognised by their prefix, so add it to a bare served-model name
+    local_model = cfg["LOCAL"].get("model", "").strip()
+    if not local_model.startswith(LOCAL_MODEL_PREFIX):
+        cfg["LOCAL"]["model"] = LOCAL_MODEL_PREFIX + local_model
+
 
 def load_config() -> configparser.ConfigParser:
     cfg = configparser.ConfigParser()
-    with _config_lock:
-        if CONFIG_FILE.exists():
-            cfg.read(CONFIG_FILE)
-        else:
-            cfg.read_dict(DEFAULT_CONFIG)
-            with CONFIG_FILE.open("w") as fh:
-                cfg.write(fh)
-        _ensure_defaults(cfg)
+    if not cfg.read(CONFIG_FILE):
+        with _write_lock():
+            # Another worker may have created it while we waited for the lock
+            if not cfg.read(CONFIG_FILE):
+                cfg.read_dict(DEFAULT_CONFIG)
+                _write_atomic(cfg)
+    _ensure_defaults(cfg)
     return cfg
 
 
+def _encrypt_key_pool(entries: List[Dict[str, object]], master_key: str) -> str:
+    pool = [
+        {"key": encrypt_value(str(entry["key"]), master_key), "weight": int(entry.get("weight") or 1), "rpm": int(entry.get("rpm") or 0)}
+        for entry in entries
+        if entry.get("key")
+    ]
+    return json.dumps(pool) if pool else ""
+
+
+def _decrypt_key_pool(value: str, master_key: str) -> str:
+    pool = []
+    for entry in json.loads(value):
+        try:
+            pool.append({**entry, "key": decrypt_value(entry["key"], master_key)})
+        except Exception:
+            # Same policy as api_key: an unreadable key is dropped rather than crashing
+            continue
+    return json.dumps(pool)
+
+
+def key_pool_entries(section: Dict[str, str]) -> List[Dict[str, object]]:
+    """The extra keys of a decrypted provider section: ``[{"key", "weight", "rpm"}, ...]``."""
+    try:
+        return json.loads(section.get("api_keys") or "[]")
+    except ValueError:
+        return []
+
+
 def get_decrypted_config() -> Dict[str, Dict[str, str]]:
     """Get config with decrypted sensitive values."""
     cfg = load_config()
@@ -54,14 +121,22 @@ def get_decrypted_config() -> Dict[str, Dict[str, str]]:
                 except Exception:
                     # If decryption fails, return empty (better than crashing)
                     result[section][key] = ""
+            elif key == "api_keys" and value:
+                try:
+                    result[section][key] = _decrypt_key_pool(value, master_key)
+                except ValueError:
+                    result[section][key] = ""
             else:
                 result[section][key] = value
     return result
 
 
 def save_config(payload: Dict[str, Dict[str, str]]) -> None:
-    cfg = load_config()
-    with _config_lock:
+    with _write_lock():
+        # Re-read under the lock so a concurrent save from another worker is not lost
+        cfg = configparser.ConfigParser()
+        if not cfg.read(CONFIG_FILE):
+            cfg.read_dict(DEFAULT_CONFIG)
         for section, values in payload.items():
             if section not in cfg:
                 cfg[section] = {}
@@ -70,11 +145,14 @@ def save_config(payload: Dict[str, Dict[str, str]]) -> None:
                 # This is a workaround for the 'str' object has no attribute 'items' error
                 continue
             for key, value in values.items():
-                if key == "api_key" and value:
+                if key == "api_keys":
+                    # None leaves the stored pool alone; a list (even empty) replaces it
+                    if value is not None:
+                        cfg[section][key] = _encrypt_key_pool(value, get_master_key())
+                elif key == "api_key" and value:
                     # Encrypt API keys
                     cfg[section][key] = encrypt_value(str(value), get_master_key())
                 else:
                     cfg[section][key] = str(value or "")
         _ensure_defaults(cfg)
-        with CONFIG_FILE.open("w") as fh:
-            cfg.write(fh)
+        _write_atomic(cfg)
@@ -1,8 +1,20 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-CONFIG_FILE = BASE_DIR / "taskpilot_config.ini"
-DB_FILE = BASE_DIR / "taskpilot.db"
+# Paths and upstream URLs can be overridden through the environment, which lets the
+# benchmark suite run the app against a scratch directory and local fake servers.
+CONFIG_FILE = Path(os.environ.get("TASKPILOT_CONFIG_FILE", BASE_DIR / "taskpilot_config.ini"))
+DB_FILE = Path(os.environ.get("TASKPILOT_DB_FILE", BASE_DIR / "taskpilot.db"))
+ARCHIVE_DB_FILE = Path(os.environ.get("TASKPILOT_ARCHIVE_DB_FILE", BASE_DIR / "taskpilot_archive.db"))
+GROQ_API_URL = os.environ.get("TASKPILOT_GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+OPENAI_API_URL = os.environ.get("TASKPILOT_OPENAI_URL", "https://api.openai.com/v1/chat/completions")
+GOOGLE_API_BASE = os.environ.get("TASKPILOT_GOOGLE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GOOGLE_TRENDS_URL = os.environ.get("TASKPILOT_TRENDS_URL", "https://trends.google.com")
+BING_NEWS_URL = os.environ.get("TASKPILOT_BING_URL", "https://www.bing.com")
+# Empty means PRAW's defaults (https://oauth.reddit.com and https://www.reddit.com)
+REDDIT_OAUTH_URL = os.environ.get("TASKPILOT_REDDIT_OAUTH_URL", "")
+REDDIT_URL = os.environ.get("TASKPILOT_REDDIT_URL", "")
 DEFAULT_USER_AGENT = "taskpilot-agent/2.0"
 REDIRECT_URI = "http://localhost:8000/"
 UA_HEADERS = {"User-Agent": "Mozilla/5.0"}
@@ -38,10 +50,39 @@ OPENAI_MODEL_CHOICES = [
     "gpt-4o",
     "gpt-4o-mini"
 ]
+# Models served by the self-hosted server in the LOCAL section are named "local/<served name>";
+# they are free to call and never count against provider spend.
+LOCAL_MODEL_PREFIX = "local/"
+# USD per million (prompt, completion) tokens, used to estimate the cost of each LLM call.
+# Models missing here are tracked without a cost.
+MODEL_PRICING = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.1-70b-versatile": (0.59, 0.79),
+    "llama-guard-3-8b": (0.20, 0.20),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-pro": (0.50, 1.50),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4": (30.00, 60.00),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
 DEFAULT_CONFIG = {
-    "GROQ": {"api_key": "", "model": GROQ_DEFAULT_MODEL},
-    "GOOGLE": {"api_key": "", "model": GOOGLE_DEFAULT_MODEL, "project_name": "", "project_number": ""},
-    "OPENAI": {"api_key": "", "model": OPENAI_DEFAULT_MODEL},
+    # api_keys: optional extra keys for the provider's key pool, as encrypted JSON
+    "GROQ": {"api_key": "", "api_keys": "", "model": GROQ_DEFAULT_MODEL},
+    "GOOGLE": {"api_key": "", "api_keys": "", "model": GOOGLE_DEFAULT_MODEL, "project_name": "", "project_number": ""},
+    "OPENAI": {"api_key": "", "api_keys": "", "model": OPENAI_DEFAULT_MODEL},
+    # An OpenAI-compatible server such as llama.cpp or vLLM, e.g. http://10.0.0.5:8080/v1;
+    # empty disables it. Prompts arriving within batch_window_ms are sent as one batch.
+    "LOCAL": {
+        "base_url": "",
+        "api_key": "",
+        "model": f"{LOCAL_MODEL_PREFIX}default",
+        "batch_window_ms": "15",
+        "max_batch": "8",
+    },
     "REDDIT": {
         "client_id": "",
         "client_secret": "",
@@ -51,11 +92,81 @@ DEFAULT_CONFIG = {
         "user_agent": DEFAULT_USER_AGENT,
     },
     "SETTINGS": {
-        "default_llm_provider": "google"
+        "default_llm_provider": "google",
+        "account_post_interval": "600",
+        "subreddit_post_interval": "300",
+        "memory_summaries_use_llm": "false",
+        # "false" sends every call to the configured model of the highest-priority provider
+        "model_routing": "true",
+        # Background drafts for trending topics, written while providers are idle
+        "pregeneration": "false",
+        "pregen_combinations": "3",
+        "pregen_daily_drafts": "60",
+        "pregen_daily_budget_usd": "0.50",
+        "pregen_draft_ttl_hours": "4",
     }
 }
+# Request tracing: a JSONL file path or an OTLP/HTTP collector URL to export traces to, and
+# the duration above which a request's span tree is logged.
+TRACE_EXPORT = os.environ.get("TASKPILOT_TRACE_EXPORT", "")
+SLOW_REQUEST_MS = float(os.environ.get("TASKPILOT_SLOW_REQUEST_MS", "3000"))
+# Where posts, conversations, messages (with their summaries and archive) and metrics live:
+# empty for the local SQLite database, or a postgresql:// URL so several instances share
+# history. Queue, trend, duplicate-detection and coordination state always stay in the local
+# SQLite file.
+STORAGE_URL = os.environ.get("TASKPILOT_STORAGE_URL", "")
+POSTGRES_POOL_SIZE = int(os.environ.get("TASKPILOT_POSTGRES_POOL_SIZE", "10"))
+# "eager" finishes every startup step before serving; "fast" serves as soon as the schema is
+# ready and warms up the rest (content store, signatures, background workers, heavy imports)
+# on a background thread. /api/health/ready reports when warm-up is done.
+STARTUP_MODE = os.environ.get("TASKPILOT_STARTUP_MODE", "eager").lower()
+# How a provider's key pool picks the key for each call: "least_loaded" (fewest in-flight and
+# recent calls per unit of weight) or "weighted" (smooth weighted round-robin).
+KEY_POOL_STRATEGY = os.environ.get("TASKPILOT_KEY_POOL_STRATEGY", "least_loaded").lower()
+# Enables the /api/admin/* profiling endpoints; requests must send it as X-Admin-Token.
+ADMIN_TOKEN = os.environ.get("TASKPILOT_ADMIN_TOKEN", "")
+# Admission lanes for slow endpoints (see backend/admission.py): per worker, at most `limit`
+# requests run at once and `queue` more wait up to `max_wait` seconds before a 429 or 503.
+# Routes not listed are interactive and never queued; INTERACTIVE_RESERVE threadpool threads
+# stay free for them.
+ADMISSION_LANES = {
+    "generation": {
+        "routes": ("POST /api/generate",),
+        "limit": int(os.environ.get("TASKPILOT_GENERATE_CONCURRENCY", "8")),
+        "queue": int(os.environ.get("TASKPILOT_GENERATE_QUEUE", "16")),
+        "max_wait": 20.0,
+    },
+    "jobs": {
+        "routes": ("POST /api/refresh", "POST /api/memory/compact", "POST /api/admin/import"),
+        "limit": 2,
+        "queue": 4,
+        "max_wait": 10.0,
+    },
+}
+INTERACTIVE_RESERVE = 16
+# Seconds the response to a request sent with an Idempotency-Key is replayed to retries.
+IDEMPOTENCY_TTL = float(os.environ.get("TASKPILOT_IDEMPOTENCY_TTL", "86400"))
+# Body length presets. The router aims each body at a model that meets latency_ms and
+# cost_usd per call and is at least min_tier: "small", "large", or "default" for the tier of
+# the provider's configured model.
 CONTENT_LENGTH_PRESETS = {
-    "Short": 3,
-    "Standard": 5,
-    "Extended": 7,
+    "Short": {"paragraphs": 3, "latency_ms": 4000, "cost_usd": 0.0005, "min_tier": "small"},
+    "Standard": {"paragraphs": 5, "latency_ms": 8000, "cost_usd": 0.001, "min_tier": "default"},
+    "Extended": {"paragraphs": 7, "latency_ms": 15000, "cost_usd": 0.005, "min_tier": "large"},
+}
+TITLE_ROUTING_TARGET = {"latency_ms": 1500, "cost_usd": 0.0001, "min_tier": "small"}
+# Models the router may choose from, by quality tier. Models missing here (such as
+# llama-guard, a classifier) are only used when configured explicitly.
+MODEL_TIERS = {
+    "llama-3.1-8b-instant": "small",
+    "llama-3.1-70b-versatile": "large",
+    "gemini-2.0-flash": "small",
+    "gemini-1.5-flash": "small",
+    "gemini-1.5-pro": "large",
+    "gemini-pro": "large",
+    "gpt-3.5-turbo": "small",
+    "gpt-4o-mini": "small",
+    "gpt-4": "large",
+    "gpt-4-turbo": "large",
+    "gpt-4o": "large",
 }
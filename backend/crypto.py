@@ -1,8 +1,9 @@
 import base64
 import os
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from functools import lru_cache
+
+# cryptography is imported inside the functions that need it, which keeps it off the
+# import path of worker boot.
 
 
 class EncryptionError(Exception):
@@ -11,6 +12,9 @@ class EncryptionError(Exception):
 
 def _get_key(password: str, salt: bytes) -> bytes:
     """Derive a key from password and salt."""
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,
@@ -24,6 +28,8 @@ def encrypt_value(value: str, master_key: str) -> str:
     """Encrypt a value using a master key."""
     if not value:
         return ""
+    from cryptography.fernet import Fernet
+
     salt = os.urandom(16)
     key = _get_key(master_key, salt)
     f = Fernet(key)
@@ -32,6 +38,9 @@ def encrypt_value(value: str, master_key: str) -> str:
     return base64.urlsafe_b64encode(salt + encrypted).decode()
 
 
+# Key derivation is deliberately slow (PBKDF2, 100k rounds) and the config is decrypted on
+# every generation, so decrypted values are memoized. Failures are not cached.
+@lru_cache(maxsize=256)
 def decrypt_value(encrypted_value: str, master_key: str) -> str:
     """Decrypt a value using a master key."""
     if not encrypted_value:
@@ -40,6 +49,8 @@ def decrypt_value(encrypted_value: str, master_key: str) -> str:
         data = base64.urlsafe_b64decode(encrypted_value.encode())
         salt = data[:16]
         encrypted = data[16:]
+        from cryptography.fernet import Fernet
+
         key = _get_key(master_key, salt)
         f = Fernet(key)
         return f.decrypt(encrypted).decode()
@@ -1,11 +1,29 @@
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import re
 import sqlite3
+import threading
+import time
+import zlib
 from contextlib import contextmanager
 from datetime import datetime
-from typing import Iterable, List, Sequence, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from .constants import DB_FILE
+from .compression import compress, decompress, train_dictionary
+from .constants import ARCHIVE_DB_FILE, DB_FILE
 
 
+LOGGER = logging.getLogger("taskpilot.database")
+# Stored in PRAGMA user_version; init_db only runs migrations when it differs. Bump it
+# whenever a schema constant, index or backfill in _migrate changes.
+SCHEMA_VERSION = 7
+# Seconds a connection waits for the write lock before raising "database is locked".
+BUSY_TIMEOUT = 30.0
+
 POST_COLUMNS: dict[str, str] = {
     "id": "INTEGER PRIMARY KEY",
     "topic": "TEXT",
@@ -22,6 +40,8 @@ POST_COLUMNS: dict[str, str] = {
     "comments": "INTEGER DEFAULT 0",
     "timestamp": "TEXT",
     "conversation_id": "TEXT",  # Link to conversation memory
+    "trend_topic_id": "INTEGER",  # Interned trend topic (see trend_topics)
+    "body_ref": "INTEGER",  # content_blobs id; ``body`` stays NULL for rows written since
 }
 
 CONVERSATION_COLUMNS: dict[str, str] = {
@@ -34,6 +54,26 @@ CONVERSATION_COLUMNS: dict[str, str] = {
     "topic_pattern": "TEXT",
 }
 
+def _metadata_column(key: str, affinity: str) -> str:
+    # Guarded with json_valid so a malformed legacy value reads as NULL instead of raising.
+    return (
+        f"{affinity} GENERATED ALWAYS AS "
+        f"(CASE WHEN json_valid(metadata) THEN json_extract(metadata, '$.{key}') END) VIRTUAL"
+    )
+
+
+# Common metadata keys, exposed as indexed virtual columns for analytics queries.
+MESSAGE_METADATA_KEYS: dict[str, str] = {
+    "topic": "TEXT",
+    "region": "TEXT",
+    "tone": "TEXT",
+    "provider": "TEXT",
+    "model": "TEXT",
+    "latency_ms": "INTEGER",
+    "prompt_tokens": "INTEGER",
+    "completion_tokens": "INTEGER",
+}
+
 MESSAGE_COLUMNS: dict[str, str] = {
     "id": "INTEGER PRIMARY KEY",
     "conversation_id": "TEXT",
@@ -41,75 +81,651 @@ MESSAGE_COLUMNS: dict[str, str] = {
     "content": "TEXT",
     "timestamp": "TEXT",
     "metadata": "TEXT",  # JSON metadata
+    "content_ref": "INTEGER",  # content_blobs id appended to the inline ``content`` prefix
+    **{f"meta_{key}": _metadata_column(key, affinity) for key, affinity in MESSAGE_METADATA_KEYS.items()},
 }
 
+# Trend snapshots are stored compactly: topic strings are interned once in
+# ``trend_topics`` and each snapshot only stores (snapshot_id, rank, topic_id).
+TREND_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS trend_topics (
+        id INTEGER PRIMARY KEY,
+        normalized TEXT NOT NULL UNIQUE,
+        label TEXT NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trend_snapshots (
+        id INTEGER PRIMARY KEY,
+        region TEXT NOT NULL,
+        source TEXT NOT NULL,
+        keyword TEXT NOT NULL DEFAULT '',
+        fetched_at TEXT NOT NULL,
+        last_fetched_at TEXT NOT NULL,
+        digest TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trend_snapshot_items (
+        snapshot_id INTEGER NOT NULL,
+        rank INTEGER NOT NULL,
+        topic_id INTEGER NOT NULL,
+        PRIMARY KEY (snapshot_id, rank)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS trend_topic_regions (
+        topic_id INTEGER NOT NULL,
+        region TEXT NOT NULL,
+        first_seen TEXT NOT NULL,
+        last_seen TEXT NOT NULL,
+        sightings INTEGER NOT NULL DEFAULT 1,
+        lifetime_seconds INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (topic_id, region)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_trend_snapshots_lookup ON trend_snapshots(region, source, keyword, fetched_at)",
+    "CREATE INDEX IF NOT EXISTS idx_trend_items_topic ON trend_snapshot_items(topic_id, snapshot_id)",
+    "CREATE INDEX IF NOT EXISTS idx_trend_regions_lifetime ON trend_topic_regions(region, lifetime_seconds)",
+)
 
-def init_db() -> None:
-    with sqlite3.connect(DB_FILE) as conn:
-        # Posts table
-        columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in POST_COLUMNS.items())
-        conn.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS posts (
-                {columns_sql}
-            )
-            """
+# SimHash signatures for near-duplicate detection, split into four 16-bit bands so
+# lookups are indexed equality probes instead of a scan over every post.
+SIGNATURE_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS post_signatures (
+        id INTEGER PRIMARY KEY,
+        post_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        simhash INTEGER NOT NULL,
+        band0 INTEGER NOT NULL,
+        band1 INTEGER NOT NULL,
+        band2 INTEGER NOT NULL,
+        band3 INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_signatures_post ON post_signatures(post_id)",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_band0 ON post_signatures(kind, band0, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_band1 ON post_signatures(kind, band1, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_band2 ON post_signatures(kind, band2, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_band3 ON post_signatures(kind, band3, created_at)",
+)
+
+# Dashboard counters maintained by triggers, so stats reads never scan the base tables.
+STATS_COUNTERS: tuple[str, ...] = ("posts_total", "posts_auto", "conversations", "messages", "messages_assistant")
+
+STATS_SCHEMA: tuple[str, ...] = (
+    "CREATE TABLE IF NOT EXISTS stats_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS stats_daily_posts (day TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS stats_personas (persona TEXT PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at)",
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_posts_insert AFTER INSERT ON posts BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'posts_total';
+        UPDATE stats_counters SET value = value + COALESCE(NEW.auto_posted, 0) WHERE name = 'posts_auto';
+        INSERT INTO stats_daily_posts (day, count) VALUES (substr(NEW.timestamp, 1, 10), 1)
+            ON CONFLICT(day) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_posts_delete AFTER DELETE ON posts BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'posts_total';
+        UPDATE stats_counters SET value = value - COALESCE(OLD.auto_posted, 0) WHERE name = 'posts_auto';
+        UPDATE stats_daily_posts SET count = count - 1 WHERE day = substr(OLD.timestamp, 1, 10);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_posts_auto_update AFTER UPDATE OF auto_posted ON posts BEGIN
+        UPDATE stats_counters SET value = value + COALESCE(NEW.auto_posted, 0) - COALESCE(OLD.auto_posted, 0)
+            WHERE name = 'posts_auto';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_conversations_insert AFTER INSERT ON conversations BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'conversations';
+        INSERT INTO stats_personas (persona, count) VALUES (COALESCE(NEW.persona, ''), 1)
+            ON CONFLICT(persona) DO UPDATE SET count = count + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_conversations_delete AFTER DELETE ON conversations BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'conversations';
+        UPDATE stats_personas SET count = count - 1 WHERE persona = COALESCE(OLD.persona, '');
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_messages_insert AFTER INSERT ON messages BEGIN
+        UPDATE stats_counters SET value = value + 1 WHERE name = 'messages';
+        UPDATE stats_counters SET value = value + (NEW.role = 'assistant') WHERE name = 'messages_assistant';
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS stats_messages_delete AFTER DELETE ON messages BEGIN
+        UPDATE stats_counters SET value = value - 1 WHERE name = 'messages';
+        UPDATE stats_counters SET value = value - (OLD.role = 'assistant') WHERE name = 'messages_assistant';
+    END
+    """,
+)
+
+# Older messages are rolled into one summary row per conversation; their raw text moves
+# zlib-compressed into the separate archive database (ARCHIVE_DB_FILE).
+MEMORY_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS conversation_summaries (
+        conversation_id TEXT PRIMARY KEY,
+        summary TEXT NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        through_timestamp TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_role_time ON messages(role, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_conversations_persona ON conversations(persona)",
+    "CREATE INDEX IF NOT EXISTS idx_summaries_through ON conversation_summaries(through_timestamp)",
+)
+
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archive.messages (
+        id INTEGER PRIMARY KEY,
+        conversation_id TEXT NOT NULL,
+        role TEXT,
+        content BLOB,
+        timestamp TEXT,
+        metadata TEXT
+    )
+"""
+
+LLM_CALLS_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS llm_calls (
+        id INTEGER PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        outcome TEXT NOT NULL,  -- 'ok' or 'error'
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        ttfb_ms INTEGER,
+        latency_ms INTEGER NOT NULL,
+        attempt INTEGER NOT NULL DEFAULT 0,
+        failover_reason TEXT,
+        error TEXT,
+        cost_usd REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_llm_calls_created ON llm_calls(created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_llm_calls_provider ON llm_calls(provider, model, created_at)",
+)
+
+# State shared by every worker process (uvicorn --workers N): a small TTL cache, interval
+# rate limits, provider cooldowns and named leases. Times are epoch seconds.
+COORDINATION_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS shared_cache (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        next_allowed REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS provider_health (
+        provider TEXT PRIMARY KEY,
+        failures INTEGER NOT NULL DEFAULT 0,
+        cooldown_until REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        updated_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    # Idempotency keys of job-style requests: 'running' while one worker executes the request,
+    # then 'done' with the response to replay until expires_at.
+    """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        state TEXT NOT NULL,
+        owner TEXT NOT NULL,
+        status_code INTEGER,
+        response TEXT,
+        expires_at REAL NOT NULL
+    )
+    """,
+)
+# Bulk imports (services/importer.py), keyed by a hash of the source so a rerun resumes.
+IMPORT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id TEXT PRIMARY KEY,
+        source TEXT NOT NULL,
+        format TEXT NOT NULL,
+        status TEXT NOT NULL,  -- running, completed, failed
+        rows_done INTEGER NOT NULL DEFAULT 0,
+        inserted INTEGER NOT NULL DEFAULT 0,
+        skipped INTEGER NOT NULL DEFAULT 0,
+        enriched INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        started_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL
+    )
+"""
+# Learned engagement models (services/engagement.py): the running sums the fit is solved
+# from, so retraining only has to read posts that matured since ``trained_through``.
+ENGAGEMENT_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS engagement_models (
+        name TEXT PRIMARY KEY,
+        trained_through TEXT NOT NULL,
+        samples INTEGER NOT NULL,
+        state TEXT NOT NULL,  -- JSON
+        updated_at TEXT NOT NULL
+    )
+"""
+# Drafts generated ahead of demand for trending topics (services/pregen.py), and what that
+# costs per UTC day. Times are epoch seconds.
+DRAFT_POOL_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS draft_pool (
+        id INTEGER PRIMARY KEY,
+        topic_key TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        region TEXT NOT NULL,
+        persona TEXT NOT NULL,
+        tone TEXT NOT NULL,
+        length TEXT NOT NULL,
+        title TEXT NOT NULL,
+        body TEXT NOT NULL,
+        served_by TEXT,  -- JSON
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_draft_pool_lookup ON draft_pool(region, persona, tone, length, topic_key)",
+    "CREATE INDEX IF NOT EXISTS idx_draft_pool_expires ON draft_pool(expires_at)",
+    """
+    CREATE TABLE IF NOT EXISTS pregen_spend (
+        day TEXT PRIMARY KEY,
+        drafts INTEGER NOT NULL DEFAULT 0,
+        cost_usd REAL NOT NULL DEFAULT 0
+    )
+    """,
+)
+# Secondary indexes and stats triggers on ``posts``; bulk imports drop them and rebuild
+# them once at the end.
+POST_INDEXES: dict[str, str] = {
+    "idx_posts_trend_topic": "CREATE INDEX IF NOT EXISTS idx_posts_trend_topic ON posts(trend_topic_id)",
+    "idx_posts_body_ref": "CREATE INDEX IF NOT EXISTS idx_posts_body_ref ON posts(body_ref)",
+}
+POST_TRIGGERS: tuple[str, ...] = ("stats_posts_insert", "stats_posts_delete", "stats_posts_auto_update")
+
+# A failing provider is skipped for BASE * 2^(consecutive failures - 1) seconds, up to MAX.
+PROVIDER_COOLDOWN_BASE = 15.0
+PROVIDER_COOLDOWN_MAX = 600.0
+
+# Post bodies and long message content are stored once per distinct text, compressed with
+# a shared zlib preset dictionary trained on our own posts (see backend/compression.py).
+CONTENT_SCHEMA: tuple[str, ...] = (
+    """
+    CREATE TABLE IF NOT EXISTS content_dicts (
+        id INTEGER PRIMARY KEY,
+        data BLOB NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS content_blobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hash BLOB NOT NULL UNIQUE,
+        dict_id INTEGER NOT NULL DEFAULT 0,
+        data BLOB NOT NULL,
+        raw_size INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """,
+)
+# Messages shorter than this stay inline in ``messages.content``.
+INLINE_CONTENT_LIMIT = 512
+CONTENT_CACHE_SIZE = 256
+MIN_TRAINING_SAMPLES = 20
+RETRAIN_AFTER_BLOBS = 2000
+
+POST_QUEUE_COLUMNS: dict[str, str] = {
+    "id": "INTEGER PRIMARY KEY",
+    "post_id": "INTEGER",  # posts row updated once published
+    "account": "TEXT",  # Reddit account name ('default' is the REDDIT section)
+    "subreddit": "TEXT",
+    "title": "TEXT",
+    "body": "TEXT",
+    "body_ref": "INTEGER",  # content_blobs id; shared with the posts row
+    "publish_at": "TEXT",
+    "status": "TEXT DEFAULT 'pending'",  # pending, in_progress, posted, failed, cancelled
+    "attempts": "INTEGER DEFAULT 0",
+    "next_attempt_at": "TEXT",
+    "last_error": "TEXT",
+    "link": "TEXT",
+    "created_at": "TEXT",
+    "updated_at": "TEXT",
+    "claimed_by": "TEXT",  # WORKER_ID of the scheduler publishing an in_progress row
+    "claimed_at": "REAL",  # epoch seconds
+}
+
+
+def init_db() -> bool:
+    """Create or migrate the schema. Returns ``False`` when it was already at ``SCHEMA_VERSION``."""
+    with sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT) as conn:
+        # WAL lets readers proceed while a writer commits and turns each commit into an append.
+        conn.execute("PRAGMA journal_mode=WAL")
+        if _schema_version(conn) == SCHEMA_VERSION:
+            return False
+        # Take the write lock first so concurrently booting workers migrate only once
+        conn.execute("BEGIN IMMEDIATE")
+        if _schema_version(conn) == SCHEMA_VERSION:
+            return False
+        _migrate(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        LOGGER.info("Database schema migrated to version %s", SCHEMA_VERSION)
+        return True
+
+
+def _schema_version(conn) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _migrate(conn) -> None:
+    # Posts table
+    columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in POST_COLUMNS.items())
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS posts (
+            {columns_sql}
         )
+        """
+    )
 
-        # Conversations table
-        conv_columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in CONVERSATION_COLUMNS.items())
-        conn.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS conversations (
-                {conv_columns_sql}
-            )
-            """
+    # Conversations table
+    conv_columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in CONVERSATION_COLUMNS.items())
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS conversations (
+            {conv_columns_sql}
         )
+        """
+    )
 
-        # Messages table
-        msg_columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in MESSAGE_COLUMNS.items())
-        conn.execute(
-            f"""
-            CREATE TABLE IF NOT EXISTS messages (
-                {msg_columns_sql}
-            )
-            """
+    # Messages table
+    msg_columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in MESSAGE_COLUMNS.items())
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS messages (
+            {msg_columns_sql}
         )
+        """
+    )
+
+    # Trend snapshot store
+    for statement in TREND_SCHEMA:
+        conn.execute(statement)
+
+    # Near-duplicate index
+    for statement in SIGNATURE_SCHEMA:
+        conn.execute(statement)
+
+    # Posting queue
+    queue_columns_sql = ",\n                ".join(f"{name} {definition}" for name, definition in POST_QUEUE_COLUMNS.items())
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS post_queue (
+            {queue_columns_sql}
+        )
+        """
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_queue_due ON post_queue(status, next_attempt_at)")
+
+    # LLM call telemetry
+    for statement in LLM_CALLS_SCHEMA:
+        conn.execute(statement)
+
+    # Content store
+    for statement in CONTENT_SCHEMA:
+        conn.execute(statement)
+
+    # Cross-worker coordination
+    for statement in COORDINATION_SCHEMA:
+        conn.execute(statement)
+
+    # Bulk import progress
+    conn.execute(IMPORT_SCHEMA)
+
+    # Engagement prediction
+    conn.execute(ENGAGEMENT_SCHEMA)
+
+    # Pre-generated drafts
+    for statement in DRAFT_POOL_SCHEMA:
+        conn.execute(statement)
+
+    # Backfill missing columns for existing installations ---------------------------------
+    existing_columns, added_columns = _add_missing_columns(conn, "posts", POST_COLUMNS)
+    _add_missing_columns(conn, "messages", MESSAGE_COLUMNS)
+    _add_missing_columns(conn, "post_queue", POST_QUEUE_COLUMNS)
+
+    # Normalize legacy rows for newly added nullable columns
+    if "persona" in existing_columns or "persona" in added_columns:
+        conn.execute("UPDATE posts SET persona = COALESCE(persona, '')")
+    if "length" in existing_columns or "length" in added_columns:
+        conn.execute("UPDATE posts SET length = COALESCE(length, 'Standard')")
+    if "auto_posted" in existing_columns or "auto_posted" in added_columns:
+        conn.execute("UPDATE posts SET auto_posted = COALESCE(auto_posted, 0)")
+    if "conversation_id" in existing_columns or "conversation_id" in added_columns:
+        conn.execute("UPDATE posts SET conversation_id = COALESCE(conversation_id, '')")
+    # Always normalize upvotes and comments to handle existing NULL values
+    conn.execute("UPDATE posts SET upvotes = COALESCE(upvotes, 0)")
+    conn.execute("UPDATE posts SET comments = COALESCE(comments, 0)")
+    for statement in POST_INDEXES.values():
+        conn.execute(statement)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_content_ref ON messages(content_ref)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_post_queue_body_ref ON post_queue(body_ref)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_meta_topic ON messages(meta_topic)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_meta_provider ON messages(meta_provider, meta_model, timestamp)")
+    _migrate_message_metadata(conn)
+
+    # Memory compaction
+    for statement in MEMORY_SCHEMA:
+        conn.execute(statement)
+
+    # Dashboard stats summary tables
+    stats_missing = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'"
+    ).fetchone()
+    for statement in STATS_SCHEMA:
+        conn.execute(statement)
+    if stats_missing:
+        _rebuild_stats(conn)
+
+
+def _add_missing_columns(conn, table: str, columns: Dict[str, str]) -> Tuple[Dict[str, str], List[str]]:
+    """ALTER ``table`` to add any of ``columns`` it lacks. Returns ``(existing, added)``."""
+    # table_xinfo also lists generated columns, which table_info hides
+    existing = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall()}
+    added: List[str] = []
+    for name, definition in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            added.append(name)
+    return existing, added
+
+
+# Only known keys start a new pair, so topics containing ", word:" are not split apart.
+_LEGACY_METADATA_KEY = re.compile(r"(?:^|,)\s*(" + "|".join(MESSAGE_METADATA_KEYS) + r"):")
+
+
+def parse_legacy_metadata(value: str) -> Dict[str, str]:
+    """Parse the old ``"key:value,key:value"`` metadata strings into a dict."""
+    matches = list(_LEGACY_METADATA_KEY.finditer(value))
+    if not matches:
+        return {"note": value} if value.strip() else {}
+    parsed = {}
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(value)
+        parsed[match.group(1)] = value[match.end() : end].strip()
+    return parsed
+
+
+def _migrate_message_metadata(conn) -> None:
+    rows = conn.execute(
+        "SELECT id, metadata FROM messages WHERE TRIM(COALESCE(metadata, '')) <> '' AND NOT json_valid(metadata)"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE messages SET metadata = ? WHERE id = ?",
+        [(json.dumps(parse_legacy_metadata(value)), message_id) for message_id, value in rows],
+    )
+    if rows:
+        LOGGER.info("Converted %s legacy message metadata strings to JSON", len(rows))
 
-        # Backfill missing columns for existing installations ---------------------------------
-        existing_columns = {
-            row[1]: row[2]
-            for row in conn.execute("PRAGMA table_info(posts)").fetchall()
-        }
-        added_columns: list[str] = []
-        for name, definition in POST_COLUMNS.items():
-            if name not in existing_columns:
-                conn.execute(f"ALTER TABLE posts ADD COLUMN {name} {definition}")
-                added_columns.append(name)
-
-        # Normalize legacy rows for newly added nullable columns
-        if "persona" in existing_columns or "persona" in added_columns:
-            conn.execute("UPDATE posts SET persona = COALESCE(persona, '')")
-        if "length" in existing_columns or "length" in added_columns:
-            conn.execute("UPDATE posts SET length = COALESCE(length, 'Standard')")
-        if "auto_posted" in existing_columns or "auto_posted" in added_columns:
-            conn.execute("UPDATE posts SET auto_posted = COALESCE(auto_posted, 0)")
-        if "conversation_id" in existing_columns or "conversation_id" in added_columns:
-            conn.execute("UPDATE posts SET conversation_id = COALESCE(conversation_id, '')")
-        # Always normalize upvotes and comments to handle existing NULL values
-        conn.execute("UPDATE posts SET upvotes = COALESCE(upvotes, 0)")
-        conn.execute("UPDATE posts SET comments = COALESCE(comments, 0)")
+
+def decode_metadata(value: Optional[str]) -> Dict[str, object]:
+    """Decode stored message metadata, tolerating empty and legacy values."""
+    if not value:
+        return {}
+    try:
+        decoded = json.loads(value)
+    except ValueError:
+        return parse_legacy_metadata(value)
+    return decoded if isinstance(decoded, dict) else {"value": decoded}
+
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class _BatchConnection:
+    """Connection handed out inside ``write_batch``; commits are deferred to the end of the batch."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def commit(self) -> None:
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
 
 
 @contextmanager
 def get_conn():
-    conn = sqlite3.connect(DB_FILE)
+    batch = getattr(_local, "batch", None)
+    if batch is not None:
+        yield batch
+        return
+    conn = _connect()
     try:
         yield conn
     finally:
         conn.close()
 
 
+@contextmanager
+def write_batch() -> Iterator[_BatchConnection]:
+    """Run every database helper called in the block on one connection and commit once.
+
+    Nested batches join the outermost one. An exception rolls the whole batch back.
+    """
+    if getattr(_local, "batch", None) is not None:
+        yield _local.batch
+        return
+    conn = _connect()
+    _local.batch = _BatchConnection(conn)
+    try:
+        yield _local.batch
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _local.batch = None
+        conn.close()
+
+
+class WriteBehindBuffer:
+    """Queues rows for one INSERT statement and flushes them in batched transactions off-thread.
+
+    Meant for high-rate, loss-tolerant logging: callers never wait on SQLite, and rows still
+    queued when the process dies are lost.
+    """
+
+    def __init__(self, sql: str, flush_interval: float = 1.0, max_batch: int = 500, max_pending: int = 10000):
+        self.sql = sql
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_pending)
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.dropped = 0
+
+    def add(self, params: tuple) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(params)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns the number of rows written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                rows = []
+                while len(rows) < self.max_batch:
+                    try:
+                        rows.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    return written
+                try:
+                    with get_conn() as conn:
+                        conn.executemany(self.sql, rows)
+                        conn.commit()
+                    written += len(rows)
+                except sqlite3.Error as exc:
+                    LOGGER.warning("Write-behind flush of %s rows failed: %s", len(rows), exc)
+                    return written
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
 def log_post(
     topic: str,
     title: str,
@@ -122,18 +738,23 @@ def log_post(
     link: str,
     auto_posted: bool,
     conversation_id: str = "",
-) -> None:
+    topic_key: str = "",
+) -> int:
     with get_conn() as conn:
-        conn.execute(
+        now = datetime.utcnow().isoformat()
+        trend_topic_id = _intern_topic(conn, topic_key, topic, now) if topic_key else None
+        body_ref = _store_content(conn, body) if body else None
+        cursor = conn.execute(
             """
             INSERT INTO posts (
-                topic, title, body, region, tone, persona, length, subreddit, link, auto_posted, timestamp, conversation_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                topic, title, body_ref, region, tone, persona, length, subreddit, link, auto_posted, timestamp,
+                conversation_id, trend_topic_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 topic,
                 title,
-                body,
+                body_ref,
                 region,
                 tone,
                 persona,
@@ -141,11 +762,13 @@ def log_post(
                 subreddit,
                 link,
                 int(auto_posted),
-                datetime.utcnow().isoformat(),
+                now,
                 conversation_id,
+                trend_topic_id,
             ),
         )
         conn.commit()
+        return cursor.lastrowid
 
 
 def fetch_recent_posts(limit: int = 50) -> List[Tuple]:
@@ -154,7 +777,7 @@ def fetch_recent_posts(limit: int = 50) -> List[Tuple]:
             """
             SELECT topic, title, subreddit, link, upvotes, comments, timestamp
             FROM posts
-            ORDER BY timestamp DESC
+            ORDER BY timestamp DESC, id DESC
             LIMIT ?
             """,
             (limit,),
@@ -164,16 +787,17 @@ def fetch_recent_posts(limit: int = 50) -> List[Tuple]:
 def fetch_style_samples(limit: int = 5) -> List[Tuple[str, str, str, str]]:
     """Return the most recent posts for style profiling."""
     with get_conn() as conn:
-        return conn.execute(
+        rows = conn.execute(
             """
-            SELECT title, body, tone, persona
+            SELECT title, body, body_ref, tone, persona
             FROM posts
-            WHERE body IS NOT NULL AND TRIM(body) <> ''
-            ORDER BY timestamp DESC
+            WHERE body_ref IS NOT NULL OR TRIM(COALESCE(body, '')) <> ''
+            ORDER BY timestamp DESC, id DESC
             LIMIT ?
             """,
             (limit,),
         ).fetchall()
+    return [(title, _resolve(body, body_ref), tone, persona) for title, body, body_ref, tone, persona in rows]
 
 
 def fetch_posts_for_date(date_iso: str) -> List[Tuple]:
@@ -183,7 +807,7 @@ def fetch_posts_for_date(date_iso: str) -> List[Tuple]:
             SELECT topic, title, subreddit, link, upvotes, comments, timestamp
             FROM posts
             WHERE DATE(timestamp) = ?
-            ORDER BY timestamp DESC
+            ORDER BY timestamp DESC, id DESC
             """,
             (date_iso,),
         ).fetchall()
@@ -191,23 +815,86 @@ def fetch_posts_for_date(date_iso: str) -> List[Tuple]:
 
 def fetch_all_posts() -> Sequence[Tuple]:
     with get_conn() as conn:
-        return conn.execute(
+        rows = conn.execute(
             """
-            SELECT id, topic, title, body, region, tone, persona, length, subreddit, link, upvotes, comments, timestamp
-            FROM posts
-            ORDER BY timestamp DESC
+            SELECT p.id, p.topic, p.title, p.body, b.dict_id, b.data, p.region, p.tone, p.persona, p.length,
+                   p.subreddit, p.link, p.upvotes, p.comments, p.timestamp
+            FROM posts p
+            LEFT JOIN content_blobs b ON b.id = p.body_ref
+            ORDER BY p.timestamp DESC, p.id DESC
             """
         ).fetchall()
+        dictionaries = _load_dictionaries(conn, {row[4] for row in rows if row[5] is not None})
+    return [
+        (*row[:3], _decode(row[4], row[5], dictionaries) if row[5] is not None else row[3], *row[6:])
+        for row in rows
+    ]
+
+
+def _rebuild_stats(conn: sqlite3.Connection) -> None:
+    """Recompute the trigger-maintained summary tables from the base tables."""
+    conn.execute("DELETE FROM stats_counters")
+    conn.execute("DELETE FROM stats_daily_posts")
+    conn.execute("DELETE FROM stats_personas")
+    counts = {
+        "posts_total": "SELECT COUNT(*) FROM posts",
+        "posts_auto": "SELECT COALESCE(SUM(auto_posted), 0) FROM posts",
+        "conversations": "SELECT COUNT(*) FROM conversations",
+        "messages": "SELECT COUNT(*) FROM messages",
+        "messages_assistant": "SELECT COUNT(*) FROM messages WHERE role = 'assistant'",
+    }
+    for name in STATS_COUNTERS:
+        conn.execute(
+            "INSERT INTO stats_counters (name, value) VALUES (?, (" + counts[name] + "))",
+            (name,),
+        )
+    conn.execute(
+        """
+        INSERT INTO stats_daily_posts (day, count)
+        SELECT substr(timestamp, 1, 10), COUNT(*) FROM posts WHERE timestamp IS NOT NULL GROUP BY 1
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO stats_personas (persona, count)
+        SELECT COALESCE(persona, ''), COUNT(*) FROM conversations GROUP BY 1
+        """
+    )
+
+
+def rebuild_stats() -> None:
+    """Resynchronize dashboard counters, e.g. after bulk changes made with triggers disabled."""
+    with get_conn() as conn:
+        _rebuild_stats(conn)
+        conn.commit()
+
+
+def _counters(conn) -> Dict[str, int]:
+    return dict(conn.execute("SELECT name, value FROM stats_counters").fetchall())
 
 
 def fetch_stats() -> Tuple[int, int, int]:
     with get_conn() as conn:
-        total = conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+        counters = _counters(conn)
+        # Timestamps are stored in UTC, so "today" is the UTC date as well.
         today = conn.execute(
-            "SELECT COUNT(*) FROM posts WHERE DATE(timestamp) = DATE('now', 'localtime')"
+            "SELECT count FROM stats_daily_posts WHERE day = DATE('now')"
+        ).fetchone()
+    return counters.get("posts_total", 0), today[0] if today else 0, counters.get("posts_auto", 0)
+
+
+def fetch_memory_stats() -> Tuple[Dict[str, int], int, List[Tuple[str, int]]]:
+    """Return ``(counters, conversations_active_last_7_days, top_personas)``."""
+    with get_conn() as conn:
+        counters = _counters(conn)
+        recent = conn.execute(
+            "SELECT COUNT(*) FROM conversations WHERE updated_at >= ?",
+            (datetime.utcfromtimestamp(time.time() - 7 * 86400).isoformat(),),
         ).fetchone()[0]
-        auto = conn.execute("SELECT COUNT(*) FROM posts WHERE auto_posted = 1").fetchone()[0]
-    return total, today, auto
+        top_personas = conn.execute(
+            "SELECT persona, count FROM stats_personas WHERE count > 0 ORDER BY count DESC, persona LIMIT 5"
+        ).fetchall()
+    return counters, recent, top_personas
 
 
 def iter_posts_for_refresh() -> Iterable[Tuple[int, str]]:
@@ -228,6 +915,240 @@ def update_metrics(updates: Iterable[Tuple[int, int, int]]) -> None:
         conn.commit()
 
 
+def update_post_link(post_id: int, link: str, auto_posted: Optional[bool] = None) -> None:
+    with get_conn() as conn:
+        if auto_posted is None:
+            conn.execute("UPDATE posts SET link = ? WHERE id = ?", (link, post_id))
+        else:
+            conn.execute("UPDATE posts SET link = ?, auto_posted = ? WHERE id = ?", (link, int(auto_posted), post_id))
+        conn.commit()
+
+
+def insert_posts(rows: Iterable[Sequence]) -> int:
+    """Bulk-insert ``(topic, title, body, region, tone, persona, length, subreddit, link,
+    auto_posted, upvotes, comments, timestamp, conversation_id)`` rows. Returns the count."""
+    count = 0
+    with get_conn() as conn:
+        for row in rows:
+            body = row[2]
+            conn.execute(
+                """
+                INSERT INTO posts (
+                    topic, title, body_ref, region, tone, persona, length, subreddit, link, auto_posted,
+                    upvotes, comments, timestamp, conversation_id
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (*row[:2], _store_content(conn, body) if body else None, *row[3:13], row[13] or ""),
+            )
+            count += 1
+        conn.commit()
+    return count
+
+
+def fetch_post_links() -> set:
+    """Every non-empty post link, for deduplicating imports."""
+    with get_conn() as conn:
+        return {row[0] for row in conn.execute("SELECT link FROM posts WHERE link LIKE 'http%'")}
+
+
+@contextmanager
+def deferred_post_maintenance() -> Iterator[None]:
+    """Drop the secondary indexes and stats triggers on ``posts`` for the duration of a bulk
+    load, then rebuild them and resynchronize the counters once, even if the load fails."""
+    with get_conn() as conn:
+        for name in POST_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        for name in POST_TRIGGERS:
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.commit()
+    try:
+        yield
+    finally:
+        restore_post_maintenance()
+
+
+def restore_post_maintenance() -> bool:
+    """Recreate whatever an interrupted bulk load left dropped. Returns whether anything was."""
+    expected = set(POST_INDEXES) | set(POST_TRIGGERS)
+    with get_conn() as conn:
+        placeholders = ", ".join("?" for _ in expected)
+        present = {
+            row[0] for row in conn.execute(f"SELECT name FROM sqlite_master WHERE name IN ({placeholders})", tuple(expected))
+        }
+        if present == expected:
+            return False
+        for statement in POST_INDEXES.values():
+            conn.execute(statement)
+        for statement in STATS_SCHEMA:
+            conn.execute(statement)
+        _rebuild_stats(conn)
+        conn.commit()
+    return True
+
+
+def iter_posts_for_export(batch_size: int = 500) -> Iterator[Tuple]:
+    """Every post in ``insert_posts`` column order, oldest first, with bodies resolved."""
+    last_id = 0
+    while True:
+        with get_conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, topic, title, body, body_ref, region, tone, persona, length, subreddit, link, auto_posted,
+                       upvotes, comments, timestamp, conversation_id
+                FROM posts
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+                """,
+                (last_id, batch_size),
+            ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield (row[1], row[2], _resolve(row[3], row[4]), *row[5:])
+        last_id = rows[-1][0]
+
+
+def iter_engagement_samples(after: str, until: str, after_id: int = 0, batch_size: int = 500) -> Iterator[Tuple]:
+    """``(title, body, persona, tone, subreddit, upvotes, comments, timestamp, id)`` of posts
+    published to Reddit after the ``(after, after_id)`` cursor and up to ``until``, oldest first."""
+    last_id = after_id
+    while True:
+        with get_conn() as conn:
+            # Keyset on (timestamp, id): imported posts often share a timestamp
+            rows = conn.execute(
+                """
+                SELECT id, title, body, body_ref, persona, tone, subreddit, upvotes, comments, timestamp
+                FROM posts
+                WHERE (timestamp > ? OR (timestamp = ? AND id > ?)) AND timestamp <= ? AND link LIKE 'http%'
+                ORDER BY timestamp, id
+                LIMIT ?
+                """,
+                (after, after, last_id, until, batch_size),
+            ).fetchall()
+        if not rows:
+            return
+        for row in rows:
+            yield (row[1], _resolve(row[2], row[3]), *row[4:], row[0])
+        after, last_id = rows[-1][-1], rows[-1][0]
+
+
+def fetch_popular_combinations(since: str, limit: int = 3) -> List[Tuple[str, str, str, str, int]]:
+    """``(region, persona, tone, length, posts)`` most used since ``since``, most used first."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT region, persona, tone, length, COUNT(*) AS uses
+            FROM posts
+            WHERE timestamp >= ? AND COALESCE(region, '') <> '' AND COALESCE(length, '') <> ''
+            GROUP BY region, persona, tone, length
+            ORDER BY uses DESC, region, persona, tone, length
+            LIMIT ?
+            """,
+            (since, limit),
+        ).fetchall()
+
+
+# Draft Pool Functions
+
+def add_pool_draft(
+    topic_key: str, topic: str, region: str, persona: str, tone: str, length: str,
+    title: str, body: str, served_by: Dict[str, object], ttl: float,
+) -> None:
+    now = time.time()
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO draft_pool (topic_key, topic, region, persona, tone, length, title, body, served_by, created_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (topic_key, topic, region, persona, tone, length, title, body, json.dumps(served_by), now, now + ttl),
+        )
+        conn.commit()
+
+
+def claim_pool_draft(
+    topic_key: str, region: str, persona: str, tone: str, length: str
+) -> Optional[Tuple[str, str, Dict[str, object], float]]:
+    """Take the newest unexpired draft for a topic and combination out of the pool.
+
+    Returns ``(title, body, served_by, created_at)``; each draft is handed out once, even with
+    several workers asking for it.
+    """
+    with get_conn() as conn:
+        row = conn.execute(
+            """
+            DELETE FROM draft_pool
+            WHERE id = (
+                SELECT id FROM draft_pool
+                WHERE region = ? AND persona = ? AND tone = ? AND length = ? AND topic_key = ? AND expires_at > ?
+                ORDER BY created_at DESC
+                LIMIT 1
+            )
+            RETURNING title, body, served_by, created_at
+            """,
+            (region, persona, tone, length, topic_key, time.time()),
+        ).fetchone()
+        conn.commit()
+    if row is None:
+        return None
+    return row[0], row[1], json.loads(row[2] or "{}"), row[3]
+
+
+def fetch_pool_topic_keys(region: str, persona: str, tone: str, length: str) -> set:
+    """Topics that already have an unexpired draft for this combination."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT DISTINCT topic_key FROM draft_pool
+            WHERE region = ? AND persona = ? AND tone = ? AND length = ? AND expires_at > ?
+            """,
+            (region, persona, tone, length, time.time()),
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def purge_expired_drafts() -> int:
+    with get_conn() as conn:
+        removed = conn.execute("DELETE FROM draft_pool WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.commit()
+    return removed
+
+
+def fetch_draft_pool_summary() -> List[Tuple[str, str, str, str, int, float]]:
+    """``(region, persona, tone, length, drafts, oldest_created_at)`` of the unexpired pool."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT region, persona, tone, length, COUNT(*), MIN(created_at)
+            FROM draft_pool
+            WHERE expires_at > ?
+            GROUP BY region, persona, tone, length
+            ORDER BY COUNT(*) DESC
+            """,
+            (time.time(),),
+        ).fetchall()
+
+
+def record_pregen_spend(day: str, cost_usd: float) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO pregen_spend (day, drafts, cost_usd) VALUES (?, 1, ?)
+            ON CONFLICT(day) DO UPDATE SET drafts = drafts + 1, cost_usd = cost_usd + excluded.cost_usd
+            """,
+            (day, cost_usd),
+        )
+        conn.commit()
+
+
+def fetch_pregen_spend(day: str) -> Tuple[int, float]:
+    """``(drafts, cost_usd)`` pre-generated on ``day`` (UTC ``YYYY-MM-DD``)."""
+    with get_conn() as conn:
+        row = conn.execute("SELECT drafts, cost_usd FROM pregen_spend WHERE day = ?", (day,)).fetchone()
+    return (row[0], row[1]) if row else (0, 0.0)
+
+
 # Conversation Memory Functions
 
 def create_conversation(conversation_id: str, title: str, persona: str, tone: str) -> None:
@@ -244,16 +1165,32 @@ def create_conversation(conversation_id: str, title: str, persona: str, tone: st
         conn.commit()
 
 
-def add_message(conversation_id: str, role: str, content: str, metadata: str = "") -> None:
-    """Add a message to a conversation."""
+def add_message(
+    conversation_id: str,
+    role: str,
+    content: str,
+    metadata: Optional[Dict[str, object]] = None,
+    content_ref: Optional[int] = None,
+) -> None:
+    """Add a message to a conversation.
+
+    ``metadata`` is stored as JSON; the keys in ``MESSAGE_METADATA_KEYS`` are queryable as
+    indexed ``meta_*`` columns.
+
+    With ``content_ref`` the stored text is ``content`` followed by that content-store entry,
+    which lets a message share a post body instead of repeating it. Long content without a
+    reference is moved into the content store automatically.
+    """
     with get_conn() as conn:
         now = datetime.utcnow().isoformat()
+        if content_ref is None and len(content) > INLINE_CONTENT_LIMIT:
+            content, content_ref = "", _store_content(conn, content)
         conn.execute(
             """
-            INSERT INTO messages (conversation_id, role, content, timestamp, metadata)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT INTO messages (conversation_id, role, content, content_ref, timestamp, metadata)
+            VALUES (?, ?, ?, ?, ?, ?)
             """,
-            (conversation_id, role, content, now, metadata),
+            (conversation_id, role, content, content_ref, now, json.dumps(metadata or {})),
         )
         conn.commit()
 
@@ -261,16 +1198,17 @@ def add_message(conversation_id: str, role: str, content: str, metadata: str = "
 def get_conversation_history(conversation_id: str, limit: int = 50) -> List[Tuple[str, str, str, str]]:
     """Get conversation history for memory context."""
     with get_conn() as conn:
-        return conn.execute(
+        rows = conn.execute(
             """
-            SELECT role, content, timestamp, metadata
+            SELECT role, content, content_ref, timestamp, metadata
             FROM messages
             WHERE conversation_id = ?
-            ORDER BY timestamp ASC
+            ORDER BY timestamp ASC, id ASC
             LIMIT ?
             """,
             (conversation_id, limit),
         ).fetchall()
+    return [(role, _resolve(content, ref), timestamp, metadata) for role, content, ref, timestamp, metadata in rows]
 
 
 def get_recent_conversations(limit: int = 10) -> List[Tuple[str, str, str, str, str]]:
@@ -299,16 +1237,1027 @@ def update_conversation_timestamp(conversation_id: str) -> None:
 
 
 def get_memory_context(persona: str, limit: int = 10) -> List[Tuple[str, str, str]]:
-    """Get memory context from recent conversations for personalization."""
+    """Get memory context from recent conversations for personalization.
+
+    Live assistant messages and compacted conversation summaries are merged by recency.
+    """
     with get_conn() as conn:
-        return conn.execute(
+        rows = conn.execute(
             """
-            SELECT c.title, m.content, m.timestamp
-            FROM conversations c
-            JOIN messages m ON c.id = m.conversation_id
-            WHERE c.persona = ? AND m.role = 'assistant'
-            ORDER BY m.timestamp DESC
+            SELECT title, content, content_ref, timestamp FROM (
+                SELECT c.title AS title, m.content AS content, m.content_ref AS content_ref, m.timestamp AS timestamp
+                FROM messages m
+                JOIN conversations c ON c.id = m.conversation_id
+                WHERE m.role = 'assistant' AND c.persona = ?
+                ORDER BY m.timestamp DESC, m.id DESC
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT title, content, NULL, timestamp FROM (
+                SELECT c.title AS title, s.summary AS content, s.through_timestamp AS timestamp
+                FROM conversation_summaries s
+                JOIN conversations c ON c.id = s.conversation_id
+                WHERE c.persona = ?
+                ORDER BY s.through_timestamp DESC
+                LIMIT ?
+            )
+            ORDER BY timestamp DESC
             LIMIT ?
             """,
-            (persona, limit),
+            (persona, limit, persona, limit, limit),
+        ).fetchall()
+    return [(title, _resolve(content, ref), timestamp) for title, content, ref, timestamp in rows]
+
+
+# Memory Compaction Functions
+
+@contextmanager
+def _with_archive(conn) -> Iterator[None]:
+    conn.execute("ATTACH DATABASE ? AS archive", (str(ARCHIVE_DB_FILE),))
+    try:
+        conn.execute(ARCHIVE_SCHEMA)
+        conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_conversation ON messages(conversation_id, timestamp)")
+        yield
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("DETACH DATABASE archive")
+
+
+def fetch_compactable_conversations(cutoff: str, limit: int = 100) -> List[str]:
+    """Conversations that still hold live messages older than ``cutoff``."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT conversation_id FROM messages WHERE timestamp < ? LIMIT ?",
+            (cutoff, limit),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+def fetch_messages_before(conversation_id: str, cutoff: str) -> List[Tuple[int, str, str, str, str]]:
+    """Return ``(id, role, content, timestamp, metadata)`` for messages older than ``cutoff``."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT id, role, content, content_ref, timestamp, metadata
+            FROM messages
+            WHERE conversation_id = ? AND timestamp < ?
+            ORDER BY timestamp ASC, id ASC
+            """,
+            (conversation_id, cutoff),
         ).fetchall()
+    return [
+        (message_id, role, _resolve(content, ref), timestamp, metadata)
+        for message_id, role, content, ref, timestamp, metadata in rows
+    ]
+
+
+def get_conversation_summary(conversation_id: str) -> Optional[Tuple[str, int, str]]:
+    """Return ``(summary, message_count, through_timestamp)`` for a compacted conversation."""
+    with get_conn() as conn:
+        return conn.execute(
+            "SELECT summary, message_count, through_timestamp FROM conversation_summaries WHERE conversation_id = ?",
+            (conversation_id,),
+        ).fetchone()
+
+
+def archive_messages(conversation_id: str, rows: Sequence[Tuple[int, str, str, str, str]], summary: str) -> None:
+    """Move ``rows`` to the compressed archive and store ``summary`` in their place."""
+    if not rows:
+        return
+    now = datetime.utcnow().isoformat()
+    through = max(row[3] or "" for row in rows)
+    # A transaction spanning an attached database is not atomic across both files in WAL mode,
+    # so the archive copy is committed on its own first. If the process dies before the delete
+    # below, the messages are still live and the next compaction archives them again.
+    with get_conn() as conn, _with_archive(conn):
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO archive.messages (id, conversation_id, role, content, timestamp, metadata)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (message_id, conversation_id, role, zlib.compress((content or "").encode(), 9), timestamp, metadata)
+                for message_id, role, content, timestamp, metadata in rows
+            ],
+        )
+    with get_conn() as conn:
+        conn.executemany("DELETE FROM messages WHERE id = ?", [(row[0],) for row in rows])
+        conn.execute(
+            """
+            INSERT INTO conversation_summaries (conversation_id, summary, message_count, through_timestamp, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(conversation_id) DO UPDATE SET
+                summary = excluded.summary,
+                message_count = message_count + excluded.message_count,
+                through_timestamp = MAX(through_timestamp, excluded.through_timestamp),
+                updated_at = excluded.updated_at
+            """,
+            (conversation_id, summary, len(rows), through, now),
+        )
+        conn.commit()
+
+
+def fetch_archived_messages(conversation_id: str) -> List[Tuple[str, str, str, str]]:
+    """Return ``(role, content, timestamp, metadata)`` for archived messages of a conversation."""
+    if not ARCHIVE_DB_FILE.exists():
+        return []
+    with get_conn() as conn, _with_archive(conn):
+        rows = conn.execute(
+            """
+            SELECT role, content, timestamp, metadata
+            FROM archive.messages
+            WHERE conversation_id = ?
+            ORDER BY timestamp ASC, id ASC
+            """,
+            (conversation_id,),
+        ).fetchall()
+    return [(role, zlib.decompress(content).decode(), timestamp, metadata) for role, content, timestamp, metadata in rows]
+
+
+# Trend Snapshot Functions
+
+def _intern_topic(conn: sqlite3.Connection, normalized: str, label: str, seen_at: str) -> int:
+    """Return the id for a normalized topic, creating it on first sight."""
+    conn.execute(
+        """
+        INSERT INTO trend_topics (normalized, label, first_seen, last_seen)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(normalized) DO NOTHING
+        """,
+        (normalized, label, seen_at, seen_at),
+    )
+    return conn.execute("SELECT id FROM trend_topics WHERE normalized = ?", (normalized,)).fetchone()[0]
+
+
+def record_trend_snapshot(region: str, keyword: str, results: Dict[str, List[Tuple[str, str]]]) -> None:
+    """Persist one fetch of every trend source.
+
+    ``results`` maps source name to ranked ``(normalized, label)`` pairs. A snapshot identical to
+    the previous one for the same region/source/keyword only extends its ``last_fetched_at``.
+    """
+    now = datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        for source, topics in results.items():
+            if not topics:
+                continue
+            topic_ids = [_intern_topic(conn, normalized, label, now) for normalized, label in topics]
+            digest = hashlib.sha1(",".join(map(str, topic_ids)).encode()).hexdigest()
+
+            previous = conn.execute(
+                """
+                SELECT id, digest FROM trend_snapshots
+                WHERE region = ? AND source = ? AND keyword = ?
+                ORDER BY fetched_at DESC
+                LIMIT 1
+                """,
+                (region, source, keyword),
+            ).fetchone()
+            if previous and previous[1] == digest:
+                conn.execute("UPDATE trend_snapshots SET last_fetched_at = ? WHERE id = ?", (now, previous[0]))
+            else:
+                snapshot_id = conn.execute(
+                    """
+                    INSERT INTO trend_snapshots (region, source, keyword, fetched_at, last_fetched_at, digest)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (region, source, keyword, now, now, digest),
+                ).lastrowid
+                conn.executemany(
+                    "INSERT OR IGNORE INTO trend_snapshot_items (snapshot_id, rank, topic_id) VALUES (?, ?, ?)",
+                    [(snapshot_id, rank, topic_id) for rank, topic_id in enumerate(topic_ids)],
+                )
+
+            unique_ids = list(dict.fromkeys(topic_ids))
+            conn.executemany(
+                "UPDATE trend_topics SET last_seen = ? WHERE id = ?",
+                [(now, topic_id) for topic_id in unique_ids],
+            )
+            conn.executemany(
+                """
+                INSERT INTO trend_topic_regions (topic_id, region, first_seen, last_seen)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(topic_id, region) DO UPDATE SET
+                    last_seen = excluded.last_seen,
+                    sightings = sightings + 1,
+                    lifetime_seconds = CAST((julianday(excluded.last_seen) - julianday(first_seen)) * 86400 AS INTEGER)
+                """,
+                [(topic_id, region, now, now) for topic_id in unique_ids],
+            )
+        conn.commit()
+
+
+def fetch_trend_longevity(region: str, limit: int = 20) -> List[Tuple[str, str, str, int, int]]:
+    """Return the longest-lived topics for a region."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT t.label, r.first_seen, r.last_seen, r.sightings, r.lifetime_seconds
+            FROM trend_topic_regions r
+            JOIN trend_topics t ON t.id = r.topic_id
+            WHERE r.region = ?
+            ORDER BY r.lifetime_seconds DESC
+            LIMIT ?
+            """,
+            (region, limit),
+        ).fetchall()
+
+
+def fetch_trend_first_seen(normalized: str) -> Optional[Tuple[str, str, str, List[Tuple[str, str, str, int]]]]:
+    """Return ``(label, first_seen, last_seen, per_region_rows)`` for a topic, or ``None``."""
+    with get_conn() as conn:
+        topic = conn.execute(
+            "SELECT id, label, first_seen, last_seen FROM trend_topics WHERE normalized = ?",
+            (normalized,),
+        ).fetchone()
+        if topic is None:
+            return None
+        regions = conn.execute(
+            """
+            SELECT region, first_seen, last_seen, sightings
+            FROM trend_topic_regions
+            WHERE topic_id = ?
+            ORDER BY first_seen ASC
+            """,
+            (topic[0],),
+        ).fetchall()
+    return topic[1], topic[2], topic[3], regions
+
+
+def fetch_topic_performance(limit: int = 20) -> List[Tuple[str, str, int, int, int, float, float]]:
+    """Aggregate engagement of our posts per interned trend topic."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT t.label, t.first_seen, COUNT(p.id), SUM(p.upvotes), SUM(p.comments),
+                   AVG(p.upvotes), AVG(p.comments)
+            FROM posts p
+            JOIN trend_topics t ON t.id = p.trend_topic_id
+            GROUP BY p.trend_topic_id
+            ORDER BY SUM(p.upvotes) + SUM(p.comments) DESC, t.label
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+
+
+# Posting Queue Functions
+
+def enqueue_submission(post_id: int, account: str, subreddit: str, title: str, body: str, publish_at: str) -> int:
+    """Queue a post for publication at ``publish_at`` (UTC ISO timestamp)."""
+    with get_conn() as conn:
+        now = datetime.utcnow().isoformat()
+        cursor = conn.execute(
+            """
+            INSERT INTO post_queue (
+                post_id, account, subreddit, title, body_ref, publish_at, status, attempts, next_attempt_at, created_at,
+                updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?, ?)
+            """,
+            (post_id, account, subreddit, title, _store_content(conn, body), publish_at, publish_at, now, now),
+        )
+        conn.commit()
+        return cursor.lastrowid
+
+
+def fetch_due_submissions(now_iso: str, limit: int = 50) -> List[Tuple[int, str, str]]:
+    """Return ``(id, account, subreddit)`` for pending submissions that are due."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT id, account, subreddit
+            FROM post_queue
+            WHERE status = 'pending' AND next_attempt_at <= ?
+            ORDER BY next_attempt_at ASC
+            LIMIT ?
+            """,
+            (now_iso, limit),
+        ).fetchall()
+
+
+def claim_submission(queue_id: int, claimant: str) -> Optional[Tuple[int, int, str, str, str, str, int]]:
+    """Atomically mark a pending submission in progress on behalf of the worker ``claimant``.
+
+    Returns ``(id, post_id, account, subreddit, title, body, attempts)`` or ``None`` if another
+    worker claimed it first.
+    """
+    with get_conn() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE post_queue SET status = 'in_progress', claimed_by = ?, claimed_at = ?, updated_at = ?
+            WHERE id = ? AND status = 'pending'
+            """,
+            (claimant, time.time(), datetime.utcnow().isoformat(), queue_id),
+        )
+        conn.commit()
+        if cursor.rowcount != 1:
+            return None
+        row = conn.execute(
+            "SELECT id, post_id, account, subreddit, title, body, body_ref, attempts FROM post_queue WHERE id = ?",
+            (queue_id,),
+        ).fetchone()
+    return (*row[:5], _resolve(row[5], row[6]), row[7])
+
+
+def complete_submission(queue_id: int, link: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE post_queue SET status = 'posted', link = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+            (link, datetime.utcnow().isoformat(), queue_id),
+        )
+        conn.commit()
+
+
+def retry_submission(queue_id: int, next_attempt_at: str, error: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE post_queue
+            SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?, last_error = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (next_attempt_at, error, datetime.utcnow().isoformat(), queue_id),
+        )
+        conn.commit()
+
+
+def fail_submission(queue_id: int, error: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE post_queue
+            SET status = 'failed', attempts = attempts + 1, last_error = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (error, datetime.utcnow().isoformat(), queue_id),
+        )
+        conn.commit()
+
+
+def cancel_submission(queue_id: int) -> bool:
+    with get_conn() as conn:
+        cursor = conn.execute(
+            "UPDATE post_queue SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'pending'",
+            (datetime.utcnow().isoformat(), queue_id),
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+
+def reset_stale_submissions(max_age: float) -> int:
+    """Return abandoned in-progress submissions to the pending state.
+
+    A claim is abandoned when it is older than ``max_age`` seconds or its claimant holds no
+    live lease, i.e. the worker is gone. Claims of live workers are left to finish.
+    """
+    now = time.time()
+    with get_conn() as conn:
+        cursor = conn.execute(
+            """
+            UPDATE post_queue SET status = 'pending', claimed_by = NULL, claimed_at = NULL
+            WHERE status = 'in_progress'
+              AND (
+                COALESCE(claimed_at, 0) <= ?
+                OR NOT EXISTS (SELECT 1 FROM leases WHERE leases.owner = post_queue.claimed_by AND leases.expires_at > ?)
+              )
+            """,
+            (now - max_age, now),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+def fetch_queue(status: str = "", limit: int = 50) -> List[Tuple]:
+    with get_conn() as conn:
+        if status:
+            return conn.execute(
+                """
+                SELECT id, post_id, account, subreddit, title, publish_at, status, attempts, next_attempt_at, last_error, link
+                FROM post_queue
+                WHERE status = ?
+                ORDER BY next_attempt_at ASC
+                LIMIT ?
+                """,
+                (status, limit),
+            ).fetchall()
+        return conn.execute(
+            """
+            SELECT id, post_id, account, subreddit, title, publish_at, status, attempts, next_attempt_at, last_error, link
+            FROM post_queue
+            ORDER BY next_attempt_at DESC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+
+
+def fetch_best_posting_hours(subreddit: str, limit: int = 3) -> List[int]:
+    """UTC hours of day with the best average engagement for a subreddit."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT CAST(strftime('%H', timestamp) AS INTEGER) AS hour, AVG(upvotes + comments) AS engagement
+            FROM posts
+            WHERE subreddit = ? AND auto_posted = 1
+            GROUP BY hour
+            HAVING COUNT(*) >= 2
+            ORDER BY engagement DESC, hour
+            LIMIT ?
+            """,
+            (subreddit, limit),
+        ).fetchall()
+    return [row[0] for row in rows]
+
+
+# Duplicate Detection Functions
+
+def record_post_signatures(post_id: int, signatures: Sequence[Tuple[str, int, Sequence[int]]], created_at: str = "") -> None:
+    """Store ``(kind, simhash, bands)`` rows for a post."""
+    created_at = created_at or datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO post_signatures (post_id, kind, simhash, band0, band1, band2, band3, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(post_id, kind, simhash, *band_values, created_at) for kind, simhash, band_values in signatures],
+        )
+        conn.commit()
+
+
+def find_signature_candidates(kind: str, band_values: Sequence[int], since: str) -> List[Tuple[int, int]]:
+    """Return ``(post_id, simhash)`` for signatures sharing at least one band, newer than ``since``."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT post_id, simhash FROM post_signatures WHERE kind = ? AND band0 = ? AND created_at >= ?
+            UNION
+            SELECT post_id, simhash FROM post_signatures WHERE kind = ? AND band1 = ? AND created_at >= ?
+            UNION
+            SELECT post_id, simhash FROM post_signatures WHERE kind = ? AND band2 = ? AND created_at >= ?
+            UNION
+            SELECT post_id, simhash FROM post_signatures WHERE kind = ? AND band3 = ? AND created_at >= ?
+            """,
+            [value for band in band_values for value in (kind, band, since)],
+        ).fetchall()
+
+
+def fetch_posts_missing_signatures(limit: int = 500) -> List[Tuple[int, str, str, str, str]]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT p.id, p.topic, p.title, p.body, p.body_ref, p.timestamp
+            FROM posts p
+            LEFT JOIN post_signatures s ON s.post_id = p.id
+            WHERE s.post_id IS NULL
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+    return [(post_id, topic, title, _resolve(body, ref), timestamp) for post_id, topic, title, body, ref, timestamp in rows]
+
+
+# Content Store Functions
+
+_dictionaries: Dict[int, Optional[bytes]] = {0: None}
+_active_dictionary: Optional[int] = None
+_dictionary_lock = threading.Lock()
+
+
+def _load_dictionaries(conn, dict_ids: Iterable[int]) -> Dict[int, Optional[bytes]]:
+    missing = [dict_id for dict_id in dict_ids if dict_id not in _dictionaries]
+    if missing:
+        placeholders = ",".join("?" * len(missing))
+        for dict_id, data in conn.execute(f"SELECT id, data FROM content_dicts WHERE id IN ({placeholders})", missing):
+            _dictionaries[dict_id] = data
+    return _dictionaries
+
+
+def _decode(dict_id: int, data: bytes, dictionaries: Dict[int, Optional[bytes]]) -> str:
+    return decompress(data, dictionaries.get(dict_id))
+
+
+def _active_dictionary_id(conn) -> int:
+    global _active_dictionary
+    if _active_dictionary is None:
+        with _dictionary_lock:
+            if _active_dictionary is None:
+                _active_dictionary = conn.execute("SELECT COALESCE(MAX(id), 0) FROM content_dicts").fetchone()[0]
+    return _active_dictionary
+
+
+def _store_content(conn, text: str) -> int:
+    """Return the content-store id for ``text``, compressing and inserting it if new."""
+    digest = hashlib.blake2b(text.encode(), digest_size=16).digest()
+    row = conn.execute("SELECT id FROM content_blobs WHERE hash = ?", (digest,)).fetchone()
+    if row:
+        return row[0]
+    dict_id = _active_dictionary_id(conn)
+    zdict = _load_dictionaries(conn, [dict_id]).get(dict_id)
+    # Another connection may store the same text between the SELECT and the INSERT
+    conn.execute(
+        "INSERT INTO content_blobs (hash, dict_id, data, raw_size, created_at) VALUES (?, ?, ?, ?, ?)"
+        " ON CONFLICT(hash) DO NOTHING",
+        (digest, dict_id, compress(text, zdict), len(text), datetime.utcnow().isoformat()),
+    )
+    return conn.execute("SELECT id FROM content_blobs WHERE hash = ?", (digest,)).fetchone()[0]
+
+
+def store_content(text: str) -> int:
+    """Store ``text`` in the deduplicating content store and return its id."""
+    with get_conn() as conn:
+        content_id = _store_content(conn, text)
+        conn.commit()
+        return content_id
+
+
+@lru_cache(maxsize=CONTENT_CACHE_SIZE)
+def load_content(content_id: int) -> str:
+    """Return the text for a content-store id (cached; entries are immutable)."""
+    with get_conn() as conn:
+        row = conn.execute("SELECT dict_id, data FROM content_blobs WHERE id = ?", (content_id,)).fetchone()
+        if row is None:
+            return ""
+        return _decode(row[0], row[1], _load_dictionaries(conn, [row[0]]))
+
+
+def _resolve(inline: Optional[str], content_id: Optional[int]) -> str:
+    if content_id is None:
+        return inline or ""
+    return (inline or "") + load_content(content_id)
+
+
+def train_content_dictionary(sample_limit: int = 500) -> Optional[int]:
+    """Train a new shared dictionary from recent content; new writes use it. Returns its id."""
+    global _active_dictionary
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT dict_id, data FROM content_blobs ORDER BY id DESC LIMIT ?", (sample_limit,)
+        ).fetchall()
+        dictionaries = _load_dictionaries(conn, {row[0] for row in rows})
+        samples = [_decode(dict_id, data, dictionaries) for dict_id, data in rows]
+        samples += [
+            row[0]
+            for row in conn.execute(
+                "SELECT body FROM posts WHERE body_ref IS NULL AND body IS NOT NULL ORDER BY timestamp DESC LIMIT ?",
+                (sample_limit,),
+            )
+        ]
+        if len(samples) < MIN_TRAINING_SAMPLES:
+            return None
+        zdict = train_dictionary(samples)
+        dict_id = conn.execute(
+            "INSERT INTO content_dicts (data, created_at) VALUES (?, ?)", (zdict, datetime.utcnow().isoformat())
+        ).lastrowid
+        conn.commit()
+    with _dictionary_lock:
+        _dictionaries[dict_id] = zdict
+        _active_dictionary = dict_id
+    LOGGER.info("Trained content dictionary %s (%s bytes) from %s samples", dict_id, len(zdict), len(samples))
+    return dict_id
+
+
+_GENERATED_PREFIX = "Body: "
+
+
+def migrate_content_store(batch_size: int = 500) -> int:
+    """Move legacy inline post bodies and long messages into the content store.
+
+    Assistant messages that embed a post body keep only their short prefix inline and point
+    at the same entry as the post. Returns the number of rows migrated.
+    """
+    migrated = 0
+    while True:
+        with write_batch() as conn:
+            posts = conn.execute(
+                "SELECT id, body FROM posts WHERE body_ref IS NULL AND TRIM(COALESCE(body, '')) <> '' LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+            for post_id, body in posts:
+                conn.execute(
+                    "UPDATE posts SET body_ref = ?, body = NULL WHERE id = ?", (_store_content(conn, body), post_id)
+                )
+            messages = conn.execute(
+                """
+                SELECT id, content FROM messages
+                WHERE content_ref IS NULL
+                  AND (LENGTH(content) > ? OR (role = 'assistant' AND content LIKE 'Generated post - Title:%'))
+                LIMIT ?
+                """,
+                (INLINE_CONTENT_LIMIT, batch_size),
+            ).fetchall()
+            for message_id, content in messages:
+                inline, _, stored = content.partition(_GENERATED_PREFIX)
+                if not stored:
+                    inline, stored = "", content
+                else:
+                    inline += _GENERATED_PREFIX
+                conn.execute(
+                    "UPDATE messages SET content = ?, content_ref = ? WHERE id = ?",
+                    (inline, _store_content(conn, stored), message_id),
+                )
+        if not posts and not messages:
+            return migrated
+        migrated += len(posts) + len(messages)
+
+
+def prepare_content_store() -> None:
+    """Train the shared dictionary when due and migrate legacy rows (run at startup)."""
+    with get_conn() as conn:
+        latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM content_dicts").fetchone()[0]
+        since = conn.execute("SELECT COUNT(*) FROM content_blobs WHERE dict_id = ?", (latest,)).fetchone()[0]
+    if latest == 0 or since >= RETRAIN_AFTER_BLOBS:
+        train_content_dictionary()
+    migrated = migrate_content_store()
+    if migrated:
+        LOGGER.info("Moved %s rows into the content store; compacting database file", migrated)
+        conn = sqlite3.connect(DB_FILE, timeout=BUSY_TIMEOUT)
+        try:
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+
+
+def prune_content(older_than: str) -> int:
+    """Delete content entries created before ``older_than`` that nothing references any more."""
+    with get_conn() as conn:
+        cursor = conn.execute(
+            """
+            DELETE FROM content_blobs
+            WHERE created_at < ?
+              AND NOT EXISTS (SELECT 1 FROM posts WHERE posts.body_ref = content_blobs.id)
+              AND NOT EXISTS (SELECT 1 FROM messages WHERE messages.content_ref = content_blobs.id)
+              AND NOT EXISTS (SELECT 1 FROM post_queue WHERE post_queue.body_ref = content_blobs.id)
+            """,
+            (older_than,),
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+# Message Analytics Functions
+
+def fetch_provider_usage(since: str) -> List[Tuple[str, str, int, Optional[float], Optional[int], int, int]]:
+    """Per provider/model since ``since``: ``(provider, model, calls, avg_ms, max_ms, prompt, completion)``."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT meta_provider, COALESCE(meta_model, ''), COUNT(*), AVG(meta_latency_ms), MAX(meta_latency_ms),
+                   COALESCE(SUM(meta_prompt_tokens), 0), COALESCE(SUM(meta_completion_tokens), 0)
+            FROM messages
+            WHERE meta_provider IS NOT NULL AND timestamp >= ?
+            GROUP BY meta_provider, meta_model
+            ORDER BY COUNT(*) DESC, meta_provider, meta_model
+            """,
+            (since,),
+        ).fetchall()
+
+
+def fetch_topic_usage(since: str, limit: int = 20) -> List[Tuple[str, int, Optional[float]]]:
+    """Most generated topics since ``since``: ``(topic, generations, avg_latency_ms)``."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT meta_topic, COUNT(*), AVG(meta_latency_ms)
+            FROM messages
+            WHERE meta_topic IS NOT NULL AND timestamp >= ?
+            GROUP BY meta_topic
+            ORDER BY COUNT(*) DESC, meta_topic
+            LIMIT ?
+            """,
+            (since, limit),
+        ).fetchall()
+
+
+# LLM Telemetry Functions
+
+_llm_calls = WriteBehindBuffer(
+    """
+    INSERT INTO llm_calls (
+        created_at, provider, model, outcome, prompt_tokens, completion_tokens, ttfb_ms, latency_ms, attempt,
+        failover_reason, error, cost_usd
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+)
+
+
+def record_llm_call(
+    provider: str,
+    model: str,
+    outcome: str,
+    latency_ms: int,
+    ttfb_ms: Optional[int] = None,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None,
+    attempt: int = 0,
+    failover_reason: Optional[str] = None,
+    error: Optional[str] = None,
+    cost_usd: Optional[float] = None,
+) -> None:
+    """Queue one LLM call for the telemetry table (written in the background)."""
+    _llm_calls.add(
+        (
+            datetime.utcnow().isoformat(),
+            provider,
+            model,
+            outcome,
+            prompt_tokens,
+            completion_tokens,
+            ttfb_ms,
+            latency_ms,
+            attempt,
+            failover_reason,
+            error,
+            cost_usd,
+        )
+    )
+
+
+def flush_llm_calls() -> int:
+    return _llm_calls.flush()
+
+
+def fetch_llm_call_summary(since: str) -> List[Tuple]:
+    """Per provider/model since ``since``:
+    ``(provider, model, calls, errors, avg_ms, avg_ttfb_ms, prompt_tokens, completion_tokens, cost_usd, failovers)``.
+    """
+    _llm_calls.flush()
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT provider, model, COUNT(*), SUM(outcome = 'error'), AVG(latency_ms), AVG(ttfb_ms),
+                   COALESCE(SUM(prompt_tokens), 0), COALESCE(SUM(completion_tokens), 0), COALESCE(SUM(cost_usd), 0),
+                   SUM(failover_reason IS NOT NULL)
+            FROM llm_calls
+            WHERE created_at >= ?
+            GROUP BY provider, model
+            ORDER BY COUNT(*) DESC
+            """,
+            (since,),
+        ).fetchall()
+
+
+# Cross-worker coordination --------------------------------------------------------------
+
+
+def cache_get(key: str) -> Optional[str]:
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT value FROM shared_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+    return row[0] if row else None
+
+
+def cache_set(key: str, value: str, ttl: float) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO shared_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+        conn.commit()
+
+
+def cache_delete(key: str) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM shared_cache WHERE key = ?", (key,))
+        conn.commit()
+
+
+def prune_coordination() -> int:
+    """Drop expired cache entries, leases and rate limits. Returns the number of rows removed."""
+    now = time.time()
+    with get_conn() as conn:
+        removed = conn.execute("DELETE FROM shared_cache WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute("DELETE FROM rate_limits WHERE next_allowed <= ?", (now,)).rowcount
+        removed += conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,)).rowcount
+        conn.commit()
+    return removed
+
+
+def rate_limit_ready(key: str) -> bool:
+    with get_conn() as conn:
+        row = conn.execute("SELECT next_allowed FROM rate_limits WHERE key = ?", (key,)).fetchone()
+    return row is None or row[0] <= time.time()
+
+
+def reserve_rate_limit(key: str, interval: float) -> None:
+    """Push ``key``'s next allowed time to at least ``interval`` seconds from now."""
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO rate_limits (key, next_allowed) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET next_allowed = MAX(next_allowed, excluded.next_allowed)
+            """,
+            (key, time.time() + interval),
+        )
+        conn.commit()
+
+
+def fetch_rate_limits(prefix: str) -> Dict[str, float]:
+    """Rate limits under ``prefix`` that are still in force, mapped to their next allowed time."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            # A key range rather than LIKE, so the primary key index is used
+            "SELECT key, next_allowed FROM rate_limits WHERE key >= ? AND key < ? AND next_allowed > ?",
+            (prefix, prefix + "\uffff", time.time()),
+        ).fetchall()
+    return dict(rows)
+
+
+def record_provider_result(provider: str, ok: bool, error: Optional[str] = None) -> None:
+    """Reset a provider's failure streak, or extend its cooldown after another failure."""
+    now = time.time()
+    with get_conn() as conn:
+        if ok:
+            # Even an UPDATE matching no row takes the write lock, so check for a streak first
+            # and keep healthy calls read-only
+            row = conn.execute("SELECT failures FROM provider_health WHERE provider = ?", (provider,)).fetchone()
+            if not row or not row[0]:
+                return
+            conn.execute(
+                "UPDATE provider_health SET failures = 0, cooldown_until = 0, updated_at = ? WHERE provider = ? AND failures > 0",
+                (now, provider),
+            )
+        else:
+            conn.execute(
+                """
+                INSERT INTO provider_health (provider, failures, cooldown_until, last_error, updated_at)
+                VALUES (?, 1, ? + ?, ?, ?)
+                ON CONFLICT(provider) DO UPDATE SET
+                    failures = failures + 1,
+                    cooldown_until = ? + MIN(?, ? * (1 << MIN(failures, 16))),
+                    last_error = excluded.last_error,
+                    updated_at = excluded.updated_at
+                """,
+                (provider, now, PROVIDER_COOLDOWN_BASE, (error or "")[:300], now,
+                 now, PROVIDER_COOLDOWN_MAX, PROVIDER_COOLDOWN_BASE),
+            )
+        conn.commit()
+
+
+def fetch_provider_cooldowns() -> Dict[str, float]:
+    """Providers currently cooling down, mapped to the epoch time they become eligible again."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT provider, cooldown_until FROM provider_health WHERE cooldown_until > ?", (time.time(),)
+        ).fetchall()
+    return dict(rows)
+
+
+def acquire_lease(name: str, owner: str, ttl: float) -> bool:
+    """Take or renew the lease ``name`` for ``ttl`` seconds. ``False`` if another owner holds it."""
+    now = time.time()
+    with get_conn() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE leases.owner = excluded.owner OR leases.expires_at <= ?
+            """,
+            (name, owner, now + ttl, now),
+        )
+        conn.commit()
+    return cursor.rowcount == 1
+
+
+def release_lease(name: str, owner: str) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+        conn.commit()
+
+
+def claim_idempotency_key(
+    key: str, fingerprint: str, owner: str, ttl: float
+) -> Tuple[str, Optional[int], Optional[str]]:
+    """Try to start the request ``key``. Returns ``(state, status_code, response)``.
+
+    ``state`` is ``claimed`` when this caller must run the request (the key was free or its
+    previous run expired), ``running`` while another caller runs it, ``done`` with the stored
+    response, or ``mismatch`` when the key was used for a different request.
+    """
+    now = time.time()
+    with get_conn() as conn:
+        cursor = conn.execute(
+            """
+            INSERT INTO idempotency_keys (key, fingerprint, state, owner, expires_at) VALUES (?, ?, 'running', ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                fingerprint = excluded.fingerprint, state = 'running', owner = excluded.owner,
+                status_code = NULL, response = NULL, expires_at = excluded.expires_at
+            WHERE idempotency_keys.expires_at <= ?
+            """,
+            (key, fingerprint, owner, now + ttl, now),
+        )
+        conn.commit()
+        if cursor.rowcount == 1:
+            return "claimed", None, None
+        row = conn.execute(
+            "SELECT fingerprint, state, status_code, response FROM idempotency_keys WHERE key = ?", (key,)
+        ).fetchone()
+    if row is None:
+        # Pruned between the two statements; the caller simply tries again
+        return "running", None, None
+    if row[0] != fingerprint:
+        return "mismatch", None, None
+    return row[1], row[2], row[3]
+
+
+def complete_idempotency_key(key: str, owner: str, status_code: int, response: str, ttl: float) -> None:
+    """Store the response of a claimed request for replay during ``ttl`` seconds."""
+    with get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE idempotency_keys SET state = 'done', status_code = ?, response = ?, expires_at = ?
+            WHERE key = ? AND owner = ?
+            """,
+            (status_code, response, time.time() + ttl, key, owner),
+        )
+        conn.commit()
+
+
+def release_idempotency_key(key: str, owner: str) -> None:
+    """Forget a claimed request that failed, so a retry runs it again."""
+    with get_conn() as conn:
+        conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND owner = ?", (key, owner))
+        conn.commit()
+
+
+# Engagement Model Functions
+
+def fetch_engagement_model(name: str) -> Optional[Tuple[str, int, str, str]]:
+    """``(trained_through, samples, state_json, updated_at)``."""
+    with get_conn() as conn:
+        return conn.execute(
+            "SELECT trained_through, samples, state, updated_at FROM engagement_models WHERE name = ?", (name,)
+        ).fetchone()
+
+
+def save_engagement_model(name: str, trained_through: str, samples: int, state: str) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO engagement_models (name, trained_through, samples, state, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (name, trained_through, samples, state, datetime.utcnow().isoformat()),
+        )
+        conn.commit()
+
+
+# Bulk Import Functions
+
+
+def start_import_job(job_id: str, source: str, fmt: str) -> Tuple[str, int, int, int, int]:
+    """Create or reopen an import job. Returns ``(status, rows_done, inserted, skipped, enriched)``."""
+    now = datetime.utcnow().isoformat()
+    with get_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO import_jobs (id, source, format, status, started_at, updated_at) VALUES (?, ?, ?, 'running', ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                source = excluded.source,
+                status = CASE WHEN status = 'completed' THEN status ELSE 'running' END,
+                error = NULL,
+                updated_at = excluded.updated_at
+            """,
+            (job_id, source, fmt, now, now),
+        )
+        conn.commit()
+        return conn.execute(
+            "SELECT status, rows_done, inserted, skipped, enriched FROM import_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+
+
+def record_import_progress(job_id: str, rows_done: int, inserted: int, skipped: int, enriched: int) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            """
+            UPDATE import_jobs SET rows_done = ?, inserted = ?, skipped = ?, enriched = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (rows_done, inserted, skipped, enriched, datetime.utcnow().isoformat(), job_id),
+        )
+        conn.commit()
+
+
+def finish_import_job(job_id: str, error: Optional[str] = None) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE import_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            ("failed" if error else "completed", error, datetime.utcnow().isoformat(), job_id),
+        )
+        conn.commit()
+
+
+def fetch_import_job(job_id: str) -> Optional[Tuple]:
+    """``(id, source, format, status, rows_done, inserted, skipped, enriched, error, started_at, updated_at)``."""
+    with get_conn() as conn:
+        return conn.execute(
+            """
+            SELECT id, source, format, status, rows_done, inserted, skipped, enriched, error, started_at, updated_at
+            FROM import_jobs WHERE id = ?
+            """,
+            (job_id,),
+        ).fetchone()
@@ -1,30 +1,40 @@
 from __future__ import annotations
 
+import asyncio
 import csv
+import hashlib
+import hmac
+import importlib
 import io
+import json
 import logging
-from datetime import datetime
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+import anyio.to_thread
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from .config import get_decrypted_config, save_config
-from .constants import BASE_DIR
+from .admission import AdmissionMiddleware, admission_stats, render_prometheus as render_admission_metrics
+from .config import get_decrypted_config, key_pool_entries, save_config
+from .constants import ADMIN_TOKEN, BASE_DIR, STARTUP_MODE
 from .database import (
-    fetch_all_posts,
-    fetch_posts_for_date,
-    fetch_recent_posts,
-    fetch_stats,
-    get_conn,
-    get_conversation_history,
-    get_recent_conversations,
+    cancel_submission,
+    decode_metadata,
+    fetch_import_job,
+    fetch_llm_call_summary,
+    fetch_queue,
+    fetch_trend_first_seen,
+    fetch_trend_longevity,
     init_db,
-    iter_posts_for_refresh,
-    update_metrics,
+    prepare_content_store,
+    start_import_job,
 )
 from .models import (
     ConfigResponse,
@@ -36,17 +46,51 @@ from .models import (
     GeneratedPost,
     HistoryEntry,
     HistoryResponse,
+    ImportJobResponse,
+    KeyPoolsResponse,
+    LLMCallSummaryEntry,
+    LLMCallSummaryResponse,
+    LocalSection,
     MessageResponse,
+    ProviderUsageEntry,
+    QueueEntry,
+    QueueResponse,
+    RedditSection,
     StatsResponse,
+    TopicPerformanceEntry,
+    TopicPerformanceResponse,
+    TopicUsageEntry,
+    TrendFirstSeenResponse,
+    TrendLongevityEntry,
+    TrendLongevityResponse,
+    TrendRegionSighting,
+    UsageAnalyticsResponse,
 )
+from .services.coordination import Lease
+from .services.dedup import backfill_signatures
 from .services.groq import GroqError
-from .services.reddit_service import RedditAuthError, fetch_submission_stats, get_reddit_client
+from .services.idempotency import IdempotencyInProgress, IdempotencyMismatch, run_once
+from .services.importer import FORMATS as IMPORT_FORMATS, ImportFormatError, run_import
+from .services.importer import detect_format as detect_import_format
+from .services.llm_providers import get_key_pool
+from .services.memory import compact_memory, get_compactor
+from .services.pregen import get_pregenerator
+from .services.reddit_service import RedditAuthError, fetch_many_submission_stats, get_reddit_client
+from .services.router import routing_stats
+from .services.scheduler import ACCOUNT_SECTION_PREFIX, DEFAULT_ACCOUNT, get_scheduler, reddit_accounts
 from .services.tasks import generate_posts
+from .services.telemetry import record_route, render_prometheus, route_stats
+from .services.topics import normalize_topic
+from .profiling import ProfilerBusyError, get_profiler
+from .storage import get_storage
+from .tracing import finish_trace, span
 
 LOGGER = logging.getLogger("taskpilot.api")
 FRONTEND_DIR = BASE_DIR / "frontend"
 
 app = FastAPI(title="TaskPilot API", version="2.0.0")
+# Innermost, so rejected requests still get CORS headers and are traced
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -56,10 +100,129 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    """Trace every API request and add it to the per-route latency histograms."""
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    root = None
+    status = 500
+    started = time.perf_counter()
+    try:
+        with span(f"{request.method} {request.url.path}", root=True, **{"http.method": request.method}) as root:
+            response = await call_next(request)
+            status = response.status_code
+            root.set(**{"http.status_code": status})
+            response.headers["X-Trace-Id"] = root.trace_id
+            return response
+    finally:
+        # Group by route template so path parameters do not explode the label set
+        route = request.scope.get("route")
+        record_route(request.method, getattr(route, "path", "<unmatched>"), status, (time.perf_counter() - started) * 1000)
+        if root is not None:
+            finish_trace(root)
+
+
+# Modules kept off the import path of worker boot that the first real request would
+# otherwise pay for.
+PRELOAD_MODULES = (
+    "praw",
+    "feedparser",
+    "cryptography.fernet",
+    "backend.services.llm_providers.groq_adapter",
+    "backend.services.llm_providers.google_adapter",
+    "backend.services.llm_providers.openai_adapter",
+)
+
+
+def _preload_modules() -> None:
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+
+
+# Long enough to cover a content-store migration of a large legacy database.
+MAINTENANCE_LEASE_TTL = 900.0
+
+
+def _one_worker_at_a_time(name: str, step: Callable[[], object]) -> Callable[[], None]:
+    """Wrap a startup step so concurrently booting workers do not all run it at once."""
+
+    def run() -> None:
+        lease = Lease(f"startup:{name}", ttl=MAINTENANCE_LEASE_TTL)
+        if not lease.renew():
+            LOGGER.info("Skipping %s; another worker is running it", name)
+            return
+        try:
+            step()
+        finally:
+            lease.release()
+
+    return run
+
+
+WARMUP_STEPS: Tuple[Tuple[str, Callable[[], object]], ...] = (
+    ("content_store", _one_worker_at_a_time("content_store", prepare_content_store)),
+    ("signatures", _one_worker_at_a_time("signatures", backfill_signatures)),
+    ("scheduler", lambda: get_scheduler().start()),
+    ("compactor", lambda: get_compactor().start()),
+    ("pregen", lambda: get_pregenerator().start()),
+    ("imports", _preload_modules),
+)
+_warmup_pending: List[str] = []
+_warmup_failed: Dict[str, str] = {}
+
+
+def _warm_up() -> None:
+    for name, step in WARMUP_STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as exc:
+            LOGGER.exception("Warm-up step %s failed", name)
+            _warmup_failed[name] = str(exc)
+        finally:
+            _warmup_pending.remove(name)
+        LOGGER.info("Warm-up step %s took %.0f ms", name, (time.perf_counter() - started) * 1000)
+
+
 @app.on_event("startup")
 def on_startup():
     init_db()
+    get_storage().migrate()
     FRONTEND_DIR.mkdir(exist_ok=True)
+    _warmup_pending[:] = [name for name, _ in WARMUP_STEPS]
+    _warmup_failed.clear()
+    if STARTUP_MODE == "fast":
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        _warm_up()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    get_scheduler().stop()
+    get_compactor().stop()
+    get_pregenerator().stop()
+    get_storage().close()
+
+
+# Health --------------------------------------------------------------------
+
+
+@app.get("/api/health/live")
+def health_live():
+    """The process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/api/health/ready")
+def health_ready(response: Response):
+    """Warm-up has finished; 503 while steps are still pending or any of them failed."""
+    pending, failed = list(_warmup_pending), dict(_warmup_failed)
+    status = "failed" if failed else "warming" if pending else "ready"
+    if status != "ready":
+        response.status_code = 503
+    return {"status": status, "pending": pending, "failed": failed}
 
 
 # Static assets -------------------------------------------------------------
@@ -83,17 +246,24 @@ def serve_index():
 def get_config():
     cfg = get_decrypted_config()
     return ConfigResponse(
-        GROQ={"api_key": cfg["GROQ"].get("api_key", ""), "model": cfg["GROQ"].get("model", "")},
+        GROQ={
+            "api_key": cfg["GROQ"].get("api_key", ""),
+            "api_keys": key_pool_entries(cfg["GROQ"]),
+            "model": cfg["GROQ"].get("model", ""),
+        },
         GOOGLE={
             "api_key": cfg["GOOGLE"].get("api_key", ""),
+            "api_keys": key_pool_entries(cfg["GOOGLE"]),
             "model": cfg["GOOGLE"].get("model", ""),
             "project_name": cfg["GOOGLE"].get("project_name", ""),
             "project_number": cfg["GOOGLE"].get("project_number", ""),
         },
         OPENAI={
             "api_key": cfg["OPENAI"].get("api_key", ""),
+            "api_keys": key_pool_entries(cfg["OPENAI"]),
             "model": cfg["OPENAI"].get("model", ""),
         },
+        LOCAL=LocalSection(**{key: cfg["LOCAL"].get(key) or default for key, default in LocalSection().dict().items()}),
         REDDIT={
             "client_id": cfg["REDDIT"].get("client_id", ""),
             "client_secret": cfg["REDDIT"].get("client_secret", ""),
@@ -102,6 +272,11 @@ def get_config():
             "refresh_token": cfg["REDDIT"].get("refresh_token", ""),
             "user_agent": cfg["REDDIT"].get("user_agent", ""),
         },
+        REDDIT_ACCOUNTS={
+            name: RedditSection(**{key: section.get(key, "") for key in RedditSection.__fields__})
+            for name, section in reddit_accounts(cfg).items()
+            if name != DEFAULT_ACCOUNT
+        },
     )
 
 
@@ -114,19 +289,60 @@ def update_config(body: ConfigUpdate):
         payload["GOOGLE"] = body.GOOGLE.dict()
     if body.OPENAI is not None:
         payload["OPENAI"] = body.OPENAI.dict()
+    if body.LOCAL is not None:
+        payload["LOCAL"] = body.LOCAL.dict()
     if body.REDDIT is not None:
         payload["REDDIT"] = body.REDDIT.dict()
+    for name, account in (body.REDDIT_ACCOUNTS or {}).items():
+        name = name.strip()
+        if not name or name == DEFAULT_ACCOUNT:
+            raise HTTPException(status_code=400, detail=f"Invalid Reddit account name '{name}'.")
+        payload[f"{ACCOUNT_SECTION_PREFIX}{name}"] = account.dict()
     if not payload:
         raise HTTPException(status_code=400, detail="No configuration fields supplied")
     save_config(payload)
     return MessageResponse(message="Configuration saved successfully.")
 
 
+@app.get("/api/config/keys", response_model=KeyPoolsResponse)
+def get_key_pools():
+    """Per-key load, quota use and parking for each provider's key pool (keys by fingerprint)."""
+    cfg = get_decrypted_config()
+    return KeyPoolsResponse(
+        pools={name.lower(): get_key_pool(name.lower(), cfg.get(name, {})).status() for name in ("GROQ", "GOOGLE", "OPENAI")}
+    )
+
+
 # Generation ---------------------------------------------------------------
 
 
-@app.post("/api/generate", response_model=GenerateResponse)
-def generate_content(body: GenerateRequest):
+def _idempotent(scope: str, key: Optional[str], payload: object, response: Response, handler: Callable[[], object]):
+    """Run ``handler`` at most once per idempotency key (or identical in-flight request).
+
+    Replayed responses carry ``Idempotent-Replayed: true``; a replayed error is raised again.
+    """
+
+    def execute() -> Tuple[int, object]:
+        try:
+            result = handler()
+        except HTTPException as exc:
+            return exc.status_code, {"detail": exc.detail}
+        return 200, result.dict()
+
+    try:
+        status_code, body, replayed = run_once(scope, key, payload, execute)
+    except IdempotencyMismatch as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except IdempotencyInProgress as exc:
+        raise HTTPException(status_code=409, detail=str(exc), headers={"Retry-After": "5"}) from exc
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    if status_code >= 400:
+        raise HTTPException(status_code=status_code, detail=body.get("detail"))
+    return body
+
+
+def _generate(body: GenerateRequest) -> GenerateResponse:
     try:
         posts = generate_posts(body)
     except GroqError as exc:
@@ -144,12 +360,56 @@ def generate_content(body: GenerateRequest):
     )
 
 
+@app.post("/api/generate", response_model=GenerateResponse)
+def generate_content(body: GenerateRequest, response: Response, idempotency_key: Optional[str] = Header(default=None)):
+    return _idempotent("generate", idempotency_key, body.dict(), response, lambda: _generate(body))
+
+
+@app.get("/api/drafts/pool")
+def get_draft_pool():
+    """Pre-generated drafts waiting per combination, and today's pre-generation spend."""
+    return get_pregenerator().status()
+
+
+# Posting queue ------------------------------------------------------------
+
+
+@app.get("/api/queue", response_model=QueueResponse)
+def get_queue(status: str = "", limit: int = 50):
+    rows = fetch_queue(status, limit)
+    return QueueResponse(
+        items=[
+            QueueEntry(
+                id=row[0],
+                post_id=row[1],
+                account=row[2],
+                subreddit=row[3],
+                title=row[4],
+                publish_at=row[5],
+                status=row[6],
+                attempts=row[7],
+                next_attempt_at=row[8],
+                last_error=row[9],
+                link=row[10],
+            )
+            for row in rows
+        ]
+    )
+
+
+@app.post("/api/queue/{queue_id}/cancel", response_model=MessageResponse)
+def cancel_queued_post(queue_id: int):
+    if not cancel_submission(queue_id):
+        raise HTTPException(status_code=404, detail="No pending submission with that id.")
+    return MessageResponse(message="Submission cancelled.")
+
+
 # History & stats ----------------------------------------------------------
 
 
 @app.get("/api/history", response_model=HistoryResponse)
 def get_history(limit: int = 50):
-    rows = fetch_recent_posts(limit)
+    rows = get_storage().fetch_recent_posts(limit)
     return HistoryResponse(
         items=[
             HistoryEntry(
@@ -166,40 +426,31 @@ def get_history(limit: int = 50):
     )
 
 
+def _cached_json(request: Request, payload: dict) -> Response:
+    """Serve ``payload`` with an ETag so dashboard polling revalidates with a cheap 304."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/api/stats", response_model=StatsResponse)
-def get_stats():
-    total, today, auto = fetch_stats()
-    return StatsResponse(total_posts=total, today_posts=today, auto_posts=auto)
+def get_stats(request: Request):
+    total, today, auto = get_storage().fetch_stats()
+    return _cached_json(request, StatsResponse(total_posts=total, today_posts=today, auto_posts=auto).dict())
 
 
 @app.get("/api/memory/stats")
-def get_memory_stats():
+def get_memory_stats(request: Request):
     """Get memory and conversation analytics."""
-    with get_conn() as conn:
-        # Conversation stats
-        conv_count = conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
-        msg_count = conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
-
-        # Recent activity
-        recent_convs = conn.execute(
-            "SELECT COUNT(*) FROM conversations WHERE updated_at >= datetime('now', '-7 days')"
-        ).fetchone()[0]
-
-        # Top personas
-        top_personas = conn.execute(
-            """
-            SELECT persona, COUNT(*) as count
-            FROM conversations
-            GROUP BY persona
-            ORDER BY count DESC
-            LIMIT 5
-            """
-        ).fetchall()
-
-        # Memory insights
-        total_memory_items = conn.execute("SELECT COUNT(*) FROM messages WHERE role = 'assistant'").fetchone()[0]
+    counters, recent_convs, top_personas = get_storage().fetch_memory_stats()
+    conv_count = counters.get("conversations", 0)
+    msg_count = counters.get("messages", 0)
+    total_memory_items = counters.get("messages_assistant", 0)
 
-    return {
+    return _cached_json(request, {
         "conversations": conv_count,
         "messages": msg_count,
         "recent_activity": recent_convs,
@@ -211,33 +462,153 @@ def get_memory_stats():
             f"Most active persona: {top_personas[0][0] if top_personas else 'None'}",
             f"AI has {total_memory_items} memory items to learn from"
         ]
-    }
+    })
+
+
+# Trend analytics ----------------------------------------------------------
+
+
+@app.get("/api/trends/longevity", response_model=TrendLongevityResponse)
+def get_trend_longevity(region: str = "united_states", limit: int = 20):
+    rows = fetch_trend_longevity(region, limit)
+    return TrendLongevityResponse(
+        region=region,
+        items=[
+            TrendLongevityEntry(
+                topic=row[0],
+                first_seen=row[1],
+                last_seen=row[2],
+                sightings=row[3],
+                lifetime_hours=round(row[4] / 3600, 2),
+            )
+            for row in rows
+        ],
+    )
+
+
+@app.get("/api/trends/first-seen", response_model=TrendFirstSeenResponse)
+def get_trend_first_seen(topic: str):
+    found = fetch_trend_first_seen(normalize_topic(topic))
+    if found is None:
+        raise HTTPException(status_code=404, detail="Topic has not been seen in any trend snapshot.")
+    label, first_seen, last_seen, regions = found
+    return TrendFirstSeenResponse(
+        topic=label,
+        first_seen=first_seen,
+        last_seen=last_seen,
+        regions=[
+            TrendRegionSighting(region=row[0], first_seen=row[1], last_seen=row[2], sightings=row[3])
+            for row in regions
+        ],
+    )
+
+
+@app.get("/api/trends/performance", response_model=TopicPerformanceResponse)
+def get_topic_performance(limit: int = 20):
+    rows = get_storage().fetch_topic_performance(limit)
+    return TopicPerformanceResponse(
+        items=[
+            TopicPerformanceEntry(
+                topic=row[0],
+                first_seen=row[1],
+                posts=row[2],
+                total_upvotes=row[3] or 0,
+                total_comments=row[4] or 0,
+                avg_upvotes=round(row[5] or 0, 2),
+                avg_comments=round(row[6] or 0, 2),
+            )
+            for row in rows
+        ]
+    )
+
+
+@app.get("/api/analytics/usage", response_model=UsageAnalyticsResponse)
+def get_usage_analytics(days: int = 30, limit: int = 20):
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    storage = get_storage()
+    return UsageAnalyticsResponse(
+        since=since,
+        providers=[
+            ProviderUsageEntry(
+                provider=row[0],
+                model=row[1],
+                generations=row[2],
+                avg_latency_ms=round(row[3], 1) if row[3] is not None else None,
+                max_latency_ms=row[4],
+                prompt_tokens=row[5],
+                completion_tokens=row[6],
+            )
+            for row in storage.fetch_provider_usage(since)
+        ],
+        topics=[
+            TopicUsageEntry(
+                topic=row[0], generations=row[1], avg_latency_ms=round(row[2], 1) if row[2] is not None else None
+            )
+            for row in storage.fetch_topic_usage(since, limit)
+        ],
+    )
+
+
+@app.get("/api/analytics/llm-calls", response_model=LLMCallSummaryResponse)
+def get_llm_call_summary(days: int = 7):
+    since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+    return LLMCallSummaryResponse(
+        since=since,
+        items=[
+            LLMCallSummaryEntry(
+                provider=row[0],
+                model=row[1],
+                calls=row[2],
+                errors=row[3] or 0,
+                avg_latency_ms=round(row[4], 1) if row[4] is not None else None,
+                avg_ttfb_ms=round(row[5], 1) if row[5] is not None else None,
+                prompt_tokens=row[6],
+                completion_tokens=row[7],
+                cost_usd=round(row[8], 6),
+                failovers=row[9] or 0,
+            )
+            for row in fetch_llm_call_summary(since)
+        ],
+    )
+
+
+@app.get("/api/analytics/routing")
+def get_routing_stats():
+    """What the model router has observed in this worker, per provider, model and task."""
+    from .services.llm_providers.local_adapter import batcher_stats  # adapters load on first use
+
+    return {"routes": routing_stats(), "local_batches": batcher_stats()}
+
+
+@app.get("/api/metrics")
+def get_metrics():
+    return PlainTextResponse(render_prometheus() + render_admission_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/api/refresh", response_model=MessageResponse)
-def refresh_engagement():
+def refresh_engagement(response: Response, idempotency_key: Optional[str] = Header(default=None)):
+    return _idempotent("refresh", idempotency_key, {}, response, _refresh_engagement)
+
+
+def _refresh_engagement() -> MessageResponse:
     cfg = get_decrypted_config()
-    reddit = get_reddit_client(cfg["REDDIT"])
+    try:
+        reddit = get_reddit_client(cfg["REDDIT"])
+    except RedditAuthError as exc:
+        raise HTTPException(status_code=401, detail=str(exc)) from exc
     if reddit is None:
         raise HTTPException(status_code=400, detail="Reddit credentials missing. Add them in Settings.")
 
-    updates = []
-    for post_id, link in iter_posts_for_refresh():
-        try:
-            score, comments = fetch_submission_stats(reddit, link)
-        except Exception as exc:
-            LOGGER.warning("Failed to fetch stats for %s: %s", link, exc)
-            continue
-        updates.append((post_id, score, comments))
-
-    update_metrics(updates)
+    storage = get_storage()
+    updates = fetch_many_submission_stats(cfg["REDDIT"], storage.iter_posts_for_refresh())
+    storage.update_metrics(updates)
     return MessageResponse(message=f"Updated {len(updates)} posts.")
 
 
 @app.get("/api/summary")
 def download_summary(format: str = "txt"):
     today = datetime.utcnow().date().isoformat()
-    rows = fetch_posts_for_date(today)
+    rows = get_storage().fetch_posts_for_date(today)
 
     if format == "txt":
         if not rows:
@@ -271,7 +642,7 @@ def download_summary(format: str = "txt"):
                 "Timestamp",
             ]
         )
-        for row in fetch_all_posts():
+        for row in get_storage().fetch_all_posts():
             writer.writerow(row)
         buffer.seek(0)
         headers = {"Content-Disposition": "attachment; filename=taskpilot-history.csv"}
@@ -284,7 +655,7 @@ def download_summary(format: str = "txt"):
 
 @app.get("/api/conversations", response_model=ConversationsResponse)
 def get_conversations(limit: int = 20):
-    conversations = get_recent_conversations(limit)
+    conversations = get_storage().get_recent_conversations(limit)
     return ConversationsResponse(
         conversations=[
             {
@@ -300,8 +671,12 @@ def get_conversations(limit: int = 20):
 
 
 @app.get("/api/conversations/{conversation_id}", response_model=ConversationHistory)
-def get_conversation(conversation_id: str):
-    messages = get_conversation_history(conversation_id)
+def get_conversation(conversation_id: str, include_archived: bool = False):
+    storage = get_storage()
+    messages = storage.get_conversation_history(conversation_id)
+    summary = storage.get_conversation_summary(conversation_id)
+    if include_archived and summary:
+        messages = storage.fetch_archived_messages(conversation_id) + list(messages)
     return ConversationHistory(
         conversation_id=conversation_id,
         messages=[
@@ -309,8 +684,177 @@ def get_conversation(conversation_id: str):
                 "role": msg[0],
                 "content": msg[1],
                 "timestamp": msg[2],
-                "metadata": msg[3],
+                "metadata": decode_metadata(msg[3]),
             }
             for msg in messages
-        ]
+        ],
+        summary=summary[0] if summary else None,
+        archived_messages=summary[1] if summary else 0,
     )
+
+
+@app.post("/api/memory/compact", response_model=MessageResponse)
+def compact_conversation_memory(
+    response: Response,
+    older_than_days: int = Query(14, ge=1),
+    use_llm: Optional[bool] = None,
+    idempotency_key: Optional[str] = Header(default=None),
+):
+    def compact() -> MessageResponse:
+        conversations, messages = compact_memory(timedelta(days=older_than_days), use_llm)
+        return MessageResponse(message=f"Compacted {messages} messages across {conversations} conversations.")
+
+    payload = {"older_than_days": older_than_days, "use_llm": use_llm}
+    return _idempotent("memory-compact", idempotency_key, payload, response, compact)
+
+
+# Admin: profiling -----------------------------------------------------------
+
+
+def require_admin(x_admin_token: str = Header(default="")) -> None:
+    # Without a configured token the admin surface does not exist
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def _collapsed_response() -> PlainTextResponse:
+    profiler = get_profiler()
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
+
+
+@app.post("/api/admin/profile/start", dependencies=[Depends(require_admin)])
+async def start_profile(seconds: float = 30.0, interval_ms: float = 10.0, wait: bool = False):
+    profiler = get_profiler()
+    try:
+        profiler.start(seconds, interval_ms / 1000)
+    except ProfilerBusyError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    if not wait:
+        return profiler.status()
+    # Poll instead of blocking a worker thread, so the profile sees real threadpool load
+    while profiler.running:
+        await asyncio.sleep(0.1)
+    return _collapsed_response()
+
+
+@app.post("/api/admin/profile/stop", dependencies=[Depends(require_admin)])
+async def stop_profile():
+    get_profiler().stop()
+    return _collapsed_response()
+
+
+@app.get("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def get_profile(format: str = "collapsed"):
+    if format == "status":
+        return get_profiler().status()
+    return _collapsed_response()
+
+
+@app.get("/api/admin/routes", dependencies=[Depends(require_admin)])
+async def get_route_latency():
+    # Must run on the event loop: the limiter belongs to it
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    in_use = limiter.borrowed_tokens
+    return {
+        "routes": route_stats(),
+        "threadpool": {
+            "capacity": limiter.total_tokens,
+            "in_use": in_use,
+            "waiting": limiter.statistics().tasks_waiting,
+            "saturation": round(in_use / limiter.total_tokens, 3) if limiter.total_tokens else 0.0,
+            "threads": threading.active_count(),
+        },
+        "admission": admission_stats(),
+    }
+
+
+# Admin: bulk import ---------------------------------------------------------
+
+# Uploads are hashed as they stream in, so the job id matches what the CLI would compute and
+# re-uploading the same file after an interruption resumes it.
+_import_threads: Dict[str, threading.Thread] = {}
+_import_lock = threading.Lock()
+
+
+def _run_upload_import(path: Path, fmt: str, enrich: bool, job_id: str, source: str) -> None:
+    try:
+        run_import(path, fmt, enrich, job_id=job_id, source=source)
+    except Exception:
+        LOGGER.exception("Import %s failed", job_id)
+    finally:
+        path.unlink(missing_ok=True)
+        with _import_lock:
+            _import_threads.pop(job_id, None)
+
+
+def _import_job_response(job_id: str) -> ImportJobResponse:
+    row = fetch_import_job(job_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    fields = ("job_id", "source", "format", "status", "rows_done", "inserted", "skipped", "enriched", "error",
+              "started_at", "updated_at")
+    return ImportJobResponse(**dict(zip(fields, row)))
+
+
+# Received chunks are written to disk in batches of this size, off the event loop.
+UPLOAD_FLUSH_BYTES = 1 << 20
+
+
+def _start_upload_import(path: Path, format: Optional[str], enrich: bool, job_id: str, name: str) -> ImportJobResponse:
+    try:
+        fmt = format or detect_import_format(path)
+    except ImportFormatError as exc:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    # Registers the job (or reopens an interrupted one) before the response is built
+    start_import_job(job_id, name, fmt)
+
+    with _import_lock:
+        running = job_id in _import_threads
+        if not running:
+            thread = threading.Thread(
+                target=_run_upload_import, args=(path, fmt, enrich, job_id, name), name=f"import-{job_id[:8]}", daemon=True
+            )
+            _import_threads[job_id] = thread
+            thread.start()
+    if running:
+        path.unlink(missing_ok=True)
+    return _import_job_response(job_id)
+
+
+@app.post("/api/admin/import", status_code=202, response_model=ImportJobResponse, dependencies=[Depends(require_admin)])
+async def start_import(request: Request, format: Optional[str] = None, enrich: bool = False, name: str = "upload"):
+    if format is not None and format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(IMPORT_FORMATS)}")
+    digest = hashlib.sha256()
+    # File and database work runs in the threadpool so a large upload or a locked database
+    # never stalls the event loop
+    handle = await anyio.to_thread.run_sync(
+        lambda: tempfile.NamedTemporaryFile(prefix="taskpilot-import-", suffix=Path(name).suffix, delete=False)
+    )
+    path = Path(handle.name)
+    try:
+        pending: List[bytes] = []
+        pending_bytes = 0
+        async for chunk in request.stream():
+            digest.update(chunk)
+            pending.append(chunk)
+            pending_bytes += len(chunk)
+            if pending_bytes >= UPLOAD_FLUSH_BYTES:
+                await anyio.to_thread.run_sync(handle.write, b"".join(pending))
+                pending, pending_bytes = [], 0
+        await anyio.to_thread.run_sync(handle.write, b"".join(pending))
+        await anyio.to_thread.run_sync(handle.close)
+    except BaseException:
+        handle.close()
+        path.unlink(missing_ok=True)
+        raise
+    job_id = digest.hexdigest()[:32]
+    return await anyio.to_thread.run_sync(_start_upload_import, path, format, enrich, job_id, name)
+
+
+@app.get("/api/admin/import/{job_id}", response_model=ImportJobResponse, dependencies=[Depends(require_admin)])
+def get_import(job_id: str):
+    return _import_job_response(job_id)
@@ -1,17 +1,28 @@
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 
 from .constants import CONTENT_LENGTH_PRESETS, DEFAULT_CONFIG
 
 
+class ApiKeyEntry(BaseModel):
+    key: str
+    weight: int = Field(default=1, ge=1, description="Relative share of calls")
+    rpm: int = Field(default=0, ge=0, description="Calls per minute this key may make; 0 for no limit")
+
+
 class ConfigSection(BaseModel):
     api_key: str = ""
+    api_keys: Optional[List[ApiKeyEntry]] = Field(
+        default=None, description="Extra keys pooled with api_key; omit to keep the stored pool"
+    )
     model: str = DEFAULT_CONFIG["GROQ"]["model"]
 
 
 class GoogleSection(BaseModel):
     api_key: str = ""
+    api_keys: Optional[List[ApiKeyEntry]] = None
     model: str = DEFAULT_CONFIG["GOOGLE"]["model"]
     project_name: str = ""
     project_number: str = ""
@@ -19,9 +30,18 @@ class GoogleSection(BaseModel):
 
 class OpenAISection(BaseModel):
     api_key: str = ""
+    api_keys: Optional[List[ApiKeyEntry]] = None
     model: str = DEFAULT_CONFIG["OPENAI"]["model"]
 
 
+class LocalSection(BaseModel):
+    base_url: str = Field(default="", description="OpenAI-compatible base URL, e.g. http://10.0.0.5:8080/v1")
+    api_key: str = ""
+    model: str = Field(default=DEFAULT_CONFIG["LOCAL"]["model"], description="Served model name prefixed with 'local/'")
+    batch_window_ms: int = Field(default=15, ge=0, le=1000)
+    max_batch: int = Field(default=8, ge=1, le=256)
+
+
 class RedditSection(BaseModel):
     client_id: str = ""
     client_secret: str = ""
@@ -35,14 +55,36 @@ class ConfigResponse(BaseModel):
     GROQ: ConfigSection
     GOOGLE: GoogleSection
     OPENAI: OpenAISection
+    LOCAL: LocalSection = Field(default_factory=LocalSection)
     REDDIT: RedditSection
+    REDDIT_ACCOUNTS: Dict[str, RedditSection] = Field(default_factory=dict)
 
 
 class ConfigUpdate(BaseModel):
     GROQ: Optional[ConfigSection] = None
     GOOGLE: Optional[GoogleSection] = None
     OPENAI: Optional[OpenAISection] = None
+    LOCAL: Optional[LocalSection] = None
     REDDIT: Optional[RedditSection] = None
+    REDDIT_ACCOUNTS: Optional[Dict[str, RedditSection]] = Field(
+        default=None, description="Additional Reddit accounts keyed by name"
+    )
+
+
+class ApiKeyStatus(BaseModel):
+    fingerprint: str
+    weight: int
+    rpm: int
+    in_flight: int
+    requests: int
+    failures: int
+    used_this_minute: int
+    parked_until: Optional[float]
+    park_reason: str
+
+
+class KeyPoolsResponse(BaseModel):
+    pools: Dict[str, List[ApiKeyStatus]]
 
 
 class GenerateRequest(BaseModel):
@@ -54,6 +96,30 @@ class GenerateRequest(BaseModel):
     subreddit: Optional[str] = Field(default=None)
     auto_post: bool = Field(default=False)
     ai_provider: Optional[str] = Field(default=None, description="AI provider to use (google, openai, groq)")
+    subreddits: List[str] = Field(default_factory=list, description="Extra subreddits to spread auto-posts across")
+    accounts: List[str] = Field(default_factory=list, description="Reddit account names to spread auto-posts across")
+    schedule: bool = Field(default=False, description="Queue auto-posts for the posting scheduler")
+    publish_at: Optional[str] = Field(default=None, description="UTC ISO time for the first post, or 'auto'")
+    spread_minutes: int = Field(default=0, ge=0, description="Minutes between consecutive scheduled posts")
+    allow_duplicates: bool = Field(default=False, description="Skip the near-duplicate topic and content checks")
+    candidates: int = Field(default=1, ge=1, le=10, description="Title and body drafts per topic; the best predicted pair is kept")
+    fresh: bool = Field(default=False, description="Always call the providers instead of serving pre-generated drafts")
+
+    @validator("publish_at")
+    def _check_publish_at(cls, value: Optional[str]) -> Optional[str]:
+        if value and value.strip() != "auto":
+            try:
+                datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError("publish_at must be an ISO 8601 timestamp or 'auto'") from None
+        return value
+
+    def target_subreddits(self) -> List[str]:
+        names = [self.subreddit or "", *self.subreddits]
+        return list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+
+    def wants_schedule(self) -> bool:
+        return bool(self.schedule or self.publish_at or self.accounts or len(self.target_subreddits()) > 1)
 
     def clamp_length(self) -> str:
         if self.length not in CONTENT_LENGTH_PRESETS:
@@ -67,6 +133,9 @@ class GeneratedPost(BaseModel):
     body: str
     link: str
     auto_posted: bool
+    scheduled_for: Optional[str] = None
+    duplicate_of: Optional[int] = None
+    predicted_score: Optional[float] = None
 
 
 class GenerateResponse(BaseModel):
@@ -98,13 +167,114 @@ class ConversationEntry(BaseModel):
 
 class ConversationHistory(BaseModel):
     conversation_id: str
-    messages: List[Dict[str, str]]
+    messages: List[Dict[str, Any]]
+    summary: Optional[str] = None
+    archived_messages: int = 0
 
 
 class ConversationsResponse(BaseModel):
     conversations: List[ConversationEntry]
 
 
+class TrendLongevityEntry(BaseModel):
+    topic: str
+    first_seen: str
+    last_seen: str
+    sightings: int
+    lifetime_hours: float
+
+
+class TrendLongevityResponse(BaseModel):
+    region: str
+    items: List[TrendLongevityEntry]
+
+
+class TrendRegionSighting(BaseModel):
+    region: str
+    first_seen: str
+    last_seen: str
+    sightings: int
+
+
+class TrendFirstSeenResponse(BaseModel):
+    topic: str
+    first_seen: str
+    last_seen: str
+    regions: List[TrendRegionSighting]
+
+
+class TopicPerformanceEntry(BaseModel):
+    topic: str
+    first_seen: str
+    posts: int
+    total_upvotes: int
+    total_comments: int
+    avg_upvotes: float
+    avg_comments: float
+
+
+class TopicPerformanceResponse(BaseModel):
+    items: List[TopicPerformanceEntry]
+
+
+class ProviderUsageEntry(BaseModel):
+    provider: str
+    model: str
+    generations: int
+    avg_latency_ms: Optional[float]
+    max_latency_ms: Optional[int]
+    prompt_tokens: int
+    completion_tokens: int
+
+
+class TopicUsageEntry(BaseModel):
+    topic: str
+    generations: int
+    avg_latency_ms: Optional[float]
+
+
+class UsageAnalyticsResponse(BaseModel):
+    since: str
+    providers: List[ProviderUsageEntry]
+    topics: List[TopicUsageEntry]
+
+
+class LLMCallSummaryEntry(BaseModel):
+    provider: str
+    model: str
+    calls: int
+    errors: int
+    avg_latency_ms: Optional[float]
+    avg_ttfb_ms: Optional[float]
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    failovers: int
+
+
+class LLMCallSummaryResponse(BaseModel):
+    since: str
+    items: List[LLMCallSummaryEntry]
+
+
+class QueueEntry(BaseModel):
+    id: int
+    post_id: Optional[int]
+    account: str
+    subreddit: str
+    title: str
+    publish_at: str
+    status: str
+    attempts: int
+    next_attempt_at: str
+    last_error: Optional[str]
+    link: Optional[str]
+
+
+class QueueResponse(BaseModel):
+    items: List[QueueEntry]
+
+
 class StatsResponse(BaseModel):
     total_posts: int
     today_posts: int
@@ -113,3 +283,17 @@ class StatsResponse(BaseModel):
 
 class MessageResponse(BaseModel):
     message: str
+
+
+class ImportJobResponse(BaseModel):
+    job_id: str
+    source: str
+    format: str
+    status: str
+    rows_done: int
+    inserted: int
+    skipped: int
+    enriched: int
+    error: Optional[str]
+    started_at: str
+    updated_at: str
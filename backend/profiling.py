@@ -0,0 +1,120 @@
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from .constants import BASE_DIR
+
+
+MAX_PROFILE_SECONDS = 300.0
+DEFAULT_INTERVAL = 0.01
+
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profiling session is already running."""
+
+
+def _frame_label(code) -> str:
+    path = Path(code.co_filename)
+    try:
+        where = path.relative_to(BASE_DIR).as_posix()
+    except ValueError:
+        where = "/".join(path.parts[-2:])
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({where})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples every thread's stack with ``sys._current_frames`` at a fixed interval.
+
+    Nothing is hooked into the interpreter, so the cost is one stack walk per thread per
+    sample and only while a session is running. Results are collapsed stacks
+    (``thread;outer;...;inner count``) that flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.interval = DEFAULT_INTERVAL
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float, interval: float = DEFAULT_INTERVAL) -> None:
+        """Sample for ``seconds`` (capped at ``MAX_PROFILE_SECONDS``) in the background."""
+        with self._lock:
+            if self.running:
+                raise ProfilerBusyError("A profiling session is already running.")
+            self._stacks = Counter()
+            self.samples = 0
+            self.interval = max(0.001, interval)
+            self.started_at, self.finished_at = time.time(), None
+            self._stop.clear()
+            deadline = time.monotonic() + min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+            self._thread = threading.Thread(target=self._run, args=(deadline,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def collapsed(self) -> str:
+        """Samples so far in collapsed-stack format, most frequent first."""
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "running": self.running,
+            "samples": self.samples,
+            "interval_ms": round(self.interval * 1000, 3),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "distinct_stacks": len(self._stacks),
+        }
+
+    def _run(self, deadline: float) -> None:
+        own_id = threading.get_ident()
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                sampled = []
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    labels.append(names.get(thread_id, f"thread-{thread_id}"))
+                    sampled.append(";".join(reversed(labels)))
+                with self._lock:
+                    self._stacks.update(sampled)
+                    self.samples += 1
+                self._stop.wait(self.interval)
+        finally:
+            self.finished_at = time.time()
+
+
+_profiler = SamplingProfiler()
+
+
+def get_profiler() -> SamplingProfiler:
+    """Get the global sampling profiler."""
+    return _profiler
@@ -0,0 +1,44 @@
+import logging
+import os
+import socket
+from typing import Optional
+
+from ..database import acquire_lease, release_lease
+
+
+LOGGER = logging.getLogger("taskpilot.coordination")
+
+# Identifies this process in the leases table; unique across workers and hosts sharing the DB.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+LEASE_TTL = 30.0
+
+
+class Lease:
+    """A named, expiring lease held by at most one worker process at a time.
+
+    The holder must call ``renew`` more often than ``ttl``; if it dies, another worker can
+    take the lease once it expires.
+    """
+
+    def __init__(self, name: str, ttl: float = LEASE_TTL, owner: Optional[str] = None):
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or WORKER_ID
+        self.held = False
+
+    def renew(self) -> bool:
+        """Acquire or extend the lease. Returns whether this worker now holds it."""
+        try:
+            held = acquire_lease(self.name, self.owner, self.ttl)
+        except Exception:
+            LOGGER.exception("Could not renew lease %s", self.name)
+            held = False
+        if held != self.held:
+            LOGGER.info("%s lease %s", "Acquired" if held else "Lost", self.name)
+        self.held = held
+        return held
+
+    def release(self) -> None:
+        if self.held:
+            release_lease(self.name, self.owner)
+            self.held = False
@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from ..database import find_signature_candidates, fetch_posts_missing_signatures, record_post_signatures
+from .topics import normalize_topic
+
+
+LOGGER = logging.getLogger("taskpilot.dedup")
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+# With 4 bands of 16 bits, any two hashes within 3 bits of each other share at least one
+# identical band (pigeonhole), so the banded index lookup never misses a true near-duplicate.
+MAX_DISTANCE = BANDS - 1
+TOPIC_WINDOW = timedelta(days=3)
+CONTENT_WINDOW = timedelta(days=30)
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+
+
+def simhash(features: Iterable[str]) -> int:
+    """64-bit SimHash over a bag of features (unsigned)."""
+    weights = [0] * HASH_BITS
+    for feature in features:
+        value = _feature_hash(feature)
+        for bit in range(HASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def topic_signature(topic: str) -> int:
+    compact = normalize_topic(topic).replace(" ", "")
+    return simhash(compact[i : i + 3] for i in range(max(1, len(compact) - 2)))
+
+
+def content_signature(title: str, body: str) -> int:
+    words = _WORD_PATTERN.findall(f"{title} {body}".lower())
+    if len(words) < 3:
+        return simhash(words)
+    return simhash(" ".join(words[i : i + 3]) for i in range(len(words) - 2))
+
+
+def bands(signature: int) -> Tuple[int, ...]:
+    mask = (1 << BAND_BITS) - 1
+    return tuple((signature >> (band * BAND_BITS)) & mask for band in range(BANDS))
+
+
+def _to_signed(signature: int) -> int:
+    # SQLite integers are signed 64-bit.
+    return signature - (1 << HASH_BITS) if signature >= 1 << (HASH_BITS - 1) else signature
+
+
+def _from_signed(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def _find(kind: str, signature: int, window: timedelta) -> Optional[int]:
+    since = (datetime.utcnow() - window).isoformat()
+    best: Optional[Tuple[int, int]] = None
+    for post_id, stored in find_signature_candidates(kind, bands(signature), since):
+        distance = bin(_from_signed(stored) ^ signature).count("1")
+        if distance <= MAX_DISTANCE and (best is None or distance < best[0]):
+            best = (distance, post_id)
+    return best[1] if best else None
+
+
+def find_duplicate_topic(topic: str) -> Optional[int]:
+    """Id of a recent post generated for a near-identical topic, if any."""
+    return _find("topic", topic_signature(topic), TOPIC_WINDOW)
+
+
+def find_duplicate_content(title: str, body: str) -> Optional[int]:
+    """Id of a recent post with near-identical title and body, if any."""
+    return _find("content", content_signature(title, body), CONTENT_WINDOW)
+
+
+def find_duplicate_in(title: str, body: str, signatures: Sequence[int]) -> Optional[int]:
+    """Index of the first of ``signatures`` (content signatures) near-identical to title and body."""
+    signature = content_signature(title, body)
+    for index, other in enumerate(signatures):
+        if bin(other ^ signature).count("1") <= MAX_DISTANCE:
+            return index
+    return None
+
+
+def _signature_rows(topic: str, title: str, body: str) -> List[Tuple[str, int, Tuple[int, ...]]]:
+    rows = []
+    for kind, signature in (("topic", topic_signature(topic)), ("content", content_signature(title, body))):
+        rows.append((kind, _to_signed(signature), bands(signature)))
+    return rows
+
+
+def index_post(post_id: int, topic: str, title: str, body: str, created_at: str = "") -> None:
+    """Store topic and content signatures for a logged post."""
+    record_post_signatures(post_id, _signature_rows(topic, title, body), created_at)
+
+
+def backfill_signatures(batch_size: int = 500) -> int:
+    """Index posts logged before the duplicate index existed. Returns how many were indexed."""
+    indexed = 0
+    while True:
+        rows = fetch_posts_missing_signatures(batch_size)
+        if not rows:
+            return indexed
+        for post_id, topic, title, body, timestamp in rows:
+            index_post(post_id, topic or "", title or "", body or "", timestamp or "")
+        indexed += len(rows)
+        LOGGER.info("Indexed %s posts for duplicate detection", indexed)
@@ -0,0 +1,251 @@
+"""Predicts a post's engagement from its text and context, to pick the best of several drafts.
+
+The model is a ridge regression of ``log1p(upvotes + 2 * comments)`` on features of the title
+(length, emoji, punctuation), the body (length, paragraphs, emoji, markdown, hashtags) and the
+persona, tone and subreddit (hashed one-hot). It is fit from running sums of ``XᵀX`` and
+``Xᵀy``, so retraining only reads posts that matured since the last run::
+
+    python -m backend.services.engagement            # add newly matured posts
+    python -m backend.services.engagement --full     # rebuild from all history
+
+Title, body and context features occupy separate blocks of the weight vector, so the score of
+every title/body pairing is a sum of per-title and per-body terms: ranking N titles against N
+bodies costs 2N feature extractions and N² additions.
+"""
+
+import argparse
+import json
+import logging
+import math
+import re
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..database import fetch_engagement_model, save_engagement_model
+from ..storage import get_storage
+
+
+LOGGER = logging.getLogger("taskpilot.engagement")
+
+MODEL_NAME = "engagement"
+# Bump when features change; stored sums from another version are discarded.
+FEATURE_VERSION = 1
+HASH_BUCKETS = 16
+RIDGE_LAMBDA = 1.0
+# Posts younger than this are still gathering votes and are left for a later run.
+MATURITY_HOURS = 48
+# Below this many samples the model is not trusted and candidates keep their original order.
+MIN_TRAINING_SAMPLES = 30
+# How often a worker checks for a model retrained by the CLI.
+RELOAD_INTERVAL = 300.0
+
+_EMOJI = re.compile("[\U0001F300-\U0001FAFF☀-➿]")
+_BOLD = re.compile(r"\*\*[^*]+\*\*|__[^_]+__")
+_BULLET = re.compile(r"^\s*(?:[-*+]|\d+\.)\s", re.M)
+_HASHTAG = re.compile(r"(?:^|\s)#\w+")
+_HEADING = re.compile(r"^#{1,6}\s", re.M)
+_LINK = re.compile(r"https?://")
+
+
+def title_features(title: str) -> List[float]:
+    words = title.split()
+    letters = [char for char in title if char.isalpha()]
+    return [
+        min(len(title) / 100, 3.0),
+        min(len(words) / 20, 3.0),
+        min(len(_EMOJI.findall(title)), 3),
+        float("?" in title),
+        float("!" in title),
+        float(any(char.isdigit() for char in title)),
+        sum(char.isupper() for char in letters) / len(letters) if letters else 0.0,
+    ]
+
+
+def body_features(body: str) -> List[float]:
+    paragraphs = [block for block in body.split("\n\n") if block.strip()]
+    return [
+        min(len(body) / 3000, 3.0),
+        min(len(paragraphs) / 10, 3.0),
+        min(len(_EMOJI.findall(body)) / 10, 3.0),
+        min(len(_BOLD.findall(body)) / 10, 3.0),
+        min(len(_BULLET.findall(body)) / 10, 3.0),
+        min(len(_HASHTAG.findall(body)) / 10, 3.0),
+        float(bool(_HEADING.search(body))),
+        float(bool(_LINK.search(body))),
+    ]
+
+
+def context_features(persona: str, tone: str, subreddit: str) -> List[float]:
+    vector = [0.0] * (3 * HASH_BUCKETS)
+    for block, value in enumerate((persona, tone, subreddit)):
+        value = (value or "").strip().lower()
+        if value:
+            vector[block * HASH_BUCKETS + zlib.crc32(value.encode()) % HASH_BUCKETS] = 1.0
+    return vector
+
+
+TITLE_SIZE = len(title_features(""))
+BODY_SIZE = len(body_features(""))
+CONTEXT_SIZE = 3 * HASH_BUCKETS
+# Layout: bias, title block, body block, context block
+DIMENSIONS = 1 + TITLE_SIZE + BODY_SIZE + CONTEXT_SIZE
+
+
+def engagement_target(upvotes: int, comments: int) -> float:
+    return math.log1p(max(upvotes or 0, 0) + 2 * max(comments or 0, 0))
+
+
+def _dot(weights: Sequence[float], offset: int, values: Sequence[float]) -> float:
+    return sum(weight * value for weight, value in zip(weights[offset:offset + len(values)], values))
+
+
+class EngagementModel:
+    def __init__(self, weights: List[float], samples: int, trained_through: str):
+        self.weights = weights
+        self.samples = samples
+        self.trained_through = trained_through
+
+    def score_pairs(
+        self, titles: Sequence[str], bodies: Sequence[str], persona: str, tone: str, subreddit: str
+    ) -> List[List[float]]:
+        """Predicted engagement of every pairing: ``scores[title_index][body_index]``."""
+        weights = self.weights
+        base = weights[0] + _dot(weights, 1 + TITLE_SIZE + BODY_SIZE, context_features(persona, tone, subreddit))
+        title_terms = [_dot(weights, 1, title_features(title)) for title in titles]
+        body_terms = [_dot(weights, 1 + TITLE_SIZE, body_features(body)) for body in bodies]
+        return [[base + title_term + body_term for body_term in body_terms] for title_term in title_terms]
+
+
+def rank_candidates(
+    titles: Sequence[str], bodies: Sequence[str], persona: str, tone: str, subreddit: str
+) -> Tuple[int, int, Optional[float]]:
+    """``(title_index, body_index, predicted_score)`` of the best pairing.
+
+    Without a trained model the first title and body are kept and the score is ``None``.
+    """
+    model = get_model()
+    if model is None or not titles or not bodies:
+        return 0, 0, None
+    scores = model.score_pairs(titles, bodies, persona, tone, subreddit)
+    title_index = max(range(len(titles)), key=lambda index: max(scores[index]))
+    body_index = max(range(len(bodies)), key=lambda index: scores[title_index][index])
+    return title_index, body_index, scores[title_index][body_index]
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> List[float]:
+    """Solve ``matrix · x = vector`` for a symmetric positive definite matrix (Cholesky)."""
+    size = len(vector)
+    lower = [[0.0] * size for _ in range(size)]
+    for row in range(size):
+        for column in range(row + 1):
+            total = matrix[row][column] - sum(lower[row][k] * lower[column][k] for k in range(column))
+            if row == column:
+                lower[row][row] = math.sqrt(max(total, 1e-12))
+            else:
+                lower[row][column] = total / lower[column][column]
+    forward = [0.0] * size
+    for row in range(size):
+        forward[row] = (vector[row] - sum(lower[row][k] * forward[k] for k in range(row))) / lower[row][row]
+    solution = [0.0] * size
+    for row in reversed(range(size)):
+        solution[row] = (forward[row] - sum(lower[k][row] * solution[k] for k in range(row + 1, size))) / lower[row][row]
+    return solution
+
+
+def _features(title: str, body: str, persona: str, tone: str, subreddit: str) -> List[float]:
+    return [1.0, *title_features(title or ""), *body_features(body or ""), *context_features(persona, tone, subreddit)]
+
+
+def train(full: bool = False, now: Optional[datetime] = None) -> Dict[str, object]:
+    """Add posts that matured since the last run to the stored sums and refit the weights."""
+    stored = None if full else fetch_engagement_model(MODEL_NAME)
+    state = json.loads(stored[2]) if stored else {}
+    if state.get("version") != FEATURE_VERSION or len(state.get("xty", ())) != DIMENSIONS:
+        state, stored = {}, None
+    xtx = state.get("xtx") or [[0.0] * DIMENSIONS for _ in range(DIMENSIONS)]
+    xty = state.get("xty") or [0.0] * DIMENSIONS
+    samples = stored[1] if stored else 0
+    trained_through = stored[0] if stored else ""
+    last_id = int(state.get("last_id", 0))
+    until = ((now or datetime.utcnow()) - timedelta(hours=MATURITY_HOURS)).isoformat()
+
+    added = 0
+    for title, body, persona, tone, subreddit, upvotes, comments, timestamp, post_id in get_storage().iter_engagement_samples(
+        trained_through, until, last_id
+    ):
+        x = _features(title, body, persona, tone, subreddit)
+        y = engagement_target(upvotes, comments)
+        # Only non-zero entries contribute; the context block is mostly zeros
+        active = [(index, value) for index, value in enumerate(x) if value]
+        for i, xi in active:
+            row = xtx[i]
+            for j, xj in active:
+                row[j] += xi * xj
+            xty[i] += xi * y
+        added += 1
+        trained_through, last_id = timestamp, post_id
+    samples += added
+
+    regularized = [row[:] for row in xtx]
+    for index in range(1, DIMENSIONS):  # the bias is not shrunk
+        regularized[index][index] += RIDGE_LAMBDA
+    regularized[0][0] += 1e-6
+    weights = _solve(regularized, xty) if samples else [0.0] * DIMENSIONS
+    state = {"version": FEATURE_VERSION, "last_id": last_id, "xtx": xtx, "xty": xty, "weights": weights}
+    save_engagement_model(MODEL_NAME, trained_through, samples, json.dumps(state))
+    _cache.update(model=None, checked_at=0.0)
+    return {"added": added, "samples": samples, "trained_through": trained_through}
+
+
+_cache: Dict[str, object] = {"model": None, "checked_at": 0.0, "updated_at": ""}
+_cache_lock = threading.Lock()
+
+
+def get_model() -> Optional[EngagementModel]:
+    """The stored model once it has ``MIN_TRAINING_SAMPLES``, rechecked every ``RELOAD_INTERVAL``."""
+    now = time.monotonic()
+    with _cache_lock:
+        if _cache["checked_at"] and now - float(_cache["checked_at"]) < RELOAD_INTERVAL:
+            return _cache["model"]
+        _cache["checked_at"] = now
+        try:
+            stored = fetch_engagement_model(MODEL_NAME)
+        except Exception:
+            LOGGER.exception("Could not load the engagement model")
+            return _cache["model"]
+        if stored is None or stored[1] < MIN_TRAINING_SAMPLES:
+            _cache.update(model=None, updated_at="")
+        elif stored[3] != _cache["updated_at"]:
+            state = json.loads(stored[2])
+            weights = state.get("weights") or []
+            if state.get("version") == FEATURE_VERSION and len(weights) == DIMENSIONS:
+                _cache.update(model=EngagementModel(weights, stored[1], stored[0]), updated_at=stored[3])
+            else:
+                _cache.update(model=None, updated_at="")
+        return _cache["model"]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="Discard the stored sums and retrain on all history")
+    args = parser.parse_args(argv)
+
+    from ..database import init_db
+
+    init_db()
+    get_storage().migrate()
+    started = time.perf_counter()
+    result = train(full=args.full)
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(result))
+    if result["samples"] < MIN_TRAINING_SAMPLES:
+        print(f"Candidates are ranked once {MIN_TRAINING_SAMPLES} posted samples are available.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,9 @@
 import requests
 from typing import Dict
 
-from ..constants import GROQ_DEFAULT_MODEL, GROQ_DEPRECATED_MODELS
+from ..constants import GROQ_API_URL, GROQ_DEFAULT_MODEL, GROQ_DEPRECATED_MODELS
 
-API_URL = "https://api.groq.com/openai/v1/chat/completions"
+API_URL = GROQ_API_URL
 
 
 class GroqError(RuntimeError):
@@ -0,0 +1,125 @@
+"""Idempotency keys and single-flight execution for generation and job endpoints.
+
+A request sent with an ``Idempotency-Key`` header runs at most once per key. Duplicates that
+arrive while it runs, in this worker or another, wait for it and receive its response, and
+retries within ``IDEMPOTENCY_TTL`` get the stored response back without running anything.
+Requests without a key are coalesced with identical requests already in flight.
+
+Failed runs (exceptions and 5xx, 409 or 429 responses) are not stored, so a retry runs again.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from ..constants import IDEMPOTENCY_TTL
+from ..database import claim_idempotency_key, complete_idempotency_key, release_idempotency_key
+
+
+LOGGER = logging.getLogger("taskpilot.idempotency")
+
+# A claim whose owner has not finished within this long is presumed dead and can be taken over.
+RUNNING_TTL = 900.0
+# How long the response of a keyless request stays readable by duplicates polling from other workers.
+KEYLESS_TTL = 5.0
+POLL_INTERVAL = 0.25
+# A duplicate gives up waiting on another worker's run after this long.
+WAIT_TIMEOUT = 300.0
+_NOT_STORED = {409, 429}
+
+
+class IdempotencyMismatch(RuntimeError):
+    """The idempotency key was already used for a different request."""
+
+
+class IdempotencyInProgress(RuntimeError):
+    """Another worker is still running the request after ``WAIT_TIMEOUT``."""
+
+
+class _Flight:
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.result: Optional[Tuple[int, object]] = None
+        self.error: Optional[BaseException] = None
+
+
+_flights: Dict[str, _Flight] = {}
+_flights_lock = threading.Lock()
+
+
+def request_fingerprint(scope: str, payload: object) -> str:
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{scope}\n{encoded}".encode()).hexdigest()
+
+
+def run_once(
+    scope: str, key: Optional[str], payload: object, execute: Callable[[], Tuple[int, object]]
+) -> Tuple[int, object, bool]:
+    """Run ``execute`` once for ``key``, or share the result of the run that already did.
+
+    ``execute`` returns ``(status_code, json_body)``. Returns the same plus whether the
+    result is a replay of another run.
+    """
+    fingerprint = request_fingerprint(scope, payload)
+    full_key = f"{scope}:{key}" if key else f"{scope}:auto:{fingerprint}"
+    # Duplicates within this worker wait on the first one without touching the database
+    with _flights_lock:
+        flight = _flights.get(full_key)
+        leader = flight is None
+        if leader:
+            flight = _flights[full_key] = _Flight(fingerprint)
+    if not leader:
+        if flight.fingerprint != fingerprint:
+            raise IdempotencyMismatch("Idempotency-Key was already used for a different request")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        status_code, body = flight.result
+        return status_code, body, True
+    try:
+        status_code, body, replayed = _run_shared(full_key, fingerprint, bool(key), execute)
+        flight.result = (status_code, body)
+        return status_code, body, replayed
+    except BaseException as exc:
+        flight.error = exc
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(full_key, None)
+        flight.done.set()
+
+
+def _run_shared(
+    full_key: str, fingerprint: str, keyed: bool, execute: Callable[[], Tuple[int, object]]
+) -> Tuple[int, object, bool]:
+    """Claim ``full_key`` in the shared database, or wait for the worker that holds it."""
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while True:
+        state, status_code, response = claim_idempotency_key(full_key, fingerprint, owner, RUNNING_TTL)
+        if state == "claimed":
+            break
+        if state == "mismatch":
+            raise IdempotencyMismatch("Idempotency-Key was already used for a different request")
+        if state == "done":
+            return int(status_code), json.loads(response), True
+        if time.monotonic() >= deadline:
+            raise IdempotencyInProgress("The request is still being processed; retry later")
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        status_code, body = execute()
+    except BaseException:
+        release_idempotency_key(full_key, owner)
+        raise
+    if status_code >= 500 or status_code in _NOT_STORED:
+        release_idempotency_key(full_key, owner)
+    else:
+        ttl = IDEMPOTENCY_TTL if keyed else KEYLESS_TTL
+        complete_idempotency_key(full_key, owner, status_code, json.dumps(body, default=str), ttl)
+    return status_code, body, False
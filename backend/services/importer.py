@@ -0,0 +1,245 @@
+"""Bulk import of historical posts from CSV, NDJSON or a legacy TaskPilot SQLite file.
+
+Rows are streamed, deduplicated by link against the database and the file itself, and
+inserted in large batches with index and stats maintenance deferred to the end. Progress is
+recorded per batch under a hash of the source, so rerunning an interrupted import resumes
+after the last committed batch.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import get_decrypted_config
+from ..database import finish_import_job, record_import_progress, restore_post_maintenance, start_import_job
+from ..storage import POST_EXPORT_COLUMNS, get_storage
+from .reddit_service import fetch_stats_by_link
+
+
+LOGGER = logging.getLogger("taskpilot.importer")
+
+BATCH_SIZE = 5000
+FORMATS = ("csv", "ndjson", "sqlite")
+
+# Alternative column names seen in exports from other tools, mapped onto ours.
+_ALIASES = {
+    "url": "link",
+    "permalink": "link",
+    "score": "upvotes",
+    "ups": "upvotes",
+    "num_comments": "comments",
+    "selftext": "body",
+    "text": "body",
+    "created": "timestamp",
+    "created_at": "timestamp",
+    "created_utc": "timestamp",
+    "date": "timestamp",
+    "subreddit_name_prefixed": "subreddit",
+}
+_INTEGER_COLUMNS = ("auto_posted", "upvotes", "comments")
+_LINK = POST_EXPORT_COLUMNS.index("link")
+_UPVOTES = POST_EXPORT_COLUMNS.index("upvotes")
+_COMMENTS = POST_EXPORT_COLUMNS.index("comments")
+
+
+class ImportFormatError(RuntimeError):
+    """Raised when a source file cannot be read as any supported format."""
+
+
+def detect_format(path: Path) -> str:
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        return "csv"
+    if suffix in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    with path.open("rb") as handle:
+        if handle.read(16) == b"SQLite format 3\x00":
+            return "sqlite"
+    raise ImportFormatError(f"Cannot tell the format of '{path.name}'; pass one of {', '.join(FORMATS)}.")
+
+
+def source_hash(path: Path) -> str:
+    """Identifies an import source by content, so renamed or re-uploaded files still resume."""
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def _read_csv(path: Path) -> Iterator[Dict[str, object]]:
+    with path.open(newline="", encoding="utf-8-sig") as handle:
+        yield from csv.DictReader(handle)
+
+
+def _read_ndjson(path: Path) -> Iterator[Dict[str, object]]:
+    with path.open(encoding="utf-8") as handle:
+        for number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                LOGGER.warning("Skipping malformed JSON on line %s of %s", number, path.name)
+                yield {}
+                continue
+            # Reddit API listings wrap each submission as {"kind": "t3", "data": {...}}
+            yield record.get("data", record) if isinstance(record, dict) else {}
+
+
+def _read_sqlite(path: Path) -> Iterator[Dict[str, object]]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(posts)")}
+        if not columns:
+            raise ImportFormatError(f"'{path.name}' has no posts table.")
+        wanted = [column for column in POST_EXPORT_COLUMNS if column in columns]
+        for row in conn.execute(f"SELECT {', '.join(wanted)} FROM posts ORDER BY rowid"):
+            yield dict(row)
+    finally:
+        conn.close()
+
+
+_READERS = {"csv": _read_csv, "ndjson": _read_ndjson, "sqlite": _read_sqlite}
+
+
+def _timestamp(value: object) -> str:
+    if value in (None, ""):
+        return datetime.utcnow().isoformat()
+    try:
+        return datetime.utcfromtimestamp(float(value)).isoformat()
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def normalize_row(record: Dict[str, object]) -> Optional[Tuple]:
+    """Map one source record onto ``POST_EXPORT_COLUMNS``; ``None`` if it has nothing to import."""
+    fields: Dict[str, object] = {}
+    for key, value in record.items():
+        key = str(key or "").strip().lower()
+        key = _ALIASES.get(key, key)
+        if key in POST_EXPORT_COLUMNS and fields.get(key) in (None, ""):
+            fields[key] = value
+    if not (fields.get("title") or fields.get("link")):
+        return None
+    link = str(fields.get("link") or "")
+    if link.startswith("/r/"):
+        link = "https://www.reddit.com" + link
+    fields["link"] = link
+    fields["subreddit"] = str(fields.get("subreddit") or "").removeprefix("r/")
+    fields["timestamp"] = _timestamp(fields.get("timestamp"))
+    for key in _INTEGER_COLUMNS:
+        try:
+            fields[key] = int(float(fields.get(key) or 0))
+        except (TypeError, ValueError):
+            fields[key] = 0
+    return tuple(fields.get(column) if column in fields else "" for column in POST_EXPORT_COLUMNS)
+
+
+def _enrich(rows: List[Tuple], config_section) -> int:
+    """Fill in current engagement for Reddit links in place. Returns how many rows were updated."""
+    stats = fetch_stats_by_link(config_section, [row[_LINK] for row in rows if row[_LINK]])
+    for index, row in enumerate(rows):
+        found = stats.get(row[_LINK])
+        if found is not None:
+            updated = list(row)
+            updated[_UPVOTES], updated[_COMMENTS] = found
+            rows[index] = tuple(updated)
+    return len(stats)
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def run_import(
+    path: Path,
+    fmt: Optional[str] = None,
+    enrich: bool = False,
+    batch_size: int = BATCH_SIZE,
+    job_id: Optional[str] = None,
+    source: Optional[str] = None,
+) -> Dict[str, object]:
+    """Import ``path`` into the configured storage and return the job's final counters."""
+    fmt = fmt or detect_format(path)
+    if fmt not in _READERS:
+        raise ImportFormatError(f"Unsupported format '{fmt}'; use one of {', '.join(FORMATS)}.")
+    job_id = job_id or source_hash(path)
+    status, rows_done, inserted, skipped, enriched = start_import_job(job_id, source or path.name, fmt)
+    result = {"job_id": job_id, "status": status, "rows_done": rows_done, "inserted": inserted, "skipped": skipped, "enriched": enriched}
+    if status == "completed":
+        LOGGER.info("Import %s already completed", job_id)
+        return result
+    if rows_done:
+        LOGGER.info("Resuming import %s after %s rows", job_id, rows_done)
+
+    storage = get_storage()
+    restore_post_maintenance()
+    reddit_section = get_decrypted_config().get("REDDIT", {}) if enrich else None
+    seen = storage.fetch_post_links()
+    # Rows up to rows_done were committed by an earlier run; re-reading them is cheap
+    records = islice(_READERS[fmt](path), rows_done, None)
+    try:
+        with storage.bulk_load():
+            for batch in _batches(records, batch_size):
+                fresh: List[Tuple] = []
+                for record in batch:
+                    row = normalize_row(record)
+                    if row is None or (row[_LINK] and row[_LINK] in seen):
+                        skipped += 1
+                        continue
+                    if row[_LINK]:
+                        seen.add(row[_LINK])
+                    fresh.append(row)
+                if fresh and reddit_section is not None:
+                    enriched += _enrich(fresh, reddit_section)
+                rows_done += len(batch)
+                # On SQLite the progress row commits with the batch; elsewhere a crash between
+                # the two re-reads one batch, which the link check above then skips
+                with storage.transaction():
+                    inserted += storage.import_posts(fresh) if fresh else 0
+                    record_import_progress(job_id, rows_done, inserted, skipped, enriched)
+                LOGGER.info("Import %s: %s rows read, %s inserted, %s skipped", job_id, rows_done, inserted, skipped)
+    except Exception as exc:
+        finish_import_job(job_id, str(exc)[:500])
+        raise
+    finish_import_job(job_id)
+    result.update(status="completed", rows_done=rows_done, inserted=inserted, skipped=skipped, enriched=enriched)
+    return result
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="CSV, NDJSON or legacy SQLite file")
+    parser.add_argument("--format", choices=FORMATS, help="Source format (default: from the file)")
+    parser.add_argument("--enrich", action="store_true", help="Fetch current score and comments from Reddit")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    from ..database import init_db
+
+    init_db()
+    get_storage().migrate()
+    result = run_import(args.path, args.format, args.enrich, args.batch_size)
+    print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
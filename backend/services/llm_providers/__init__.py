@@ -1,11 +1,22 @@
+import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
 
 from .base import LLMProvider
-from .groq_adapter import GroqProvider
-from .google_adapter import GoogleProvider, GoogleError
-from .openai_adapter import OpenAIProvider
+from .keys import PARK_STATUSES, KeyPool, NoKeyAvailableError, get_key_pool
+from ...constants import LOCAL_MODEL_PREFIX
+from ...database import record_provider_result
 from ..groq import GroqError
+from ..telemetry import CallRecord, adopt_last_call, combine_calls, last_call, record_call
+from ...tracing import span
+
+
+LOGGER = logging.getLogger("taskpilot.llm")
+
+# Concurrent calls per request_candidates call for providers without an ``n`` parameter.
+MAX_PARALLEL_SAMPLES = 4
 
 
 class LLMRegistry:
@@ -51,40 +62,201 @@ def get_registry() -> LLMRegistry:
 
 
 def create_provider(name: str, api_key: str, model: str) -> Optional[LLMProvider]:
-    """Factory function to create a provider instance."""
+    """Factory function to create a provider instance.
+
+    Adapters are imported on first use so only the providers actually configured are loaded.
+    """
     if name == "groq":
+        from .groq_adapter import GroqProvider
+
         return GroqProvider(api_key, model)
     elif name == "google":
+        from .google_adapter import GoogleProvider
+
         return GoogleProvider(api_key, model)
     elif name == "openai":
+        from .openai_adapter import OpenAIProvider
+
         return OpenAIProvider(api_key, model)
+    elif name == "local":
+        from .local_adapter import LocalProvider
+
+        return LocalProvider(api_key, model)
     return None
 
 
-def request_completion(api_key: str, prompt: str, model: str) -> str:
-    """Request completion from appropriate LLM provider.
-    
-    Determines provider based on the model name or tries OpenAI first if available.
-    """
+def _instrumented_completion(
+    provider: LLMProvider, prompt: str, attempt: int, failover_reason: Optional[str], samples: int = 1
+) -> List[str]:
+    """Run one completion call and record its latency, usage and outcome."""
+    started = time.perf_counter()
+    outcome, error = "ok", None
+    try:
+        with span("llm.completion", provider=provider.name, model=provider.model, attempt=attempt, samples=samples) as current:
+            result = provider.request_samples(prompt, samples) if samples > 1 else [provider.request_completion(prompt)]
+            if current is not None:
+                current.set(**provider.last_usage)
+            return result
+    except Exception as exc:
+        outcome, error = "error", str(exc)[:500]
+        raise
+    finally:
+        record_call(
+            CallRecord(
+                provider=provider.name,
+                model=provider.model,
+                outcome=outcome,
+                latency_ms=int((time.perf_counter() - started) * 1000),
+                ttfb_ms=provider.last_ttfb_ms,
+                prompt_tokens=provider.last_usage.get("prompt_tokens"),
+                completion_tokens=provider.last_usage.get("completion_tokens"),
+                attempt=attempt,
+                failover_reason=failover_reason,
+                error=error,
+            )
+        )
+        try:
+            # Shared with every worker so a failing provider is deprioritized everywhere
+            record_provider_result(provider.name, outcome == "ok", error)
+        except Exception:
+            LOGGER.exception("Could not record health of provider %s", provider.name)
+
+
+def _pooled_completion(
+    name: str, keys: KeyPool, prompt: str, model: str, attempt: int, failover_reason: Optional[str], samples: int
+) -> List[str]:
+    """Run a completion on a key from ``keys``, moving to the next key when one is parked."""
+    tried: List[str] = []
+    # The error of the last key that was parked, reported once no key is left to try
+    last_error: Optional[Exception] = None
+    while True:
+        try:
+            key = keys.acquire(exclude=tried)
+        except NoKeyAvailableError:
+            if last_error is not None:
+                raise last_error from None
+            raise
+        provider = create_provider(name, key.secret, model)
+        try:
+            result = _instrumented_completion(provider, prompt, attempt, failover_reason, samples)
+        except Exception as exc:
+            keys.release(key, provider.last_status, provider.last_retry_after)
+            if provider.last_status not in PARK_STATUSES:
+                raise
+            last_error = exc
+            tried.append(key.fingerprint)
+            attempt, failover_reason = attempt + 1, f"{name} key {key.fingerprint}: HTTP {provider.last_status}"
+            continue
+        keys.release(key)
+        return result
+
+
+def _provider_name(model: str) -> str:
+    """Provider serving ``model``, judged from its name and defaulting to Groq."""
+    if model and model.startswith(LOCAL_MODEL_PREFIX):
+        return "local"
     # Check if it's an OpenAI model
     if model and any(o_model in model for o_model in ["gpt-", "gpt3", "gpt4"]):
-        provider = create_provider("openai", api_key, model)
-        if provider:
-            result = provider.request_completion(prompt)
-            if result:
-                return result
-    
+        return "openai"
     # Check if it's a Google model
     if model and any(g_model in model for g_model in ["gemini", "gemini-pro", "gemini-1.5"]):
-        provider = create_provider("google", api_key, model)
-        if provider:
-            try:
-                return provider.request_completion(prompt)
-            except GoogleError as e:
-                raise GoogleError(str(e)) from None
+        return "google"
+    return "groq"
+
+
+def _dispatch(
+    api_key: Union[str, KeyPool], prompt: str, model: str, attempt: int, failover_reason: Optional[str], samples: int
+) -> List[str]:
+    name = _provider_name(model)
+    if isinstance(api_key, KeyPool) and not api_key:
+        # Fall through so the adapter reports the missing key in its usual words
+        api_key = ""
+    if isinstance(api_key, KeyPool):
+        try:
+            return _pooled_completion(name, api_key, prompt, model, attempt, failover_reason, samples)
+        except NoKeyAvailableError as exc:
+            raise GroqError(str(exc)) from None
+
+    provider = create_provider(name, api_key, model)
+    if provider is None:
+        raise GroqError("Provider not available")
+    if name == "google":
+        from .google_adapter import GoogleError
+
+        try:
+            return _instrumented_completion(provider, prompt, attempt, failover_reason, samples)
+        except GoogleError as e:
+            raise GoogleError(str(e)) from None
+    return _instrumented_completion(provider, prompt, attempt, failover_reason, samples)
+
+
+def request_completion(
+    api_key: Union[str, KeyPool], prompt: str, model: str, attempt: int = 0, failover_reason: Optional[str] = None
+) -> str:
+    """Request completion from appropriate LLM provider.
     
-    # Default to Groq
-    provider = create_provider("groq", api_key, model)
-    if provider:
-        return provider.request_completion(prompt)
-    raise GroqError("Provider not available")
\ No newline at end of file
+    Determines provider based on the model name, defaulting to Groq. ``api_key`` is a single
+    key or the provider's ``KeyPool``. ``attempt`` and ``failover_reason`` describe where this
+    call sits in a caller's provider fallback chain and are only recorded for telemetry.
+    """
+    return _dispatch(api_key, prompt, model, attempt, failover_reason, 1)[0]
+
+
+def _sample_on_thread(
+    api_key: Union[str, KeyPool], prompt: str, model: str, attempt: int, failover_reason: Optional[str]
+) -> Tuple[str, Optional[CallRecord]]:
+    text = request_completion(api_key, prompt, model, attempt, failover_reason)
+    return text, last_call()
+
+
+def request_candidates(
+    api_key: Union[str, KeyPool],
+    prompt: str,
+    model: str,
+    n: int,
+    attempt: int = 0,
+    failover_reason: Optional[str] = None,
+) -> List[str]:
+    """``n`` independent completions of ``prompt``, as few calls as the provider allows.
+
+    Providers whose API takes ``n`` answer in one call (or a few, above their
+    ``max_samples``). Otherwise the calls run in parallel, up to ``MAX_PARALLEL_SAMPLES`` at a
+    time, each on its own pool key. Fewer than ``n`` texts come back only if some parallel
+    calls failed. Afterwards ``last_call()`` on this thread reports the combined usage.
+    """
+    if n <= 1:
+        return [request_completion(api_key, prompt, model, attempt, failover_reason)]
+    provider = create_provider(_provider_name(model), "", model)
+    if provider is not None and provider.max_samples > 1:
+        texts: List[str] = []
+        records = []
+        while len(texts) < n:
+            chunk = _dispatch(api_key, prompt, model, attempt, failover_reason, min(n - len(texts), provider.max_samples))
+            if last_call() is not None:
+                records.append(last_call())
+            if not chunk:
+                break
+            texts += chunk
+        if not texts:
+            raise RuntimeError(f"{model} returned no completions")
+        if len(records) > 1:
+            adopt_last_call(combine_calls(records))
+        return texts[:n]
+
+    texts, records, errors = [], [], []
+    with ThreadPoolExecutor(max_workers=min(n, MAX_PARALLEL_SAMPLES), thread_name_prefix="llm-sample") as executor:
+        futures = [executor.submit(_sample_on_thread, api_key, prompt, model, attempt, failover_reason) for _ in range(n)]
+        for future in futures:
+            try:
+                text, record = future.result()
+            except Exception as exc:
+                errors.append(exc)
+                continue
+            texts.append(text)
+            if record is not None:
+                records.append(record)
+    if not texts:
+        raise errors[0]
+    if records:
+        adopt_last_call(combine_calls(records))
+    return texts
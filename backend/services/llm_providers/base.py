@@ -5,12 +5,35 @@ from typing import Dict, List, Optional
 class LLMProvider(ABC):
     """Abstract base class for LLM providers."""
 
+    # Completions one API call can return; adapters whose API has an ``n`` parameter raise it
+    # and implement ``request_samples``.
+    max_samples = 1
+
     def __init__(self, name: str, api_key: str, model: str):
         self.name = name
         self.api_key = api_key
         self.model = model
+        # Filled in by each completion for telemetry
+        self.last_usage: Dict[str, int] = {}
+        self.last_ttfb_ms: Optional[int] = None
+        # HTTP status and Retry-After of the last failed call, for key pool parking
+        self.last_status: Optional[int] = None
+        self.last_retry_after: Optional[float] = None
+
+    def _note_error_response(self, response) -> None:
+        if response is None:
+            return
+        self.last_status = response.status_code
+        try:
+            self.last_retry_after = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            self.last_retry_after = None
 
     @abstractmethod
     def request_completion(self, prompt: str) -> str:
         """Request a completion from the LLM."""
-        pass
\ No newline at end of file
+        pass
+
+    def request_samples(self, prompt: str, n: int) -> List[str]:
+        """Up to ``max_samples`` independent completions from a single API call."""
+        return [self.request_completion(prompt)]
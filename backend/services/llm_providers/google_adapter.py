@@ -1,8 +1,8 @@
 import requests
-from typing import Dict
+from typing import Dict, List
 
 from .base import LLMProvider
-from ...constants import GOOGLE_DEFAULT_MODEL
+from ...constants import GOOGLE_API_BASE, GOOGLE_DEFAULT_MODEL
 
 
 class GoogleError(Exception):
@@ -16,14 +16,23 @@ class GoogleProvider(LLMProvider):
     def __init__(self, api_key: str, model: str = GOOGLE_DEFAULT_MODEL):
         super().__init__("google", api_key, model)
 
+    max_samples = 8
+
     def request_completion(self, prompt: str) -> str:
+        return self._request(prompt, 1)[0]
+
+    def request_samples(self, prompt: str, n: int) -> List[str]:
+        """``n`` completions from one API call, using ``generationConfig.candidateCount``."""
+        return self._request(prompt, min(n, self.max_samples))
+
+    def _request(self, prompt: str, n: int) -> List[str]:
         if not self.api_key:
             raise GoogleError("Google API key is missing. Add it via Settings.")
 
         model_name = self.model.strip() or GOOGLE_DEFAULT_MODEL
         
         # Construct the API URL for Google Generative AI
-        api_url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent"
+        api_url = f"{GOOGLE_API_BASE}/models/{model_name}:generateContent"
         
         payload: Dict[str, object] = {
             "contents": [
@@ -34,6 +43,8 @@ class GoogleProvider(LLMProvider):
                 }
             ]
         }
+        if n > 1:
+            payload["generationConfig"] = {"candidateCount": n}
         
         params = {"key": self.api_key}
         headers = {"Content-Type": "application/json"}
@@ -46,8 +57,10 @@ class GoogleProvider(LLMProvider):
                 params=params,
                 timeout=30
             )
+            self.last_ttfb_ms = int(response.elapsed.total_seconds() * 1000)
             response.raise_for_status()
         except requests.exceptions.HTTPError as err:
+            self._note_error_response(err.response)
             detail = ""
             if err.response is not None:
                 try:
@@ -66,8 +79,20 @@ class GoogleProvider(LLMProvider):
 
         try:
             data = response.json()
+            usage = data.get("usageMetadata") or {}
+            self.last_usage = {
+                name: usage[key]
+                for name, key in (("prompt_tokens", "promptTokenCount"), ("completion_tokens", "candidatesTokenCount"))
+                if key in usage
+            }
             # Extract text from Google's response format
-            content = data["candidates"][0]["content"]["parts"][0]["text"].strip()
-            return content
+            texts = [
+                candidate["content"]["parts"][0]["text"].strip()
+                for candidate in data["candidates"]
+                if candidate.get("content", {}).get("parts")
+            ]
+            if not texts:
+                raise IndexError("no candidates")
+            return texts
         except (KeyError, IndexError, ValueError) as err:
             raise GoogleError(f"Unexpected Google API response format: {err}") from None
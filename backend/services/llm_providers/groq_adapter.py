@@ -2,10 +2,10 @@ import requests
 from typing import Dict, List
 
 from .base import LLMProvider
-from ...constants import GROQ_DEFAULT_MODEL, GROQ_DEPRECATED_MODELS
+from ...constants import GROQ_API_URL, GROQ_DEFAULT_MODEL, GROQ_DEPRECATED_MODELS
 from ..groq import GroqError
 
-API_URL = "https://api.groq.com/openai/v1/chat/completions"
+API_URL = GROQ_API_URL
 
 
 class GroqProvider(LLMProvider):
@@ -35,8 +35,10 @@ class GroqProvider(LLMProvider):
 
         try:
             response = requests.post(API_URL, json=payload, headers=headers, timeout=30)
+            self.last_ttfb_ms = int(response.elapsed.total_seconds() * 1000)
             response.raise_for_status()
         except requests.exceptions.HTTPError as err:
+            self._note_error_response(err.response)
             detail = ""
             if err.response is not None:
                 try:
@@ -55,6 +57,8 @@ class GroqProvider(LLMProvider):
 
         try:
             data = response.json()
+            usage = data.get("usage") or {}
+            self.last_usage = {key: usage[key] for key in ("prompt_tokens", "completion_tokens") if key in usage}
             return data["choices"][0]["message"]["content"].strip()
         except (KeyError, IndexError, ValueError) as err:
             raise GroqError(f"Unexpected Groq response format: {err}") from None
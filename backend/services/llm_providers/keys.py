@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ...config import key_pool_entries
+from ...constants import KEY_POOL_STRATEGY
+from ...database import fetch_rate_limits, reserve_rate_limit
+
+
+LOGGER = logging.getLogger("taskpilot.llm")
+
+# A rejected key (401/403) stays parked until it is replaced or this long has passed.
+AUTH_PARK_SECONDS = 3600.0
+# A rate-limited key (429) without Retry-After is parked for BASE * 2**strikes, up to MAX.
+RATE_PARK_BASE = 15.0
+RATE_PARK_MAX = 600.0
+PARK_STATUSES = (401, 403, 429)
+# How often a pool picks up keys parked by other workers.
+PARK_SYNC_INTERVAL = 5.0
+QUOTA_WINDOW = 60.0
+_PARK_PREFIX = "llm-key:"
+
+
+class NoKeyAvailableError(RuntimeError):
+    """Raised when every key in a pool is parked or at its per-minute quota."""
+
+    def __init__(self, provider: str, retry_at: float):
+        self.retry_at = retry_at
+        super().__init__(f"No {provider} API key available for {max(retry_at - time.time(), 0):.0f}s")
+
+
+class ApiKey:
+    """One key of a pool with its weight, optional per-minute quota and usage counters."""
+
+    def __init__(self, secret: str, weight: int = 1, rpm: int = 0):
+        self.secret = secret
+        self.fingerprint = hashlib.sha256(secret.encode()).hexdigest()[:12]
+        self.weight = max(int(weight or 1), 1)
+        self.rpm = max(int(rpm or 0), 0)
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.strikes = 0
+        self.window_start = 0.0
+        self.window_count = 0
+        self.parked_until = 0.0
+        self.park_reason = ""
+        # Smooth weighted round-robin state
+        self.current = 0
+
+    def available(self, now: float) -> bool:
+        if self.parked_until > now:
+            return False
+        if self.rpm and now - self.window_start < QUOTA_WINDOW and self.window_count >= self.rpm:
+            return False
+        return True
+
+    def next_free_at(self, now: float) -> float:
+        quota_free = self.window_start + QUOTA_WINDOW if self.rpm and self.window_count >= self.rpm else now
+        return max(self.parked_until, quota_free)
+
+    def load(self, now: float) -> float:
+        recent = self.window_count if now - self.window_start < QUOTA_WINDOW else 0
+        return (self.in_flight + recent / QUOTA_WINDOW) / self.weight
+
+
+class KeyPool:
+    """Rotates calls for one provider across its API keys.
+
+    Keys are chosen least-loaded or by smooth weighted round-robin (``KEY_POOL_STRATEGY``).
+    A key that answers 401/403/429 is parked, and the parking is shared with other workers
+    through the ``rate_limits`` table. Usage counters and quotas are per process.
+    """
+
+    def __init__(self, provider: str, strategy: str = KEY_POOL_STRATEGY):
+        self.provider = provider
+        self.strategy = strategy
+        self._keys: List[ApiKey] = []
+        self._lock = threading.Lock()
+        self._signature: Tuple[Tuple[str, int, int], ...] = ()
+        self._synced_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def update(self, entries: Iterable[Tuple[str, int, int]]) -> None:
+        """Replace the key set with ``(secret, weight, rpm)`` entries, keeping counters of kept keys."""
+        signature = tuple(dict(((secret, (secret, weight, rpm)) for secret, weight, rpm in entries if secret)).values())
+        if signature == self._signature:
+            return
+        with self._lock:
+            existing = {key.secret: key for key in self._keys}
+            keys = []
+            for secret, weight, rpm in signature:
+                key = existing.get(secret) or ApiKey(secret)
+                key.weight, key.rpm = max(int(weight or 1), 1), max(int(rpm or 0), 0)
+                keys.append(key)
+            self._keys = keys
+            self._signature = signature
+
+    def _sync_parking(self, now: float) -> None:
+        if now - self._synced_at < PARK_SYNC_INTERVAL:
+            return
+        self._synced_at = now
+        prefix = f"{_PARK_PREFIX}{self.provider}:"
+        try:
+            parked = fetch_rate_limits(prefix)
+        except Exception:
+            LOGGER.exception("Could not read parked %s keys", self.provider)
+            return
+        with self._lock:
+            for key in self._keys:
+                until = parked.get(prefix + key.fingerprint, 0.0)
+                if until > key.parked_until:
+                    key.parked_until, key.park_reason = until, key.park_reason or "parked by another worker"
+
+    def acquire(self, exclude: Iterable[str] = ()) -> ApiKey:
+        """Pick a key for one call; pair every call with ``release``."""
+        now = time.time()
+        self._sync_parking(now)
+        excluded = set(exclude)
+        with self._lock:
+            candidates = [key for key in self._keys if key.fingerprint not in excluded]
+            ready = [key for key in candidates if key.available(now)]
+            if not ready:
+                retry_at = min((key.next_free_at(now) for key in candidates), default=now + RATE_PARK_BASE)
+                raise NoKeyAvailableError(self.provider, retry_at)
+            if self.strategy == "weighted":
+                total = sum(key.weight for key in ready)
+                for key in ready:
+                    key.current += key.weight
+                chosen = max(ready, key=lambda key: key.current)
+                chosen.current -= total
+            else:
+                chosen = min(ready, key=lambda key: (key.load(now), -key.weight))
+            if now - chosen.window_start >= QUOTA_WINDOW:
+                chosen.window_start, chosen.window_count = now, 0
+            chosen.window_count += 1
+            chosen.in_flight += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, key: ApiKey, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        """Finish a call made with ``key``; ``status`` is the HTTP status of a failed call."""
+        park_for = 0.0
+        with self._lock:
+            key.in_flight = max(key.in_flight - 1, 0)
+            if status is None:
+                key.strikes = 0
+                return
+            key.failures += 1
+            if status == 429:
+                key.strikes += 1
+                park_for = retry_after or min(RATE_PARK_BASE * 2 ** (key.strikes - 1), RATE_PARK_MAX)
+                key.park_reason = "rate limited"
+            elif status in PARK_STATUSES:
+                park_for = AUTH_PARK_SECONDS
+                key.park_reason = "rejected"
+            if park_for:
+                key.parked_until = max(key.parked_until, time.time() + park_for)
+        if park_for:
+            LOGGER.warning("Parking %s key %s for %.0fs after HTTP %s", self.provider, key.fingerprint, park_for, status)
+            try:
+                reserve_rate_limit(f"{_PARK_PREFIX}{self.provider}:{key.fingerprint}", park_for)
+            except Exception:
+                LOGGER.exception("Could not share parking of %s key %s", self.provider, key.fingerprint)
+
+    def status(self) -> List[Dict[str, object]]:
+        now = time.time()
+        self._sync_parking(now)
+        with self._lock:
+            return [
+                {
+                    "fingerprint": key.fingerprint,
+                    "weight": key.weight,
+                    "rpm": key.rpm,
+                    "in_flight": key.in_flight,
+                    "requests": key.requests,
+                    "failures": key.failures,
+                    "used_this_minute": key.window_count if now - key.window_start < QUOTA_WINDOW else 0,
+                    "parked_until": key.parked_until if key.parked_until > now else None,
+                    "park_reason": key.park_reason if key.parked_until > now else "",
+                }
+                for key in self._keys
+            ]
+
+
+_pools: Dict[str, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(provider: str, section: Dict[str, str]) -> KeyPool:
+    """The process-wide pool for ``provider``, refreshed from its decrypted config section.
+
+    The section's ``api_key`` comes first with weight 1, followed by its ``api_keys``.
+    """
+    with _pools_lock:
+        pool = _pools.get(provider)
+        if pool is None:
+            pool = _pools[provider] = KeyPool(provider)
+    entries = [(section.get("api_key", ""), 1, 0)]
+    entries += [(str(entry.get("key") or ""), entry.get("weight", 1), entry.get("rpm", 0)) for entry in key_pool_entries(section)]
+    pool.update(entries)
+    return pool
@@ -0,0 +1,241 @@
+"""Adapter for a self-hosted OpenAI-compatible server (llama.cpp, vLLM and similar).
+
+Prompts for the same server and model that arrive within ``batch_window_ms`` of each other
+are coalesced into one ``/completions`` request carrying a list of prompts, which these
+servers decode as a single batch. The response is streamed, and each caller returns as soon
+as its own completion finishes rather than when the slowest prompt of its batch does.
+"""
+
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from .base import LLMProvider
+from ...config import get_decrypted_config
+from ...constants import DEFAULT_CONFIG, LOCAL_MODEL_PREFIX
+
+
+MAX_TOKENS = 512
+TEMPERATURE = 0.7
+# CPU boxes decode slowly; this bounds a whole batch, not the first token.
+REQUEST_TIMEOUT = 180.0
+
+
+class LocalError(Exception):
+    """Custom exception for local model server errors."""
+    pass
+
+
+class _Pending:
+    """One prompt waiting in, or being decoded as part of, a batch."""
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.parts: List[str] = []
+        self.chunks = 0
+        self.ttfb_ms: Optional[int] = None
+        self.error: Optional[Exception] = None
+        self.status: Optional[int] = None
+        self.retry_after: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts).strip()
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[_Pending] = []
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesces concurrent prompts for one server and model into batched requests.
+
+    The first prompt to arrive opens a batch and waits up to ``window`` seconds, or until
+    ``max_batch`` prompts have joined, then sends the batch from its own thread. Prompts that
+    joined wait for their part of the streamed response. No extra threads are involved.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: str = "", window: float = 0.015, max_batch: int = 8):
+        self.url = base_url.rstrip("/") + "/completions"
+        self.model = model
+        self.api_key = api_key
+        self.window = window
+        self.max_batch = max(int(max_batch), 1)
+        self.batches = 0
+        self.prompts = 0
+        self._lock = threading.Lock()
+        self._open: Optional[_Batch] = None
+
+    def submit(self, prompt: str) -> _Pending:
+        """Queue ``prompt`` and block until its completion (or the batch's error) is in."""
+        with self._lock:
+            batch = self._open
+            leader = batch is None
+            if leader:
+                batch = self._open = _Batch()
+            pending = _Pending(prompt)
+            batch.items.append(pending)
+            if len(batch.items) >= self.max_batch:
+                self._open = None
+                batch.full.set()
+        if leader:
+            if self.window > 0:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            self._send(batch.items)
+        # The leader's request is bounded by REQUEST_TIMEOUT and always settles every item
+        pending.done.wait()
+        return pending
+
+    def _send(self, items: List[_Pending]) -> None:
+        with self._lock:
+            self.batches += 1
+            self.prompts += len(items)
+        started = time.perf_counter()
+        payload: Dict[str, object] = {
+            "model": self.model,
+            "prompt": [item.prompt for item in items] if len(items) > 1 else items[0].prompt,
+            "max_tokens": MAX_TOKENS,
+            "temperature": TEMPERATURE,
+            "stream": True,
+        }
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        try:
+            with requests.post(self.url, json=payload, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                if "text/event-stream" in response.headers.get("Content-Type", ""):
+                    self._read_stream(response, items, started)
+                else:
+                    # Servers that ignore ``stream`` answer with one JSON body
+                    for index, text in self._choices(response.json().get("choices") or []):
+                        self._append(items, index, text, started)
+        except requests.exceptions.HTTPError as err:
+            status, retry_after, detail = _error_details(err.response)
+            for item in items:
+                item.status, item.retry_after = status, retry_after
+            self._fail(items, LocalError(f"Local model request failed: {detail or err}"))
+        except requests.exceptions.RequestException as err:
+            self._fail(items, LocalError(f"Local model request failed: {err}"))
+        except (KeyError, TypeError, ValueError) as err:
+            self._fail(items, LocalError(f"Unexpected local model response format: {err}"))
+        finally:
+            for item in items:
+                if not item.parts and item.error is None:
+                    item.error = LocalError("Local model returned no completion")
+                item.done.set()
+
+    def _read_stream(self, response, items: List[_Pending], started: float) -> None:
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            for choice in json.loads(data).get("choices") or []:
+                index = int(choice.get("index", 0))
+                self._append(items, index, choice.get("text") or "", started)
+                if choice.get("finish_reason") and 0 <= index < len(items):
+                    # Release this caller now; the rest of the batch keeps streaming
+                    items[index].done.set()
+
+    @staticmethod
+    def _choices(choices: List[Dict]) -> List[Tuple[int, str]]:
+        return [(int(choice.get("index", position)), choice["text"]) for position, choice in enumerate(choices)]
+
+    @staticmethod
+    def _append(items: List[_Pending], index: int, text: str, started: float) -> None:
+        if not text or not 0 <= index < len(items):
+            return
+        item = items[index]
+        if item.ttfb_ms is None:
+            item.ttfb_ms = int((time.perf_counter() - started) * 1000)
+        item.parts.append(text)
+        item.chunks += 1
+
+    @staticmethod
+    def _fail(items: List[_Pending], error: Exception) -> None:
+        for item in items:
+            if not item.done.is_set():
+                item.parts = []
+                item.error = error
+
+
+def _error_details(response) -> Tuple[Optional[int], Optional[float], str]:
+    if response is None:
+        return None, None, ""
+    try:
+        retry_after = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        retry_after = None
+    try:
+        detail = response.json().get("error", {}).get("message") or response.text
+    except (AttributeError, ValueError):
+        detail = response.text
+    return response.status_code, retry_after, detail
+
+
+_batchers: Dict[Tuple[str, str, str], MicroBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(base_url: str, model: str, api_key: str = "", window: float = 0.015, max_batch: int = 8) -> MicroBatcher:
+    """The process-wide batcher for one server, model and key, updated to the given settings."""
+    with _batchers_lock:
+        batcher = _batchers.get((base_url, model, api_key))
+        if batcher is None:
+            batcher = _batchers[(base_url, model, api_key)] = MicroBatcher(base_url, model, api_key, window, max_batch)
+        batcher.window, batcher.max_batch = window, max(int(max_batch), 1)
+        return batcher
+
+
+def batcher_stats() -> List[Dict[str, object]]:
+    with _batchers_lock:
+        return [
+            {
+                "base_url": base_url,
+                "model": model,
+                "batches": batcher.batches,
+                "prompts": batcher.prompts,
+                "mean_batch": round(batcher.prompts / batcher.batches, 2) if batcher.batches else 0.0,
+            }
+            for (base_url, model, _key), batcher in sorted(_batchers.items())
+        ]
+
+
+class LocalProvider(LLMProvider):
+    """Self-hosted OpenAI-compatible server, configured in the ``LOCAL`` config section."""
+
+    def __init__(self, api_key: str, model: str, section: Optional[Dict[str, str]] = None):
+        super().__init__("local", api_key, model)
+        section = section if section is not None else get_decrypted_config().get("LOCAL", {})
+        defaults = DEFAULT_CONFIG["LOCAL"]
+        self.base_url = section.get("base_url", "").strip()
+        try:
+            self.batch_window = float(section.get("batch_window_ms") or defaults["batch_window_ms"]) / 1000
+            self.max_batch = int(section.get("max_batch") or defaults["max_batch"])
+        except ValueError:
+            self.batch_window, self.max_batch = float(defaults["batch_window_ms"]) / 1000, int(defaults["max_batch"])
+
+    def request_completion(self, prompt: str) -> str:
+        if not self.base_url:
+            raise LocalError("Local model server URL is missing. Add it via Settings.")
+        served_model = self.model[len(LOCAL_MODEL_PREFIX):] if self.model.startswith(LOCAL_MODEL_PREFIX) else self.model
+        batcher = get_batcher(self.base_url, served_model, self.api_key, self.batch_window, self.max_batch)
+        pending = batcher.submit(prompt)
+        self.last_ttfb_ms = pending.ttfb_ms
+        if pending.error is not None:
+            self.last_status, self.last_retry_after = pending.status, pending.retry_after
+            raise pending.error
+        # Streamed chunks are single tokens on llama.cpp and vLLM
+        self.last_usage = {"completion_tokens": pending.chunks}
+        return pending.text
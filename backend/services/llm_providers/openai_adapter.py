@@ -1,39 +1,60 @@
 import requests
-from typing import Optional
+from typing import Dict, List
+
 from .base import LLMProvider
+from ...constants import OPENAI_API_URL, OPENAI_DEFAULT_MODEL
+
+
+class OpenAIError(Exception):
+    """Custom exception for OpenAI API errors."""
+    pass
 
 
 class OpenAIProvider(LLMProvider):
     """OpenAI API provider for content generation."""
-    
-    def __init__(self, api_key: str, model: str = "gpt-3.5-turbo"):
-        self.api_key = api_key
-        self.model = model
-        self.base_url = "https://api.openai.com/v1/chat/completions"
-    
+
+    def __init__(self, api_key: str, model: str = OPENAI_DEFAULT_MODEL):
+        super().__init__("openai", api_key, model)
+        self.base_url = OPENAI_API_URL
+
+    max_samples = 8
+
     def request_completion(
         self,
         prompt: str,
         max_tokens: int = 512,
         temperature: float = 0.7
-    ) -> Optional[str]:
+    ) -> str:
         """
         Request a completion from OpenAI API.
-        
+
         Args:
             prompt: The prompt to send to the model
             max_tokens: Maximum tokens in the response
             temperature: Sampling temperature (0-2)
-            
+
         Returns:
-            The generated text or None if request fails
+            The generated text
+
+        Raises:
+            OpenAIError: If the request fails or the response cannot be parsed
         """
+        return self._request(prompt, 1, max_tokens, temperature)[0]
+
+    def request_samples(self, prompt: str, n: int) -> List[str]:
+        """``n`` completions from one API call, using the ``n`` parameter."""
+        return self._request(prompt, min(n, self.max_samples), 512, 0.9)
+
+    def _request(self, prompt: str, n: int, max_tokens: int, temperature: float) -> List[str]:
+        if not self.api_key:
+            raise OpenAIError("OpenAI API key is missing. Add it via Settings.")
+
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
-        payload = {
+
+        payload: Dict[str, object] = {
             "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
@@ -41,7 +62,9 @@ class OpenAIProvider(LLMProvider):
             "max_tokens": max_tokens,
             "temperature": temperature
         }
-        
+        if n > 1:
+            payload["n"] = n
+
         try:
             response = requests.post(
                 self.base_url,
@@ -49,14 +72,27 @@ class OpenAIProvider(LLMProvider):
                 json=payload,
                 timeout=30
             )
+            self.last_ttfb_ms = int(response.elapsed.total_seconds() * 1000)
             response.raise_for_status()
-            
+        except requests.exceptions.HTTPError as err:
+            self._note_error_response(err.response)
+            detail = ""
+            if err.response is not None:
+                try:
+                    detail = err.response.json().get("error", {}).get("message") or err.response.text
+                except ValueError:
+                    detail = err.response.text
+            raise OpenAIError(f"OpenAI request failed: {detail or err}") from None
+        except requests.exceptions.RequestException as err:
+            raise OpenAIError(f"OpenAI request failed: {err}") from None
+
+        try:
             data = response.json()
-            return data["choices"][0]["message"]["content"].strip()
-            
-        except requests.exceptions.RequestException as e:
-            print(f"OpenAI API request failed: {e}")
-            return None
-        except (KeyError, IndexError) as e:
-            print(f"Failed to parse OpenAI response: {e}")
-            return None
+            usage = data.get("usage") or {}
+            self.last_usage = {key: usage[key] for key in ("prompt_tokens", "completion_tokens") if key in usage}
+            texts = [choice["message"]["content"].strip() for choice in data["choices"]]
+            if not texts:
+                raise IndexError("no choices")
+            return texts
+        except (KeyError, IndexError, ValueError) as err:
+            raise OpenAIError(f"Unexpected OpenAI response format: {err}") from None
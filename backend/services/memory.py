@@ -0,0 +1,154 @@
+import logging
+import re
+from datetime import datetime, timedelta
+from textwrap import shorten
+from threading import Event, Thread
+from typing import Optional, Sequence, Tuple
+
+from ..config import get_decrypted_config
+from ..database import prune_content, prune_coordination
+from ..storage import get_storage
+from .coordination import Lease
+from .llm_providers import get_key_pool, request_completion
+
+
+LOGGER = logging.getLogger("taskpilot.memory")
+
+COMPACT_AFTER = timedelta(days=14)
+COMPACTION_INTERVAL = 6 * 3600
+MAX_SUMMARY_CHARS = 1500
+BATCH_SIZE = 100
+
+_GENERATED_PATTERN = re.compile(r"Generated post - Title:\s*(?P<title>.*?)\s*Body:\s*(?P<body>.*)", re.DOTALL)
+
+
+def _first_sentence(text: str) -> str:
+    collapsed = " ".join(text.replace("*", "").replace("#", "").split())
+    match = re.search(r"(.+?[.!?])(\s|$)", collapsed)
+    return shorten(match.group(1) if match else collapsed, width=160, placeholder="…")
+
+
+def extractive_summary(rows: Sequence[Tuple[int, str, str, str, str]]) -> str:
+    """Summarize messages as one line per request/post without calling a model."""
+    lines = []
+    for _, role, content, _, _ in rows:
+        content = content or ""
+        if role == "assistant":
+            match = _GENERATED_PATTERN.match(content)
+            if match:
+                lines.append(f"Wrote \"{match.group('title').strip()}\": {_first_sentence(match.group('body'))}")
+            else:
+                lines.append(f"Replied: {_first_sentence(content)}")
+        else:
+            lines.append(f"Asked: {shorten(' '.join(content.split()), width=160, placeholder='…')}")
+    return "\n".join(lines)
+
+
+def _llm_summary(rows: Sequence[Tuple[int, str, str, str, str]], config) -> Optional[str]:
+    # Imported lazily: tasks pulls in the whole generation pipeline.
+    from .tasks import _get_provider_priority
+
+    transcript = "\n\n".join(f"{role}: {shorten(content or '', width=1200, placeholder='…')}" for _, role, content, _, _ in rows)
+    prompt = (
+        "Summarize this content-generation conversation in under 120 words. Keep the topics covered, "
+        "the voice and formatting habits, and anything that worked well, so future posts can build on it.\n\n"
+        + transcript
+    )
+    for provider_name in _get_provider_priority(None, config):
+        section = config.get(provider_name.upper(), {})
+        keys = get_key_pool(provider_name, section)
+        if keys and section.get("model"):
+            try:
+                result = request_completion(keys, prompt, section["model"])
+            except Exception as exc:
+                LOGGER.warning("LLM summary via %s failed: %s", provider_name, exc)
+                continue
+            if result:
+                return result.strip()
+    return None
+
+
+def _merge_summaries(previous: Optional[str], addition: str) -> str:
+    merged = f"{previous}\n{addition}" if previous else addition
+    if len(merged) <= MAX_SUMMARY_CHARS:
+        return merged
+    # Keep the newest lines; the raw text is still in the archive.
+    return "…" + merged[-(MAX_SUMMARY_CHARS - 1):].split("\n", 1)[-1]
+
+
+def compact_memory(older_than: timedelta = COMPACT_AFTER, use_llm: Optional[bool] = None) -> Tuple[int, int]:
+    """Roll messages older than ``older_than`` into per-conversation summaries.
+
+    Returns ``(conversations, messages)`` compacted.
+    """
+    config = get_decrypted_config()
+    if use_llm is None:
+        use_llm = config.get("SETTINGS", {}).get("memory_summaries_use_llm", "false").lower() == "true"
+    cutoff = (datetime.utcnow() - older_than).isoformat()
+
+    storage = get_storage()
+    conversations = messages = 0
+    while True:
+        conversation_ids = storage.fetch_compactable_conversations(cutoff, BATCH_SIZE)
+        if not conversation_ids:
+            break
+        for conversation_id in conversation_ids:
+            rows = storage.fetch_messages_before(conversation_id, cutoff)
+            if not rows:
+                continue
+            summary = (_llm_summary(rows, config) if use_llm else None) or extractive_summary(rows)
+            previous = storage.get_conversation_summary(conversation_id)
+            storage.archive_messages(conversation_id, rows, _merge_summaries(previous[0] if previous else None, summary))
+            conversations += 1
+            messages += len(rows)
+    if messages:
+        # Bodies referenced only by archived messages are no longer needed in the main store
+        pruned = prune_content(cutoff)
+        LOGGER.info("Compacted %s messages across %s conversations (%s content entries pruned)", messages, conversations, pruned)
+    return conversations, messages
+
+
+class MemoryCompactor:
+    """Runs ``compact_memory`` periodically in the background.
+
+    The lease lasts one interval, so with several worker processes one of them compacts per
+    period and another takes over if that worker goes away.
+    """
+
+    def __init__(self, interval: float = COMPACTION_INTERVAL):
+        self.interval = interval
+        self._lease = Lease("memory-compactor", ttl=interval + 60)
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="memory-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._lease.release()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if not self._lease.renew():
+                continue
+            try:
+                compact_memory()
+                prune_coordination()
+            except Exception:
+                LOGGER.exception("Memory compaction failed")
+
+
+_compactor = MemoryCompactor()
+
+
+def get_compactor() -> MemoryCompactor:
+    """Get the global memory compactor."""
+    return _compactor
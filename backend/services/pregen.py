@@ -0,0 +1,194 @@
+"""Background pre-generation of drafts for trending topics.
+
+Trends move over hours, so drafts for them can be written before anyone asks. Every
+``POLL_INTERVAL`` the worker holding the ``draft-pregen`` lease reads the trending topics of
+each region (refreshed every ``TOPIC_REFRESH``) and writes drafts for the region, persona,
+tone and length combinations used most in recent post history. Drafts wait in the
+``draft_pool`` table until ``/api/generate`` asks for the same topic and combination, or
+until they expire.
+
+Providers are only used while they are idle: no interactive generation in any worker for
+``INTERACTIVE_GRACE`` seconds, no provider cooling down, and drafts spaced
+``DRAFT_SPACING`` apart. Pre-generation stops for the (UTC) day once the configured draft
+count or spend is reached.
+"""
+
+import logging
+import time
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from typing import Dict, List, Optional, Tuple
+
+from ..config import get_decrypted_config
+from ..database import (
+    add_pool_draft,
+    fetch_draft_pool_summary,
+    fetch_pool_topic_keys,
+    fetch_pregen_spend,
+    fetch_provider_cooldowns,
+    purge_expired_drafts,
+    rate_limit_ready,
+    record_pregen_spend,
+)
+from ..storage import get_storage
+from ..tracing import span
+from .coordination import Lease
+from .dedup import find_duplicate_topic
+from .tasks import INTERACTIVE_KEY, _build_style_context, compose_post
+from .topics import get_topics, normalize_topic
+
+
+LOGGER = logging.getLogger("taskpilot.pregen")
+
+POLL_INTERVAL = 60.0
+TOPIC_REFRESH = 900.0
+# Post history window that decides which combinations are worth pre-generating.
+POPULARITY_DAYS = 30
+DRAFT_SPACING = 5.0
+MAX_DRAFTS_PER_CYCLE = 6
+LEASE_TTL = 300.0
+
+
+def _settings(config) -> Dict[str, float]:
+    section = config.get("SETTINGS", {})
+
+    def number(key: str, default: float) -> float:
+        try:
+            return float(section.get(key, default))
+        except (TypeError, ValueError):
+            return default
+
+    return {
+        "enabled": str(section.get("pregeneration", "false")).lower() == "true",
+        "combinations": int(number("pregen_combinations", 3)),
+        "daily_drafts": int(number("pregen_daily_drafts", 60)),
+        "daily_budget_usd": number("pregen_daily_budget_usd", 0.5),
+        "ttl": number("pregen_draft_ttl_hours", 4) * 3600,
+    }
+
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+class DraftPregenerator:
+    """Keeps the draft pool filled for trending topics while providers are idle.
+
+    With several worker processes only the holder of the ``draft-pregen`` lease generates.
+    """
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lease = Lease("draft-pregen", ttl=LEASE_TTL)
+        self._topics: Dict[str, Tuple[float, List[str]]] = {}  # region -> (fetched_at, topics)
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="draft-pregen", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._lease.release()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                config = get_decrypted_config()
+                if not _settings(config)["enabled"] or not self._lease.renew():
+                    continue
+                made = self.run_once(config)
+                if made:
+                    LOGGER.info("Pre-generated %s drafts", made)
+            except Exception:
+                LOGGER.exception("Draft pre-generation failed")
+
+    def _trending(self, region: str) -> List[str]:
+        fetched_at, topics = self._topics.get(region, (0.0, []))
+        if time.monotonic() - fetched_at >= TOPIC_REFRESH:
+            # The same (keyword-less) lookup /api/generate makes, so pooled topics match its topics
+            topics = get_topics("", region)
+            self._topics[region] = (time.monotonic(), topics)
+        return topics
+
+    def blocked(self, settings: Dict[str, float]) -> Optional[str]:
+        """Why no draft may be generated right now, or ``None``."""
+        if not rate_limit_ready(INTERACTIVE_KEY):
+            return "interactive generation in progress"
+        if fetch_provider_cooldowns():
+            return "a provider is cooling down"
+        drafts, spent = fetch_pregen_spend(_today())
+        if drafts >= settings["daily_drafts"] or spent >= settings["daily_budget_usd"]:
+            return "daily budget reached"
+        return None
+
+    def run_once(self, config=None) -> int:
+        """Fill the pool for the most used combinations. Returns how many drafts were written."""
+        config = config or get_decrypted_config()
+        settings = _settings(config)
+        purge_expired_drafts()
+        since = (datetime.utcnow() - timedelta(days=POPULARITY_DAYS)).isoformat()
+        # Bulk drafts go to the self-hosted server first when there is one
+        preferred = "local" if config.get("LOCAL", {}).get("base_url") else None
+        made = 0
+        for region, persona, tone, length, _uses in get_storage().fetch_popular_combinations(since, settings["combinations"]):
+            pooled = fetch_pool_topic_keys(region, persona, tone, length)
+            style_context = None
+            for topic in self._trending(region):
+                topic_key = normalize_topic(topic)
+                if topic_key in pooled or find_duplicate_topic(topic) is not None:
+                    continue
+                reason = self.blocked(settings)
+                if made >= MAX_DRAFTS_PER_CYCLE or reason or self._stop.is_set():
+                    if reason:
+                        LOGGER.debug("Pre-generation paused: %s", reason)
+                    return made
+                if style_context is None:
+                    style_context = _build_style_context(persona)
+                try:
+                    with span("pregen.draft", root=True, region=region, length=length):
+                        title, body, _score, served_by = compose_post(
+                            topic, region, tone, persona, length, config, style_context, preferred
+                        )
+                except Exception as exc:
+                    # Failures already count against the provider's health; try again next cycle
+                    LOGGER.warning("Pre-generating a draft for %r failed: %s", topic, exc)
+                    return made
+                add_pool_draft(topic_key, topic, region, persona, tone, length, title, body, served_by, settings["ttl"])
+                record_pregen_spend(_today(), float(served_by.get("cost_usd") or 0.0))
+                pooled.add(topic_key)
+                made += 1
+                self._stop.wait(DRAFT_SPACING)
+                self._lease.renew()
+        return made
+
+    def status(self) -> Dict[str, object]:
+        config = get_decrypted_config()
+        settings = _settings(config)
+        drafts, spent = fetch_pregen_spend(_today())
+        return {
+            "enabled": settings["enabled"],
+            "leader": self._lease.held,
+            "paused": self.blocked(settings) if settings["enabled"] else None,
+            "today": {"drafts": drafts, "cost_usd": round(spent, 6)},
+            "limits": {"drafts": settings["daily_drafts"], "cost_usd": settings["daily_budget_usd"]},
+            "pool": [
+                {"region": region, "persona": persona, "tone": tone, "length": length, "drafts": count, "oldest": oldest}
+                for region, persona, tone, length, count, oldest in fetch_draft_pool_summary()
+            ],
+        }
+
+
+_pregenerator = DraftPregenerator()
+
+
+def get_pregenerator() -> DraftPregenerator:
+    """Get the global draft pre-generator."""
+    return _pregenerator
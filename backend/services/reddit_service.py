@@ -1,21 +1,38 @@
-from functools import lru_cache
-from typing import Optional
+from __future__ import annotations
 
-import praw
+import hashlib
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Condition, Lock
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from ..constants import REDIRECT_URI
+from ..constants import REDDIT_OAUTH_URL, REDDIT_URL, REDIRECT_URI
+from ..database import cache_delete, cache_get, cache_set
 
 
-class RedditAuthError(RuntimeError):
-    """Raised when Reddit authentication fails."""
+if TYPE_CHECKING:
+    import praw
 
+LOGGER = logging.getLogger("taskpilot.reddit")
 
-@lru_cache(maxsize=1)
-def _build_reddit(**credentials) -> praw.Reddit:
-    return praw.Reddit(**credentials)
+# A validated session is trusted for this long before ``reddit.user.me()`` is called again.
+VALIDATION_TTL = 15 * 60
+# Upper bound on PRAW instances per account; PRAW clients are not safe to share across threads.
+POOL_SIZE = 4
+# ``reddit.info`` accepts at most this many fullnames per request.
+INFO_BATCH_SIZE = 100
 
+_SUBMISSION_ID = re.compile(r"/comments/([a-z0-9]+)", re.IGNORECASE)
 
-def get_reddit_client(config_section) -> Optional[praw.Reddit]:
+
+class RedditAuthError(RuntimeError):
+    """Raised when Reddit authentication fails."""
+
+
+def _credentials_from_config(config_section) -> Optional[Dict[str, Optional[str]]]:
     client_id = config_section.get("client_id", "").strip()
     user_agent = config_section.get("user_agent", "").strip()
     refresh_token = config_section.get("refresh_token", "").strip()
@@ -24,31 +41,163 @@ def get_reddit_client(config_section) -> Optional[praw.Reddit]:
     password = config_section.get("password", "").strip()
 
     if refresh_token:
-        credentials = dict(
+        return dict(
             client_id=client_id,
             client_secret=None,
             refresh_token=refresh_token,
             redirect_uri=REDIRECT_URI,
             user_agent=user_agent,
         )
-    elif all((client_id, client_secret, username, password, user_agent)):
-        credentials = dict(
+    if all((client_id, client_secret, username, password, user_agent)):
+        return dict(
             client_id=client_id,
             client_secret=client_secret,
             username=username,
             password=password,
             user_agent=user_agent,
         )
-    else:
-        return None
+    return None
+
+
+def account_key(credentials: Dict[str, Optional[str]]) -> str:
+    """Stable, non-reversible identifier for a set of credentials."""
+    material = "\x1f".join(f"{key}={credentials[key] or ''}" for key in sorted(credentials))
+    return hashlib.sha256(material.encode()).hexdigest()[:16]
+
+
+class _AccountPool:
+    """Clients for one Reddit account plus its cached validation state."""
+
+    def __init__(self, credentials: Dict[str, Optional[str]], size: int):
+        self.credentials = credentials
+        self.key = account_key(credentials)
+        self.size = size
+        self.primary: Optional[praw.Reddit] = None
+        self.validated_at: Optional[float] = None
+        self.validate_lock = Lock()
+        self._idle: List[praw.Reddit] = []
+        self._created = 0
+        self._available = Condition()
+
+    def build(self) -> praw.Reddit:
+        # PRAW is slow to import; load it on first use rather than at worker boot
+        import praw
+
+        overrides = {key: url for key, url in (("oauth_url", REDDIT_OAUTH_URL), ("reddit_url", REDDIT_URL)) if url}
+        return praw.Reddit(**self.credentials, **overrides)
+
+    def acquire(self) -> praw.Reddit:
+        with self._available:
+            while not self._idle and self._created >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._created += 1
+        try:
+            return self.build()
+        except Exception:
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def release(self, client: praw.Reddit) -> None:
+        with self._available:
+            self._idle.append(client)
+            self._available.notify()
+
+
+class RedditClientManager:
+    """Caches validated PRAW clients per account and hands them out from a thread-safe pool.
+
+    Validation results are also written to the shared cache, so one ``user.me()`` call per
+    TTL covers every worker process.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, validation_ttl: float = VALIDATION_TTL):
+        self.pool_size = pool_size
+        self.validation_ttl = validation_ttl
+        self._pools: Dict[str, _AccountPool] = {}
+        self._lock = Lock()
 
-    try:
-        reddit = _build_reddit(**credentials)
-        # Trigger a lightweight request to validate session
-        reddit.user.me()
-        return reddit
-    except Exception as exc:
-        raise RedditAuthError(str(exc))
+    def _pool(self, credentials: Dict[str, Optional[str]]) -> _AccountPool:
+        key = account_key(credentials)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = _AccountPool(credentials, self.pool_size)
+            return pool
+
+    def _is_fresh(self, pool: _AccountPool) -> bool:
+        return pool.validated_at is not None and time.monotonic() - pool.validated_at < self.validation_ttl
+
+    def _ensure_valid(self, pool: _AccountPool) -> None:
+        if self._is_fresh(pool):
+            return
+        with pool.validate_lock:
+            if self._is_fresh(pool):
+                return
+            shared_key = f"reddit:validated:{pool.key}"
+            validated_elsewhere = cache_get(shared_key) is not None
+            try:
+                if pool.primary is None:
+                    pool.primary = pool.build()
+                if not validated_elsewhere:
+                    # Trigger a lightweight request to validate session
+                    pool.primary.user.me()
+            except Exception as exc:
+                pool.validated_at = None
+                raise RedditAuthError(str(exc))
+            if not validated_elsewhere:
+                cache_set(shared_key, "1", self.validation_ttl)
+            pool.validated_at = time.monotonic()
+
+    def get_client(self, config_section) -> Optional[praw.Reddit]:
+        """Return the validated primary client for an account, or ``None`` if credentials are incomplete.
+
+        The primary client is shared; use it to check credentials and make requests through ``lease``.
+        """
+        credentials = _credentials_from_config(config_section)
+        if credentials is None:
+            return None
+        pool = self._pool(credentials)
+        self._ensure_valid(pool)
+        return pool.primary
+
+    @contextmanager
+    def lease(self, config_section) -> Iterator[Optional[praw.Reddit]]:
+        """Borrow a dedicated client for the duration of the block."""
+        credentials = _credentials_from_config(config_section)
+        if credentials is None:
+            yield None
+            return
+        pool = self._pool(credentials)
+        self._ensure_valid(pool)
+        client = pool.acquire()
+        try:
+            yield client
+        finally:
+            pool.release(client)
+
+    def invalidate(self, config_section) -> None:
+        """Force the next use of an account to revalidate its session."""
+        credentials = _credentials_from_config(config_section)
+        if credentials is not None:
+            pool = self._pool(credentials)
+            pool.validated_at = None
+            cache_delete(f"reddit:validated:{pool.key}")
+
+
+_manager = RedditClientManager()
+
+
+def get_client_manager() -> RedditClientManager:
+    """Get the global Reddit client manager."""
+    return _manager
+
+
+def get_reddit_client(config_section) -> Optional[praw.Reddit]:
+    return _manager.get_client(config_section)
 
 
 def post_to_reddit(reddit: praw.Reddit, subreddit: str, title: str, body: str) -> str:
@@ -59,3 +208,45 @@ def post_to_reddit(reddit: praw.Reddit, subreddit: str, title: str, body: str) -
 def fetch_submission_stats(reddit: praw.Reddit, url: str) -> tuple[int, int]:
     submission = reddit.submission(url=url)
     return submission.score, submission.num_comments
+
+
+def fetch_many_submission_stats(config_section, posts: Iterable[Tuple[int, str]]) -> List[Tuple[int, int, int]]:
+    """Fetch ``(post_id, score, comments)`` for many submissions using pooled clients in parallel."""
+
+    def fetch(item: Tuple[int, str]) -> Optional[Tuple[int, int, int]]:
+        post_id, link = item
+        with _manager.lease(config_section) as reddit:
+            try:
+                score, comments = fetch_submission_stats(reddit, link)
+            except Exception as exc:
+                LOGGER.warning("Failed to fetch stats for %s: %s", link, exc)
+                return None
+        return post_id, score, comments
+
+    with ThreadPoolExecutor(max_workers=_manager.pool_size, thread_name_prefix="reddit-refresh") as executor:
+        return [result for result in executor.map(fetch, posts) if result is not None]
+
+
+def fetch_stats_by_link(config_section, links: Sequence[str]) -> Dict[str, Tuple[int, int]]:
+    """Map submission links to ``(score, comments)`` with one ``reddit.info`` call per 100 links.
+
+    Links that are not Reddit submissions, or that Reddit no longer returns, are left out.
+    """
+    by_fullname: Dict[str, str] = {}
+    for link in links:
+        match = _SUBMISSION_ID.search(link or "")
+        if match:
+            by_fullname[f"t3_{match.group(1).lower()}"] = link
+    results: Dict[str, Tuple[int, int]] = {}
+    if not by_fullname:
+        return results
+    fullnames = list(by_fullname)
+    with _manager.lease(config_section) as reddit:
+        if reddit is None:
+            return results
+        for start in range(0, len(fullnames), INFO_BATCH_SIZE):
+            for submission in reddit.info(fullnames=fullnames[start:start + INFO_BATCH_SIZE]):
+                link = by_fullname.get(submission.fullname)
+                if link is not None:
+                    results[link] = (submission.score, submission.num_comments)
+    return results
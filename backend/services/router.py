@@ -0,0 +1,212 @@
+"""Per-call choice of provider and model for generation.
+
+Each call is routed by task (a title, or a body of one of the ``CONTENT_LENGTH_PRESETS``
+lengths). Candidates are the tiered models of every provider with a key. They are ranked by
+estimated latency and cost against the task's targets. Estimates start from tier priors and
+token counts, then follow this process's observed latency, output size and error rate per
+provider, model and task.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from ..config import key_pool_entries
+from ..constants import (
+    CONTENT_LENGTH_PRESETS,
+    GOOGLE_MODEL_CHOICES,
+    GROQ_MODEL_CHOICES,
+    LOCAL_MODEL_PREFIX,
+    MODEL_PRICING,
+    MODEL_TIERS,
+    OPENAI_MODEL_CHOICES,
+    TITLE_ROUTING_TARGET,
+)
+from ..database import fetch_provider_cooldowns
+from .llm_providers import KeyPool, request_candidates
+from .telemetry import last_call
+
+
+PROVIDER_MODELS = {"groq": GROQ_MODEL_CHOICES, "google": GOOGLE_MODEL_CHOICES, "openai": OPENAI_MODEL_CHOICES, "local": []}
+TIER_RANK = {"small": 1, "large": 2}
+# Priors until a route has MIN_SAMPLES observations: fixed overhead plus time per output token.
+PRIOR_LATENCY = {"small": (400.0, 8.0), "large": (900.0, 25.0)}
+EXPECTED_TITLE_TOKENS = 40
+EXPECTED_TOKENS_PER_PARAGRAPH = 110
+MIN_SAMPLES = 3
+# Weight of the newest observation in the moving averages.
+EWMA_ALPHA = 0.2
+# Score added per unit of observed error rate, for a provider in cooldown, and per step down
+# the configured provider order (a tie-breaker).
+ERROR_PENALTY = 4.0
+COOLDOWN_PENALTY = 10.0
+ORDER_PENALTY = 0.1
+
+
+@dataclass
+class Route:
+    provider: str
+    model: str
+    estimated_ms: float
+    estimated_cost: Optional[float]
+    score: float
+
+
+class _RouteStats:
+    def __init__(self):
+        self.samples = 0
+        self.latency_ms = 0.0
+        self.completion_tokens = 0.0
+        self.error_rate = 0.0
+
+    def observe(self, latency_ms: float, ok: bool, completion_tokens: Optional[int]) -> None:
+        first = self.samples == 0
+        self.samples += 1
+        self.error_rate = (0.0 if ok else 1.0) if first else self.error_rate + EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            return
+        self.latency_ms = latency_ms if not self.latency_ms else self.latency_ms + EWMA_ALPHA * (latency_ms - self.latency_ms)
+        if completion_tokens:
+            previous = self.completion_tokens
+            self.completion_tokens = completion_tokens if not previous else previous + EWMA_ALPHA * (completion_tokens - previous)
+
+
+_lock = threading.Lock()
+_stats: Dict[Tuple[str, str, str], _RouteStats] = {}  # (provider, model, task)
+
+
+def task_target(task: str) -> Dict[str, object]:
+    if task == "title":
+        return TITLE_ROUTING_TARGET
+    return CONTENT_LENGTH_PRESETS.get(task, CONTENT_LENGTH_PRESETS["Standard"])
+
+
+def _expected_output_tokens(task: str) -> int:
+    if task == "title":
+        return EXPECTED_TITLE_TOKENS
+    return int(task_target(task)["paragraphs"]) * EXPECTED_TOKENS_PER_PARAGRAPH
+
+
+def _has_key(section: Dict[str, str]) -> bool:
+    # A local server is usable once its URL is set; it rarely needs a key
+    return bool(section.get("api_key") or section.get("base_url") or key_pool_entries(section))
+
+
+def _candidates(provider: str, configured: str, min_tier: str) -> List[str]:
+    """Models of ``provider`` good enough for ``min_tier``, with the configured model first.
+
+    A configured model missing from ``MODEL_TIERS`` counts as large; other untiered models
+    are never picked. If nothing qualifies the configured model is used anyway.
+    """
+    configured_rank = TIER_RANK[MODEL_TIERS.get(configured, "large")]
+    floor = configured_rank if min_tier == "default" else TIER_RANK.get(min_tier, 1)
+    models = [configured] if configured_rank >= floor else []
+    models += [
+        model
+        for model in PROVIDER_MODELS.get(provider, [])
+        if model != configured and model in MODEL_TIERS and TIER_RANK[MODEL_TIERS[model]] >= floor
+    ]
+    return models or [configured]
+
+
+def estimate(provider: str, model: str, task: str, prompt_tokens: int) -> Tuple[float, Optional[float], float]:
+    """``(latency_ms, cost_usd or None if unpriced, error_rate)`` for one call."""
+    with _lock:
+        stats = _stats.get((provider, model, task))
+        samples = stats.samples if stats else 0
+        observed_ms = stats.latency_ms if stats else 0.0
+        observed_tokens = stats.completion_tokens if stats else 0.0
+        error_rate = stats.error_rate if stats else 0.0
+    output_tokens = observed_tokens or _expected_output_tokens(task)
+    if samples >= MIN_SAMPLES and observed_ms:
+        latency = observed_ms
+    else:
+        overhead, per_token = PRIOR_LATENCY[MODEL_TIERS.get(model, "large")]
+        latency = overhead + per_token * output_tokens
+    pricing = (0.0, 0.0) if model.startswith(LOCAL_MODEL_PREFIX) else MODEL_PRICING.get(model)
+    cost = None if pricing is None else (prompt_tokens * pricing[0] + output_tokens * pricing[1]) / 1_000_000
+    return latency, cost, error_rate
+
+
+def plan_routes(
+    task: str, prompt: str, config, order: List[str], pinned: Optional[str] = None
+) -> List[Route]:
+    """Candidate routes for ``task``, best first; later entries are the failover chain.
+
+    ``order`` is the configured provider preference; ``pinned`` is a provider the caller asked
+    for explicitly, whose routes always come first. With ``SETTINGS.model_routing`` off, each
+    provider's configured model is used in ``order``.
+    """
+    routing = config.get("SETTINGS", {}).get("model_routing", "true").lower() != "false"
+    target = task_target(task)
+    min_tier = str(target.get("min_tier", "small"))
+    prompt_tokens = max(len(prompt) // 4, 1)
+    cooling = fetch_provider_cooldowns()
+    routes: List[Route] = []
+    for rank, provider in enumerate(order):
+        section = config.get(provider.upper(), {})
+        configured = section.get("model", "")
+        if not configured or not _has_key(section):
+            continue
+        models = _candidates(provider, configured, min_tier) if routing else [configured]
+        for model in models:
+            latency, cost, error_rate = estimate(provider, model, task, prompt_tokens)
+            # Unpriced models count as exactly on the cost target
+            score = latency / float(target["latency_ms"]) + (1.0 if cost is None else cost / float(target["cost_usd"]))
+            score += ERROR_PENALTY * error_rate + ORDER_PENALTY * rank
+            if provider in cooling:
+                score += COOLDOWN_PENALTY
+            routes.append(Route(provider, model, latency, cost, score))
+    if not routing:
+        return sorted(routes, key=lambda route: route.provider in cooling)
+    return sorted(routes, key=lambda route: (pinned is not None and route.provider != pinned, route.score))
+
+
+def record_outcome(route: Route, task: str, latency_ms: float, ok: bool, completion_tokens: Optional[int] = None) -> None:
+    with _lock:
+        stats = _stats.get((route.provider, route.model, task))
+        if stats is None:
+            stats = _stats[(route.provider, route.model, task)] = _RouteStats()
+        stats.observe(latency_ms, ok, completion_tokens)
+
+
+def complete_route(
+    route: Route, task: str, keys: KeyPool, prompt: str, attempt: int = 0, failover_reason: Optional[str] = None
+) -> str:
+    """Run one completion on ``route`` and feed its latency and output size back to the router."""
+    return sample_route(route, task, keys, prompt, 1, attempt, failover_reason)[0]
+
+
+def sample_route(
+    route: Route, task: str, keys: KeyPool, prompt: str, n: int, attempt: int = 0, failover_reason: Optional[str] = None
+) -> List[str]:
+    """Like ``complete_route`` for ``n`` candidates (see ``request_candidates``)."""
+    started = time.perf_counter()
+    texts: List[str] = []
+    try:
+        texts = request_candidates(keys, prompt, route.model, n, attempt, failover_reason)
+        return texts
+    finally:
+        call = last_call()
+        tokens = None
+        if texts and call is not None and call.completion_tokens:
+            tokens = call.completion_tokens // len(texts)
+        record_outcome(route, task, (time.perf_counter() - started) * 1000, bool(texts), tokens)
+
+
+def routing_stats() -> List[Dict[str, object]]:
+    """Observed latency, output size and error rate per provider, model and task."""
+    with _lock:
+        return [
+            {
+                "provider": provider,
+                "model": model,
+                "task": task,
+                "samples": stats.samples,
+                "latency_ms": round(stats.latency_ms, 1),
+                "completion_tokens": round(stats.completion_tokens, 1),
+                "error_rate": round(stats.error_rate, 3),
+            }
+            for (provider, model, task), stats in sorted(_stats.items())
+        ]
@@ -0,0 +1,272 @@
+import logging
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from threading import Event, Lock, Thread
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..config import get_decrypted_config
+from ..database import (
+    claim_submission,
+    complete_submission,
+    fail_submission,
+    fetch_due_submissions,
+    rate_limit_ready,
+    reserve_rate_limit,
+    reset_stale_submissions,
+    retry_submission,
+)
+from ..storage import get_storage
+from .coordination import LEASE_TTL, WORKER_ID, Lease
+from .reddit_service import RedditAuthError, get_client_manager, post_to_reddit
+
+
+LOGGER = logging.getLogger("taskpilot.scheduler")
+
+DEFAULT_ACCOUNT = "default"
+# Extra accounts live in INI sections named ``REDDIT:<name>`` next to the primary ``REDDIT`` section.
+ACCOUNT_SECTION_PREFIX = "REDDIT:"
+POLL_INTERVAL = 5.0
+MAX_WORKERS = 4
+MAX_ATTEMPTS = 5
+MAX_RATELIMIT_ATTEMPTS = 12
+BASE_BACKOFF = 60.0
+DEFAULT_ACCOUNT_INTERVAL = 600.0
+DEFAULT_SUBREDDIT_INTERVAL = 300.0
+# A submission still in progress this long after it was claimed is presumed hung and re-queued,
+# even if its worker is alive.
+SUBMISSION_TIMEOUT = 600.0
+
+_RATELIMIT_PATTERN = re.compile(r"(\d+)\s*(second|minute|hour)", re.IGNORECASE)
+_UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+def reddit_accounts(config) -> Dict[str, Dict[str, str]]:
+    """Map account name to its REDDIT config section."""
+    accounts = {DEFAULT_ACCOUNT: config.get("REDDIT", {})}
+    for section, values in config.items():
+        if section.startswith(ACCOUNT_SECTION_PREFIX):
+            accounts[section[len(ACCOUNT_SECTION_PREFIX):]] = values
+    return accounts
+
+
+def _setting_seconds(config, key: str, default: float) -> float:
+    try:
+        return float(config.get("SETTINGS", {}).get(key, "") or default)
+    except ValueError:
+        return default
+
+
+def _is_reddit_api_error(exc: Exception) -> bool:
+    # PRAW is imported lazily; until it is loaded no PRAW exception can have been raised.
+    exceptions = sys.modules.get("praw.exceptions")
+    return exceptions is not None and isinstance(exc, exceptions.RedditAPIException)
+
+
+def _ratelimit_delay(exc: Exception) -> Optional[float]:
+    """Seconds Reddit asked us to wait, if ``exc`` is a RATELIMIT error."""
+    if not _is_reddit_api_error(exc):
+        return None
+    for item in exc.items:
+        if item.error_type == "RATELIMIT":
+            match = _RATELIMIT_PATTERN.search(item.message or "")
+            if match:
+                return int(match.group(1)) * _UNIT_SECONDS[match.group(2).lower()] + 5
+            return BASE_BACKOFF
+    return None
+
+
+def _next_publish_time(subreddit: str, base: datetime) -> datetime:
+    """Next occurrence of the subreddit's historically best engagement hour."""
+    hours = get_storage().fetch_best_posting_hours(subreddit)
+    if not hours:
+        return base
+    candidate = base.replace(hour=hours[0], minute=0, second=0, microsecond=0)
+    return candidate if candidate >= base else candidate + timedelta(days=1)
+
+
+def plan_submissions(
+    count: int,
+    accounts: Sequence[str],
+    subreddits: Sequence[str],
+    publish_at: Optional[str] = None,
+    spread_minutes: int = 0,
+) -> List[Tuple[str, str, str]]:
+    """Spread ``count`` posts round-robin across account/subreddit pairs.
+
+    ``publish_at`` is an ISO timestamp (UTC), ``"auto"`` to use each subreddit's best hour, or
+    empty for now. Returns ``(account, subreddit, publish_at_iso)`` per post.
+    """
+    now = datetime.utcnow()
+    targets = [(account, subreddit) for subreddit in subreddits for account in accounts]
+    plan: List[Tuple[str, str, str]] = []
+    for index in range(count):
+        account, subreddit = targets[index % len(targets)]
+        if publish_at == "auto":
+            base = _next_publish_time(subreddit, now)
+        elif publish_at:
+            base = parse_publish_at(publish_at)
+        else:
+            base = now
+        plan.append((account, subreddit, (base + timedelta(minutes=spread_minutes * index)).isoformat()))
+    return plan
+
+
+def parse_publish_at(value: str) -> datetime:
+    """Naive UTC time for an ISO timestamp; one without an offset is taken to be UTC already."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class _IntervalLimiter:
+    """Enforces a minimum interval between actions per key.
+
+    Limits live in the database so they hold across worker processes and survive the
+    scheduler lease moving to another worker.
+    """
+
+    def ready(self, key: str) -> bool:
+        return rate_limit_ready(key)
+
+    def reserve(self, key: str, interval: float) -> None:
+        reserve_rate_limit(key, interval)
+
+    def defer(self, key: str, delay: float) -> None:
+        self.reserve(key, delay)
+
+
+class PostingScheduler:
+    """Publishes queued submissions concurrently within per-account and per-subreddit limits.
+
+    With several worker processes only the holder of the ``posting-scheduler`` lease
+    dispatches; the others keep polling and take over if it stops renewing.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reddit-post")
+        self._limiter = _IntervalLimiter()
+        self._lease = Lease("posting-scheduler")
+        # Renewed by every scheduler, leader or not, so the leader can tell whether the
+        # worker behind an in-progress claim is still alive.
+        self._worker_lease = Lease(f"posting-worker:{WORKER_ID}")
+        self._busy_accounts: set = set()
+        self._busy_lock = Lock()
+        self._wake = Event()
+        self._stop = Event()
+        self._thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="posting-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+        self._lease.release()
+
+    def wake(self) -> None:
+        """Re-check the queue now instead of waiting for the next poll."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._worker_lease.renew()
+                if self._lease.renew():
+                    recovered = reset_stale_submissions(SUBMISSION_TIMEOUT + LEASE_TTL)
+                    if recovered:
+                        LOGGER.info("Re-queued %s interrupted submissions", recovered)
+                    self.dispatch()
+            except Exception:
+                LOGGER.exception("Posting scheduler dispatch failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def dispatch(self) -> int:
+        """Hand every due, rate-limit-eligible submission to a worker. Returns how many were started."""
+        due = fetch_due_submissions(datetime.utcnow().isoformat())
+        if not due:
+            return 0
+
+        config = get_decrypted_config()
+        accounts = reddit_accounts(config)
+        account_interval = _setting_seconds(config, "account_post_interval", DEFAULT_ACCOUNT_INTERVAL)
+        subreddit_interval = _setting_seconds(config, "subreddit_post_interval", DEFAULT_SUBREDDIT_INTERVAL)
+
+        started = 0
+        for queue_id, account, subreddit in due:
+            account_key, subreddit_key = f"account:{account}", f"subreddit:{subreddit.lower()}"
+            with self._busy_lock:
+                if account in self._busy_accounts:
+                    continue
+                if not (self._limiter.ready(account_key) and self._limiter.ready(subreddit_key)):
+                    continue
+                job = claim_submission(queue_id, WORKER_ID)
+                if job is None:
+                    continue
+                self._busy_accounts.add(account)
+            self._limiter.reserve(account_key, account_interval)
+            self._limiter.reserve(subreddit_key, subreddit_interval)
+            self._executor.submit(self._publish, job, accounts.get(account))
+            started += 1
+        return started
+
+    def _publish(self, job: Tuple[int, int, str, str, str, str, int], section: Optional[Dict[str, str]]) -> None:
+        queue_id, post_id, account, subreddit, title, body, attempts = job
+        try:
+            if section is None:
+                raise RedditAuthError(f"Unknown Reddit account '{account}'.")
+            with get_client_manager().lease(section) as reddit:
+                if reddit is None:
+                    raise RedditAuthError(f"Reddit credentials for '{account}' are incomplete.")
+                link = post_to_reddit(reddit, subreddit, title, body)
+            complete_submission(queue_id, link)
+            if post_id:
+                get_storage().update_post_link(post_id, link, auto_posted=True)
+        except RedditAuthError as exc:
+            self._fail(queue_id, post_id, str(exc))
+        except Exception as exc:
+            self._handle_failure(queue_id, post_id, account, attempts, exc)
+        finally:
+            with self._busy_lock:
+                self._busy_accounts.discard(account)
+            self.wake()
+
+    def _handle_failure(self, queue_id: int, post_id: int, account: str, attempts: int, exc: Exception) -> None:
+        error = str(exc)[:500]
+        delay = _ratelimit_delay(exc)
+        if delay is not None and attempts + 1 < MAX_RATELIMIT_ATTEMPTS:
+            # Reddit's ratelimit applies to the whole account, so hold back its other jobs too.
+            self._limiter.defer(f"account:{account}", delay)
+        elif _is_reddit_api_error(exc) or attempts + 1 >= MAX_ATTEMPTS:
+            LOGGER.warning("Submission %s failed permanently: %s", queue_id, error)
+            self._fail(queue_id, post_id, error)
+            return
+        else:
+            delay = BASE_BACKOFF * 2 ** attempts
+        LOGGER.info("Submission %s retrying in %.0fs: %s", queue_id, delay, error)
+        retry_submission(queue_id, (datetime.utcnow() + timedelta(seconds=delay)).isoformat(), error)
+
+    def _fail(self, queue_id: int, post_id: Optional[int], error: str) -> None:
+        fail_submission(queue_id, error)
+        if post_id:
+            get_storage().update_post_link(post_id, f"Post failed: {error}"[:250])
+
+
+_scheduler = PostingScheduler()
+
+
+def get_scheduler() -> PostingScheduler:
+    """Get the global posting scheduler."""
+    return _scheduler
@@ -1,25 +1,47 @@
 from __future__ import annotations
 
+import logging
 import time
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from textwrap import shorten
 
 from ..config import get_decrypted_config
 from ..constants import CONTENT_LENGTH_PRESETS
 from ..database import (
-    add_message,
-    create_conversation,
-    fetch_style_samples,
-    get_memory_context,
-    log_post,
-    update_conversation_timestamp,
+    claim_pool_draft,
+    enqueue_submission,
+    fetch_provider_cooldowns,
+    reserve_rate_limit,
+    write_batch,
 )
 from ..models import GenerateRequest, GeneratedPost
+from ..storage import StorageBackend, get_storage
+from ..tracing import span
+from .dedup import (
+    TOPIC_WINDOW,
+    content_signature,
+    find_duplicate_content,
+    find_duplicate_in,
+    find_duplicate_topic,
+    index_post,
+)
 from .groq import GroqError
-from .llm_providers import request_completion
-from .reddit_service import RedditAuthError, get_reddit_client, post_to_reddit
-from .topics import get_topics
+from .engagement import get_model, rank_candidates
+from .llm_providers import get_key_pool, request_candidates
+from .reddit_service import RedditAuthError, get_client_manager, get_reddit_client, post_to_reddit
+from .router import plan_routes, sample_route
+from .scheduler import DEFAULT_ACCOUNT, get_scheduler, plan_submissions, reddit_accounts
+from .telemetry import last_call
+from .topics import get_topics, normalize_topic
+
+
+LOGGER = logging.getLogger("taskpilot.tasks")
+
+# Rate-limit key refreshed by every interactive generation; background pre-generation waits
+# until it has been quiet for INTERACTIVE_GRACE seconds.
+INTERACTIVE_KEY = "generate:interactive"
+INTERACTIVE_GRACE = 30.0
 
 
 def _normalize_snippet(text: str, width: int = 340) -> str:
@@ -28,8 +50,9 @@ def _normalize_snippet(text: str, width: int = 340) -> str:
 
 
 def _build_style_context(persona: str, conversation_id: str = "", limit: int = 5) -> str:
-    samples = fetch_style_samples(limit)
-    memory_samples = get_memory_context(persona, limit)
+    storage = get_storage()
+    samples = storage.fetch_style_samples(limit)
+    memory_samples = storage.get_memory_context(persona, limit)
 
     blocks: List[str] = []
 
@@ -74,12 +97,22 @@ def _build_style_context(persona: str, conversation_id: str = "", limit: int = 5
 
 
 def _get_provider_priority(preferred_provider: str = None, config = None) -> list:
-    """Determine the priority order of AI providers based on user preference and availability."""
-    # Default priority order
-    default_order = ["google", "openai", "groq"]
+    """Determine the priority order of AI providers based on user preference and availability.
+
+    Providers that recently failed (in any worker) keep their relative order but move behind
+    the healthy ones until their cooldown expires.
+    """
+    priority = _preferred_provider_order(preferred_provider, config)
+    cooling = fetch_provider_cooldowns()
+    return sorted(priority, key=lambda name: name in cooling)
+
+
+def _preferred_provider_order(preferred_provider: str = None, config = None) -> list:
+    # Default priority order; the local server only takes part once its URL is configured
+    default_order = ["google", "openai", "groq", "local"]
     
     # If user specified a provider, try it first
-    if preferred_provider and preferred_provider.lower() in ["google", "openai", "groq"]:
+    if preferred_provider and preferred_provider.lower() in default_order:
         preferred = preferred_provider.lower()
         # Move preferred to front
         priority = [preferred] + [p for p in default_order if p != preferred]
@@ -88,14 +121,29 @@ def _get_provider_priority(preferred_provider: str = None, config = None) -> lis
     # Check config for default provider setting
     if config and "SETTINGS" in config:
         default_provider = config["SETTINGS"].get("default_llm_provider", "").lower()
-        if default_provider in ["google", "openai", "groq"]:
+        if default_provider in default_order:
             priority = [default_provider] + [p for p in default_order if p != default_provider]
             return priority
     
     return default_order
 
 
-def _build_title(topic: str, tone: str, region: str, persona: str, config, style_context: str, preferred_provider: str = None) -> str:
+def _note_usage(served_by: Optional[Dict[str, object]]) -> None:
+    """Add the token usage of this thread's last provider call to ``served_by``."""
+    call = last_call()
+    if served_by is None or call is None:
+        return
+    for key in ("prompt_tokens", "completion_tokens", "cost_usd"):
+        value = getattr(call, key)
+        if value is not None:
+            served_by[key] = served_by.get(key, 0) + value
+
+
+def _clip_title(text: str) -> str:
+    return " ".join(text.split()[:18])
+
+
+def _build_titles(topic: str, tone: str, region: str, persona: str, config, style_context: str, preferred_provider: str = None, served_by: Optional[Dict[str, object]] = None, n: int = 1) -> List[str]:
     prompt_parts = []
     if style_context:
         prompt_parts.append(style_context)
@@ -106,35 +154,31 @@ def _build_title(topic: str, tone: str, region: str, persona: str, config, style
     )
     prompt = "\n\n".join(prompt_parts)
     
-    # Determine provider priority based on user selection or default
-    providers = _get_provider_priority(preferred_provider, config)
-    
-    # Try providers in order
-    for provider_name in providers:
+    # The router ranks provider/model pairs for this call; later routes are the failover chain
+    routes = plan_routes("title", prompt, config, _preferred_provider_order(preferred_provider, config), preferred_provider)
+    attempt, failover_reason = 0, None
+    for route in routes:
         try:
-            provider_config = config.get(provider_name.upper(), {})
-            api_key = provider_config.get("api_key", "")
-            model = provider_config.get("model", "")
-            if api_key and model:
-                title = request_completion(api_key, prompt, model).split()
-                if len(title) > 18:
-                    title = title[:18]
-                return " ".join(title)
-        except:
+            keys = get_key_pool(route.provider, config.get(route.provider.upper(), {}))
+            # The local server is the one route that may run without a key
+            if keys or route.provider == "local":
+                titles = sample_route(route, "title", keys, prompt, n, attempt, failover_reason)
+                _note_usage(served_by)
+                return [_clip_title(title) for title in titles]
+        except Exception as exc:
+            attempt, failover_reason = attempt + 1, f"{route.provider}/{route.model}: {exc}"[:300]
             continue
     
     # Final fallback to Groq
     try:
-        title = request_completion(config["GROQ"]["api_key"], prompt, config["GROQ"]["model"]).split()
-    except:
-        title = request_completion(config["GROQ"]["api_key"], prompt, config["GROQ"]["model"]).split()
-    
-    if len(title) > 18:
-        title = title[:18]
-    return " ".join(title)
+        titles = request_candidates(get_key_pool("groq", config["GROQ"]), prompt, config["GROQ"]["model"], n, attempt, failover_reason)
+    except Exception as exc:
+        titles = request_candidates(get_key_pool("groq", config["GROQ"]), prompt, config["GROQ"]["model"], n, attempt + 1, f"retry: {exc}"[:300])
+    _note_usage(served_by)
+    return [_clip_title(title) for title in titles]
 
 
-def _build_body(topic: str, tone: str, region: str, persona: str, paragraphs: int, config, style_context: str, preferred_provider: str = None) -> str:
+def _build_bodies(topic: str, tone: str, region: str, persona: str, paragraphs: int, config, style_context: str, preferred_provider: str = None, served_by: Optional[Dict[str, object]] = None, length: str = "Standard", n: int = 1) -> List[str]:
     prompt_parts = []
     if style_context:
         prompt_parts.append(style_context)
@@ -146,102 +190,258 @@ def _build_body(topic: str, tone: str, region: str, persona: str, paragraphs: in
     )
     prompt = "\n\n".join(prompt_parts)
     
-    # Determine provider priority based on user selection or default
-    providers = _get_provider_priority(preferred_provider, config)
-    
-    # Try providers in order
-    for provider_name in providers:
+    routes = plan_routes(length, prompt, config, _preferred_provider_order(preferred_provider, config), preferred_provider)
+    attempt, failover_reason = 0, None
+    for route in routes:
         try:
-            provider_config = config.get(provider_name.upper(), {})
-            api_key = provider_config.get("api_key", "")
-            model = provider_config.get("model", "")
-            if api_key and model:
-                result = request_completion(api_key, prompt, model)
-                if result:
-                    return result
-        except:
+            keys = get_key_pool(route.provider, config.get(route.provider.upper(), {}))
+            if keys or route.provider == "local":
+                results = [text for text in sample_route(route, length, keys, prompt, n, attempt, failover_reason) if text]
+                _note_usage(served_by)
+                if results:
+                    if served_by is not None:
+                        served_by.update(provider=route.provider, model=route.model)
+                    return results
+        except Exception as exc:
+            attempt, failover_reason = attempt + 1, f"{route.provider}/{route.model}: {exc}"[:300]
             continue
     
     # Final fallback to Groq
-    return request_completion(config["GROQ"]["api_key"], prompt, config["GROQ"]["model"])
+    results = request_candidates(get_key_pool("groq", config["GROQ"]), prompt, config["GROQ"]["model"], n, attempt, failover_reason)
+    _note_usage(served_by)
+    if served_by is not None:
+        served_by.update(provider="groq", model=config["GROQ"]["model"])
+    return results
+
+
+def compose_post(
+    topic: str,
+    region: str,
+    tone: str,
+    persona: str,
+    length: str,
+    config,
+    style_context: str,
+    preferred_provider: str = None,
+    candidates: int = 1,
+    subreddit: str = "",
+) -> Tuple[str, str, Optional[float], Dict[str, object]]:
+    """Write one post about ``topic``: ``(title, body, predicted_score, served_by)``.
+
+    With ``candidates`` above one, the title/body pair the engagement model ranks highest is kept.
+    """
+    started = time.perf_counter()
+    served_by: Dict[str, object] = {}
+    paragraphs = CONTENT_LENGTH_PRESETS[length]["paragraphs"]
+    if candidates > 1 and get_model() is None:
+        # Nothing to rank them with yet; extra drafts would be paid for and thrown away
+        candidates = 1
+    with span("generate.title", candidates=candidates):
+        titles = _build_titles(topic, tone, region, persona, config, style_context, preferred_provider, served_by, candidates)
+    with span("generate.body", candidates=candidates):
+        bodies = _build_bodies(topic, tone, region, persona, paragraphs, config, style_context, preferred_provider, served_by, length, candidates)
+    predicted_score = None
+    title_index = body_index = 0
+    if len(titles) > 1 or len(bodies) > 1:
+        with span("candidates.rank", titles=len(titles), bodies=len(bodies)):
+            title_index, body_index, predicted_score = rank_candidates(titles, bodies, persona, tone, subreddit)
+        served_by["candidates"] = max(len(titles), len(bodies))
+        if predicted_score is not None:
+            served_by["predicted_score"] = round(predicted_score, 4)
+    served_by["latency_ms"] = int((time.perf_counter() - started) * 1000)
+    return titles[title_index], bodies[body_index], predicted_score, served_by
 
 
 def generate_posts(payload: GenerateRequest) -> List[GeneratedPost]:
-    config = get_decrypted_config()
-    topics = get_topics(payload.keyword or "", payload.region)
+    with span("config.load"):
+        config = get_decrypted_config()
+    with span("topics.fetch", region=payload.region):
+        topics = get_topics(payload.keyword or "", payload.region)
     if not topics:
         raise GroqError("No topics found for the current keyword/region filter.")
 
-    # Create or continue conversation
+    # Skip topics we already wrote about recently before spending any provider calls on them
+    if not payload.allow_duplicates:
+        with span("dedup.topics", candidates=len(topics)):
+            fresh_topics = [topic for topic in topics if find_duplicate_topic(topic) is None]
+        if len(fresh_topics) < len(topics):
+            LOGGER.info("Skipped %s recently covered topics", len(topics) - len(fresh_topics))
+        topics = fresh_topics
+        if not topics:
+            raise GroqError(
+                f"Every trending topic was already covered in the last {TOPIC_WINDOW.days} days. "
+                "Set allow_duplicates to generate anyway."
+            )
+
     import uuid
     conversation_id = str(uuid.uuid4())
-    create_conversation(conversation_id, f"Post Generation: {payload.keyword or 'General'}", payload.persona, payload.tone)
-
-    # Add user intent as first message
     user_prompt = f"Generate Reddit posts about: {payload.keyword or 'current trends'} in {payload.region} with {payload.tone} tone as {payload.persona}"
-    add_message(conversation_id, "user", user_prompt, f"region:{payload.region},tone:{payload.tone}")
-
-    style_context = _build_style_context(payload.persona, conversation_id)
 
-    reddit = None
-    auto_post = bool(payload.auto_post and (payload.subreddit or "").strip())
-    if auto_post:
-        reddit = get_reddit_client(config["REDDIT"])
-        if reddit is None:
+    with span("style_context"):
+        style_context = _build_style_context(payload.persona, conversation_id)
+
+    subreddits = payload.target_subreddits()
+    auto_post = bool(payload.auto_post and subreddits)
+    scheduled = auto_post and payload.wants_schedule()
+    plan = []
+    if scheduled:
+        accounts = payload.accounts or [DEFAULT_ACCOUNT]
+        unknown = [name for name in accounts if name not in reddit_accounts(config)]
+        if unknown:
+            raise RedditAuthError(f"Unknown Reddit account(s): {', '.join(unknown)}. Add them in Settings.")
+        plan = plan_submissions(len(topics), accounts, subreddits, payload.publish_at, payload.spread_minutes)
+    elif auto_post:
+        # Validates the session up front; posts go through clients leased from the pool
+        if get_reddit_client(config["REDDIT"]) is None:
             raise RedditAuthError("Reddit credentials are incomplete. Update them in Settings.")
 
     results: List[GeneratedPost] = []
-    paragraphs = CONTENT_LENGTH_PRESETS.get(payload.clamp_length(), CONTENT_LENGTH_PRESETS["Standard"])
+    drafts: List[dict] = []
+    # Drafts of this run are only indexed when persisted, so they are checked in memory too
+    run_signatures: List[int] = []
+    length = payload.clamp_length()
     preferred_provider = payload.ai_provider
-
-    for topic in topics:
+    # Pooled drafts are single samples, so a request for ranked candidates generates unless
+    # there is no model to rank them yet
+    use_pool = (payload.candidates == 1 or get_model() is None) and not payload.fresh
+    # Tells the pre-generator, in every worker, that providers are busy serving users
+    reserve_rate_limit(INTERACTIVE_KEY, INTERACTIVE_GRACE)
+
+    # Generate (and post) first; all database writes for the run happen afterwards in one
+    # transaction, so the write lock is never held across provider calls.
+    run_error: Optional[BaseException] = None
+    try:
+        for index, topic in enumerate(topics):
+            pooled = None
+            if use_pool:
+                with span("draft_pool.claim"):
+                    pooled = claim_pool_draft(normalize_topic(topic), payload.region, payload.persona, payload.tone, length)
+            if pooled is not None:
+                title, body, served_by, created_at = pooled
+                predicted_score = served_by.get("predicted_score")
+                served_by.update(pregenerated=True, draft_age_s=int(time.time() - created_at), latency_ms=0)
+            else:
+                title, body, predicted_score, served_by = compose_post(
+                    topic, payload.region, payload.tone, payload.persona, length, config, style_context,
+                    preferred_provider, payload.candidates, payload.subreddit or (subreddits[0] if subreddits else ""),
+                )
+
+            link = "[Skipped]"
+            auto_flag = False
+            account = DEFAULT_ACCOUNT
+            subreddit = payload.subreddit or ""
+            publish_at = None
+            duplicate_of = None if payload.allow_duplicates else find_duplicate_content(title, body)
+            duplicate_draft = None
+            if duplicate_of is None and not payload.allow_duplicates:
+                duplicate_draft = find_duplicate_in(title, body, run_signatures)
+            run_signatures.append(content_signature(title, body))
+            if duplicate_of is not None:
+                link = f"[Duplicate of post {duplicate_of}]"
+            elif duplicate_draft is not None:
+                # Resolved to the earlier draft's post id once it is persisted
+                link = "[Duplicate]"
+            elif scheduled:
+                account, subreddit, publish_at = plan[index]
+                link = "[Queued]"
+            elif auto_post:
+                try:
+                    with span("reddit.post", subreddit=subreddits[0]), get_client_manager().lease(config["REDDIT"]) as reddit:
+                        link = post_to_reddit(reddit, subreddits[0], title, body)
+                    auto_flag = True
+                except Exception as exc:  # keep generating other posts
+                    link = f"Post failed: {exc}"[:250]
+                    auto_flag = False
+
+            drafts.append(
+                dict(
+                    topic=topic,
+                    title=title,
+                    body=body,
+                    link=link,
+                    auto_posted=auto_flag,
+                    account=account,
+                    subreddit=subreddit,
+                    publish_at=publish_at,
+                    duplicate_of=duplicate_of,
+                    duplicate_draft=duplicate_draft,
+                    served_by=served_by,
+                )
+            )
+            results.append(
+                GeneratedPost(
+                    topic=topic,
+                    title=title,
+                    body=body,
+                    link=link,
+                    auto_posted=auto_flag,
+                    scheduled_for=publish_at,
+                    duplicate_of=duplicate_of,
+                    predicted_score=predicted_score,
+                )
+            )
+            if not scheduled:
+                time.sleep(0.2)
+    except BaseException as exc:
+        run_error = exc
+        raise
+    finally:
+        # Persist whatever was generated, even if a provider error aborts the run midway
         try:
-            title = _build_title(topic, payload.tone, payload.region, payload.persona, config, style_context, preferred_provider)
-            body = _build_body(topic, payload.tone, payload.region, payload.persona, paragraphs, config, style_context, preferred_provider)
-
-            # Add assistant response to conversation
-            assistant_content = f"Generated post - Title: {title}\n\nBody: {body}"
-            add_message(conversation_id, "assistant", assistant_content, f"topic:{topic}")
-        except GroqError:
-            # propagate to caller to provide immediate feedback
-            raise
-
-        link = "[Skipped]"
-        auto_flag = False
-        if auto_post and reddit is not None:
-            try:
-                link = post_to_reddit(reddit, payload.subreddit.strip(), title, body)
-                auto_flag = True
-            except Exception as exc:  # keep generating other posts
-                link = f"Post failed: {exc}"[:250]
-                auto_flag = False
-
-        log_post(
-            topic=topic,
-            title=title,
-            body=body,
+            _persist_run(payload, conversation_id, user_prompt, drafts, results)
+        except Exception:
+            if run_error is None:
+                raise
+            # Keep the run's own error; the log is the only record left of what was posted
+            posted = [draft["link"] for draft in drafts if draft["auto_posted"]]
+            LOGGER.exception("Could not save %s generated posts (submitted: %s)", len(drafts), posted or "none")
+
+    if scheduled:
+        get_scheduler().wake()
+
+    return results
+
+
+def _persist_run(
+    payload: GenerateRequest, conversation_id: str, user_prompt: str, drafts: List[dict], results: List[GeneratedPost]
+) -> None:
+    """Write the run's conversation and drafts in one transaction."""
+    storage = get_storage()
+    post_ids: List[int] = []
+    # The local batch covers signatures and queue entries, which always live in SQLite
+    with span("db.persist", posts=len(drafts)), storage.transaction(), write_batch():
+        with span("db.create_conversation"):
+            storage.create_conversation(conversation_id, f"Post Generation: {payload.keyword or 'General'}", payload.persona, payload.tone)
+        storage.add_message(conversation_id, "user", user_prompt, {"region": payload.region, "tone": payload.tone})
+        for index, draft in enumerate(drafts):
+            if draft["duplicate_draft"] is not None:
+                duplicate_of = post_ids[draft["duplicate_draft"]]
+                draft.update(duplicate_of=duplicate_of, link=f"[Duplicate of post {duplicate_of}]")
+                results[index].duplicate_of, results[index].link = duplicate_of, draft["link"]
+            post_ids.append(_persist_draft(storage, payload, conversation_id, draft))
+        storage.update_conversation_timestamp(conversation_id)
+
+
+def _persist_draft(storage: StorageBackend, payload: GenerateRequest, conversation_id: str, draft: dict) -> int:
+    """Log one generated post with its conversation message, signatures and queue entry."""
+    metadata = {"topic": draft["topic"], "region": payload.region, "tone": payload.tone, **draft["served_by"]}
+    storage.add_message(conversation_id, "assistant", f"Generated post - Title: {draft['title']}\n\nBody: ", metadata, draft["body"])
+    with span("db.log_post"):
+        post_id = storage.log_post(
+            topic=draft["topic"],
+            title=draft["title"],
+            body=draft["body"],
             region=payload.region,
             tone=payload.tone,
             persona=payload.persona,
             length=payload.clamp_length(),
-            subreddit=payload.subreddit or "",
-            link=link,
-            auto_posted=auto_flag,
+            subreddit=draft["subreddit"],
+            link=draft["link"],
+            auto_posted=draft["auto_posted"],
             conversation_id=conversation_id,
+            topic_key=normalize_topic(draft["topic"]),
         )
-
-        results.append(
-            GeneratedPost(
-                topic=topic,
-                title=title,
-                body=body,
-                link=link,
-                auto_posted=auto_flag,
-            )
-        )
-        time.sleep(0.2)
-
-    # Update conversation timestamp
-    update_conversation_timestamp(conversation_id)
-
-    return results
+    index_post(post_id, draft["topic"], draft["title"], draft["body"])
+    if draft["publish_at"] is not None:
+        enqueue_submission(post_id, draft["account"], draft["subreddit"], draft["title"], draft["body"], draft["publish_at"])
+    return post_id
@@ -0,0 +1,233 @@
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from ..constants import LOCAL_MODEL_PREFIX, MODEL_PRICING
+from ..database import record_llm_call
+
+
+# Upper bounds in milliseconds; Prometheus adds the implicit +Inf bucket.
+LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+ROUTE_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+@dataclass
+class CallRecord:
+    provider: str
+    model: str
+    outcome: str
+    latency_ms: int
+    ttfb_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    attempt: int = 0
+    failover_reason: Optional[str] = None
+    error: Optional[str] = None
+    cost_usd: Optional[float] = None
+
+
+class _Histogram:
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        self.buckets = [0] * len(bounds)  # cumulative, as Prometheus expects
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.buckets[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile by interpolating inside the bucket that contains it."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        lower_bound, lower_count = 0.0, 0
+        for bound, cumulative in zip(self.bounds, self.buckets):
+            if cumulative >= rank:
+                inside = cumulative - lower_count
+                position = (rank - lower_count) / inside if inside else 1.0
+                return min(self.max, lower_bound + (bound - lower_bound) * position)
+            lower_bound, lower_count = bound, cumulative
+        return self.max
+
+
+_lock = threading.Lock()
+_latency: Dict[Tuple[str, str], _Histogram] = {}
+_ttfb: Dict[Tuple[str, str], _Histogram] = {}
+_calls: Counter = Counter()  # (provider, model, outcome)
+_tokens: Counter = Counter()  # (provider, model, kind)
+_cost: Counter = Counter()  # (provider, model)
+_failovers: Counter = Counter()  # (provider, model)
+_routes: Dict[Tuple[str, str], _Histogram] = {}  # (method, route template)
+_route_statuses: Counter = Counter()  # (method, route template, status class)
+_thread_state = threading.local()
+
+
+def estimate_cost(model: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> Optional[float]:
+    """Estimated USD cost of a call, or ``None`` for unpriced models or missing usage."""
+    if model.startswith(LOCAL_MODEL_PREFIX):
+        return 0.0
+    pricing = MODEL_PRICING.get(model)
+    if pricing is None or prompt_tokens is None or completion_tokens is None:
+        return None
+    return (prompt_tokens * pricing[0] + completion_tokens * pricing[1]) / 1_000_000
+
+
+def record_call(record: CallRecord) -> None:
+    """Add a call to the in-memory metrics and queue it for the llm_calls table."""
+    if record.cost_usd is None:
+        record.cost_usd = estimate_cost(record.model, record.prompt_tokens, record.completion_tokens)
+    key = (record.provider, record.model)
+    with _lock:
+        _latency.setdefault(key, _Histogram()).observe(record.latency_ms)
+        if record.ttfb_ms is not None:
+            _ttfb.setdefault(key, _Histogram()).observe(record.ttfb_ms)
+        _calls[(*key, record.outcome)] += 1
+        _tokens[(*key, "prompt")] += record.prompt_tokens or 0
+        _tokens[(*key, "completion")] += record.completion_tokens or 0
+        _cost[key] += record.cost_usd or 0.0
+        if record.failover_reason:
+            _failovers[key] += 1
+    _thread_state.last = record
+    record_llm_call(
+        record.provider,
+        record.model,
+        record.outcome,
+        record.latency_ms,
+        record.ttfb_ms,
+        record.prompt_tokens,
+        record.completion_tokens,
+        record.attempt,
+        record.failover_reason,
+        record.error,
+        record.cost_usd,
+    )
+
+
+def record_route(method: str, route: str, status: int, latency_ms: float) -> None:
+    """Add one HTTP request to the per-route latency histograms."""
+    key = (method, route)
+    with _lock:
+        histogram = _routes.get(key)
+        if histogram is None:
+            histogram = _routes[key] = _Histogram(ROUTE_BUCKETS_MS)
+        histogram.observe(latency_ms)
+        _route_statuses[(method, route, f"{status // 100}xx")] += 1
+
+
+def route_stats() -> List[Dict[str, object]]:
+    """Per-route request counts and latency percentiles since process start, slowest p95 first."""
+    with _lock:
+        rows = [
+            {
+                "method": method,
+                "route": route,
+                "count": histogram.count,
+                "mean_ms": round(histogram.total / histogram.count, 1),
+                "p50_ms": round(histogram.quantile(0.50), 1),
+                "p95_ms": round(histogram.quantile(0.95), 1),
+                "p99_ms": round(histogram.quantile(0.99), 1),
+                "max_ms": round(histogram.max, 1),
+                "statuses": {
+                    status: count for (m, r, status), count in _route_statuses.items() if (m, r) == (method, route)
+                },
+            }
+            for (method, route), histogram in _routes.items()
+        ]
+    return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+
+def last_call() -> Optional[CallRecord]:
+    """The most recent call recorded on this thread."""
+    return getattr(_thread_state, "last", None)
+
+
+def adopt_last_call(record: CallRecord) -> None:
+    """Make ``record`` this thread's last call without recording it again (for fan-out callers)."""
+    _thread_state.last = record
+
+
+def combine_calls(records: List[CallRecord]) -> CallRecord:
+    """One record standing for calls made in parallel: summed usage and cost, longest latency."""
+    def total(name: str) -> Optional[float]:
+        values = [getattr(record, name) for record in records if getattr(record, name) is not None]
+        return sum(values) if values else None
+
+    first = records[0]
+    return CallRecord(
+        provider=first.provider,
+        model=first.model,
+        outcome=first.outcome,
+        latency_ms=max(record.latency_ms for record in records),
+        ttfb_ms=first.ttfb_ms,
+        prompt_tokens=total("prompt_tokens"),
+        completion_tokens=total("completion_tokens"),
+        attempt=first.attempt,
+        cost_usd=total("cost_usd"),
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(provider: str, model: str, **extra: str) -> str:
+    return _format_labels({"provider": provider, "model": model, **extra})
+
+
+def _format_labels(pairs: Dict[str, str]) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs.items()) + "}"
+
+
+def _render_histogram(
+    lines: List[str], name: str, help_text: str, histograms: Dict[Tuple[str, str], _Histogram], label_names=("provider", "model")
+) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, histogram in sorted(histograms.items()):
+        labels = dict(zip(label_names, key))
+        for bound, count in zip(histogram.bounds, histogram.buckets):
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': str(bound)})} {count}")
+        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {histogram.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+
+def render_prometheus() -> str:
+    """LLM call and HTTP route metrics since process start, in Prometheus text exposition format."""
+    lines: List[str] = []
+    with _lock:
+        _render_histogram(lines, "taskpilot_llm_latency_ms", "Total LLM call latency in milliseconds.", _latency)
+        _render_histogram(lines, "taskpilot_llm_ttfb_ms", "Time until LLM response headers in milliseconds.", _ttfb)
+        lines.append("# HELP taskpilot_llm_calls_total LLM calls by outcome.")
+        lines.append("# TYPE taskpilot_llm_calls_total counter")
+        for (provider, model, outcome), count in sorted(_calls.items()):
+            lines.append(f"taskpilot_llm_calls_total{_labels(provider, model, outcome=outcome)} {count}")
+        lines.append("# HELP taskpilot_llm_tokens_total Tokens reported by providers.")
+        lines.append("# TYPE taskpilot_llm_tokens_total counter")
+        for (provider, model, kind), count in sorted(_tokens.items()):
+            lines.append(f"taskpilot_llm_tokens_total{_labels(provider, model, kind=kind)} {count}")
+        lines.append("# HELP taskpilot_llm_cost_usd_total Estimated LLM spend in USD.")
+        lines.append("# TYPE taskpilot_llm_cost_usd_total counter")
+        for (provider, model), cost in sorted(_cost.items()):
+            lines.append(f"taskpilot_llm_cost_usd_total{_labels(provider, model)} {cost:.6f}")
+        lines.append("# HELP taskpilot_llm_failovers_total Calls made after an earlier provider failed.")
+        lines.append("# TYPE taskpilot_llm_failovers_total counter")
+        for (provider, model), count in sorted(_failovers.items()):
+            lines.append(f"taskpilot_llm_failovers_total{_labels(provider, model)} {count}")
+        _render_histogram(
+            lines, "taskpilot_http_request_duration_ms", "API request latency in milliseconds.", _routes, ("method", "route")
+        )
+        lines.append("# HELP taskpilot_http_requests_total API requests by status class.")
+        lines.append("# TYPE taskpilot_http_requests_total counter")
+        for (method, route, status), count in sorted(_route_statuses.items()):
+            labels = _format_labels({"method": method, "route": route, "status": status})
+            lines.append(f"taskpilot_http_requests_total{labels} {count}")
+    return "\n".join(lines) + "\n"
@@ -1,20 +1,48 @@
 import json
 import logging
 import re
-from typing import List
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 
-import feedparser
 import requests
 
-from ..constants import REGION_CODES, UA_HEADERS
+from ..constants import BING_NEWS_URL, GOOGLE_TRENDS_URL, REGION_CODES, UA_HEADERS
+from ..database import record_trend_snapshot
+from ..tracing import span
 
 
 LOGGER = logging.getLogger("taskpilot.topics")
 
+# Each source gets its own deadline measured from the moment the fan-out starts,
+# so a request waits at most for the slowest deadline rather than their sum.
+DEFAULT_SOURCE_DEADLINE = 6.0
+SOURCE_FETCH_LIMIT = 10
+SIMILARITY_THRESHOLD = 0.55
+# Timeout of a source's HTTP requests, lowered to what is left of the source's deadline.
+REQUEST_TIMEOUT = 10.0
+
+_STOPWORDS = {"a", "an", "and", "at", "for", "in", "of", "on", "the", "to", "with", "vs", "is", "are"}
+
+
+# time.monotonic() by which the source running in this context must finish.
+_source_deadline: ContextVar[Optional[float]] = ContextVar("trend_source_deadline", default=None)
+
+
+def _request_timeout() -> float:
+    """What is left of the running source's deadline, so a late fetch cannot hold its worker."""
+    deadline = _source_deadline.get()
+    if deadline is None:
+        return REQUEST_TIMEOUT
+    return min(REQUEST_TIMEOUT, max(deadline - time.monotonic(), 0.1))
+
 
 def _fetch_json(url: str) -> dict:
     try:
-        response = requests.get(url, headers=UA_HEADERS, timeout=10)
+        response = requests.get(url, headers=UA_HEADERS, timeout=_request_timeout())
         response.raise_for_status()
     except requests.exceptions.HTTPError as exc:
         status = getattr(exc.response, "status_code", "N/A")
@@ -30,7 +58,7 @@ def _fetch_json(url: str) -> dict:
 
 def google_trends(region: str, keyword: str | None = None, limit: int = 5) -> List[str]:
     geo = REGION_CODES.get(region, "US")
-    data = _fetch_json(f"https://trends.google.com/trends/api/dailytrends?geo={geo}")
+    data = _fetch_json(f"{GOOGLE_TRENDS_URL}/trends/api/dailytrends?geo={geo}")
     if not data:
         return []
 
@@ -47,11 +75,174 @@ def google_trends(region: str, keyword: str | None = None, limit: int = 5) -> Li
 
 def bing_news(keyword: str | None = None, limit: int = 5) -> List[str]:
     query = requests.utils.quote(keyword or "news")
-    rss_url = f"https://www.bing.com/news/search?q={query}&format=RSS"
-    feed = feedparser.parse(rss_url)
+    rss_url = f"{BING_NEWS_URL}/news/search?q={query}&format=RSS"
+    # Fetch with an explicit timeout; feedparser's own fetcher can block indefinitely.
+    try:
+        response = requests.get(rss_url, headers=UA_HEADERS, timeout=_request_timeout())
+        response.raise_for_status()
+    except requests.exceptions.RequestException as exc:
+        LOGGER.warning("Bing News request error: %s", exc)
+        return []
+    import feedparser  # deferred: only this source needs it
+
+    feed = feedparser.parse(response.content)
     return [entry.title for entry in feed.entries][:limit]
 
 
-def get_topics(keyword: str | None, region: str) -> List[str]:
-    topics = google_trends(region, keyword)
-    return topics if topics else bing_news(keyword)
+# Trend source registry -----------------------------------------------------
+
+
+@dataclass(frozen=True)
+class TrendSource:
+    """A named topic feed with its own deadline and ranking weight."""
+
+    name: str
+    fetch: Callable[[str, Optional[str], int], List[str]]
+    deadline: float = DEFAULT_SOURCE_DEADLINE
+    weight: float = 1.0
+
+
+_SOURCES: Dict[str, TrendSource] = {}
+_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="trend-source")
+
+
+def _fetch_source(source: TrendSource, region: str, keyword: Optional[str], limit: int, deadline: float) -> List[str]:
+    if time.monotonic() >= deadline:
+        # Queued behind busy workers until the caller stopped waiting; do not start the fetch
+        return []
+    _source_deadline.set(deadline)
+    with span("trends.source", source=source.name):
+        return source.fetch(region, keyword, limit)
+
+
+def register_source(
+    name: str,
+    fetch: Callable[[str, Optional[str], int], List[str]],
+    deadline: float = DEFAULT_SOURCE_DEADLINE,
+    weight: float = 1.0,
+) -> None:
+    """Register a trend source. ``fetch`` receives ``(region, keyword, limit)``.
+
+    HTTP requests made by ``fetch`` should use ``_request_timeout()`` so they end with the deadline.
+    """
+    _SOURCES[name] = TrendSource(name=name, fetch=fetch, deadline=deadline, weight=weight)
+
+
+def get_sources() -> List[TrendSource]:
+    """Return registered sources in priority order."""
+    return list(_SOURCES.values())
+
+
+register_source("google_trends", google_trends, weight=1.2)
+register_source("bing_news", lambda region, keyword, limit: bing_news(keyword, limit))
+
+
+def fetch_trend_sources(keyword: str | None, region: str, limit: int = SOURCE_FETCH_LIMIT) -> Dict[str, List[str]]:
+    """Query every registered source concurrently, dropping any that miss their deadline."""
+    started = time.monotonic()
+    futures = {
+        source.name: (
+            source,
+            # Each worker runs in a copy of the caller's context so its span joins the request trace
+            _EXECUTOR.submit(
+                copy_context().run, _fetch_source, source, region, keyword or None, limit, started + source.deadline
+            ),
+        )
+        for source in get_sources()
+    }
+
+    results: Dict[str, List[str]] = {}
+    for name, (source, future) in futures.items():
+        remaining = max(0.0, started + source.deadline - time.monotonic())
+        try:
+            results[name] = [topic.strip() for topic in future.result(timeout=remaining) if topic and topic.strip()]
+        except FutureTimeoutError:
+            LOGGER.warning("Trend source %s missed its %.1fs deadline", name, source.deadline)
+            future.cancel()
+            results[name] = []
+        except Exception as exc:
+            LOGGER.warning("Trend source %s failed: %s", name, exc)
+            results[name] = []
+    return results
+
+
+# Merging and ranking -------------------------------------------------------
+
+
+def normalize_topic(text: str) -> str:
+    """Lowercase, strip accents/punctuation and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    ascii_text = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = re.sub(r"[^\w\s]", " ", ascii_text.lower())
+    return " ".join(cleaned.split())
+
+
+def _tokens(normalized: str) -> frozenset:
+    return frozenset(token for token in normalized.split() if token not in _STOPWORDS)
+
+
+def _shingles(normalized: str, size: int = 3) -> frozenset:
+    compact = normalized.replace(" ", "")
+    if len(compact) <= size:
+        return frozenset({compact})
+    return frozenset(compact[i : i + size] for i in range(len(compact) - size + 1))
+
+
+class _Cluster:
+    __slots__ = ("label", "tokens", "shingles", "ranks", "order")
+
+    def __init__(self, label: str, normalized: str, order: int):
+        self.label = label
+        self.tokens = _tokens(normalized)
+        self.shingles = _shingles(normalized)
+        self.ranks: Dict[str, int] = {}
+        self.order = order
+
+    def matches(self, tokens: frozenset, shingles: frozenset) -> bool:
+        # A short trend query ("Taylor Swift") matches a headline that contains all of its words.
+        shorter, longer = sorted((self.tokens, tokens), key=len)
+        if len(shorter) >= 2 and shorter <= longer:
+            return True
+        union = len(self.shingles | shingles)
+        return bool(union) and len(self.shingles & shingles) / union >= SIMILARITY_THRESHOLD
+
+
+def merge_trends(results: Dict[str, List[str]], limit: int = 5) -> List[str]:
+    """Dedupe near-identical topics across sources and rank by cross-source agreement."""
+    weights = {source.name: source.weight for source in get_sources()}
+    clusters: List[_Cluster] = []
+
+    for name, topics in results.items():
+        for rank, topic in enumerate(topics):
+            normalized = normalize_topic(topic)
+            if not normalized:
+                continue
+            tokens, shingles = _tokens(normalized), _shingles(normalized)
+            cluster = next((c for c in clusters if c.matches(tokens, shingles)), None)
+            if cluster is None:
+                cluster = _Cluster(topic, normalized, len(clusters))
+                clusters.append(cluster)
+            cluster.ranks.setdefault(name, rank)
+
+    def score(cluster: _Cluster) -> tuple:
+        positional = sum(weights.get(name, 1.0) / (1 + rank) for name, rank in cluster.ranks.items())
+        return (-len(cluster.ranks), -positional, cluster.order)
+
+    return [cluster.label for cluster in sorted(clusters, key=score)[:limit]]
+
+
+def _record_snapshot(keyword: str | None, region: str, results: Dict[str, List[str]]) -> None:
+    try:
+        record_trend_snapshot(
+            region,
+            keyword or "",
+            {name: [(normalize_topic(topic), topic) for topic in topics] for name, topics in results.items()},
+        )
+    except Exception as exc:  # analytics must never block generation
+        LOGGER.warning("Failed to record trend snapshot: %s", exc)
+
+
+def get_topics(keyword: str | None, region: str, limit: int = 5) -> List[str]:
+    results = fetch_trend_sources(keyword, region)
+    _record_snapshot(keyword, region, results)
+    return merge_trends(results, limit)
@@ -0,0 +1,33 @@
+from threading import Lock
+from typing import Optional
+
+from ..constants import STORAGE_URL
+from .base import POST_EXPORT_COLUMNS, StorageBackend, StorageError
+
+
+def create_storage(url: str) -> StorageBackend:
+    """Factory for a storage backend from a URL: empty or ``sqlite`` for the local database,
+    ``postgresql://...`` for PostgreSQL. Backends are imported on first use."""
+    if not url or url.startswith("sqlite"):
+        from .sqlite_backend import SQLiteStorage
+
+        return SQLiteStorage()
+    if url.startswith(("postgres://", "postgresql://")):
+        from .postgres_backend import PostgresStorage
+
+        return PostgresStorage(url)
+    raise StorageError(f"Unsupported storage URL '{url.split(':', 1)[0]}:...'. Use sqlite or postgresql://.")
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = Lock()
+
+
+def get_storage() -> StorageBackend:
+    """Get the global storage backend configured by ``TASKPILOT_STORAGE_URL``."""
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage(STORAGE_URL)
+    return _storage
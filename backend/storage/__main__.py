@@ -0,0 +1,67 @@
+"""Migrate, export or import posts for a storage backend.
+
+Usage::
+
+    python -m backend.storage migrate --url postgresql://taskpilot@localhost/taskpilot
+    python -m backend.storage export posts.csv
+    python -m backend.storage import posts.csv --url postgresql://taskpilot@localhost/taskpilot
+
+``--url`` defaults to ``TASKPILOT_STORAGE_URL`` (the local SQLite database when unset), so
+exporting from the default and importing with a PostgreSQL URL moves history across.
+"""
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from ..constants import STORAGE_URL
+from . import POST_EXPORT_COLUMNS, create_storage
+
+_INTEGER_COLUMNS = {"auto_posted", "upvotes", "comments"}
+
+
+def read_export(path: Path) -> Iterator[tuple]:
+    """Rows of a CSV written by ``export_posts``, converted back to column types."""
+    with path.open(newline="", encoding="utf-8") as handle:
+        reader = csv.DictReader(handle)
+        for record in reader:
+            yield tuple(
+                int(record.get(column) or 0) if column in _INTEGER_COLUMNS else (record.get(column) or None)
+                for column in POST_EXPORT_COLUMNS
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("migrate", "export", "import"))
+    parser.add_argument("path", nargs="?", type=Path, help="CSV file for export/import ('-' for stdout on export)")
+    parser.add_argument("--url", default=STORAGE_URL, help="Storage URL (default: TASKPILOT_STORAGE_URL)")
+    args = parser.parse_args(argv)
+    if args.command != "migrate" and args.path is None:
+        parser.error(f"{args.command} needs a CSV path")
+
+    storage = create_storage(args.url)
+    try:
+        migrated = storage.migrate()
+        if args.command == "migrate":
+            print(f"{storage.name}: {'migrated' if migrated else 'already current'}")
+        elif args.command == "export":
+            if str(args.path) == "-":
+                count = storage.export_posts(sys.stdout.buffer)
+            else:
+                with args.path.open("wb") as handle:
+                    count = storage.export_posts(handle)
+            print(f"Exported {count} posts from {storage.name}", file=sys.stderr)
+        else:
+            with storage.transaction():
+                count = storage.import_posts(read_export(args.path))
+            print(f"Imported {count} posts into {storage.name}", file=sys.stderr)
+    finally:
+        storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
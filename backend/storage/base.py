@@ -0,0 +1,211 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+# Column order of bulk imports and exports (``import_posts`` rows, ``export_posts`` CSV).
+POST_EXPORT_COLUMNS: Tuple[str, ...] = (
+    "topic",
+    "title",
+    "body",
+    "region",
+    "tone",
+    "persona",
+    "length",
+    "subreddit",
+    "link",
+    "auto_posted",
+    "upvotes",
+    "comments",
+    "timestamp",
+    "conversation_id",
+)
+
+
+class StorageError(RuntimeError):
+    """Raised when a storage backend cannot be created or used."""
+
+
+class StorageBackend(ABC):
+    """Posts, conversations, messages, their summaries and archive, and engagement metrics.
+
+    Every backend returns rows in the same shapes, with timestamps as ISO-8601 UTC strings and
+    message metadata as a JSON string. Helpers called inside ``transaction()`` on the same
+    thread share one transaction.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def migrate(self) -> bool:
+        """Create or upgrade the schema. Returns ``False`` when it was already current."""
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        yield
+
+    def close(self) -> None:
+        """Release pooled connections."""
+
+    # Posts
+
+    @abstractmethod
+    def log_post(
+        self,
+        topic: str,
+        title: str,
+        body: str,
+        region: str,
+        tone: str,
+        persona: str,
+        length: str,
+        subreddit: str,
+        link: str,
+        auto_posted: bool,
+        conversation_id: str = "",
+        topic_key: str = "",
+    ) -> int:
+        """Insert a post and return its id."""
+
+    @abstractmethod
+    def update_post_link(self, post_id: int, link: str, auto_posted: Optional[bool] = None) -> None:
+        """Set a post's link, and its auto-posted flag when given."""
+
+    @abstractmethod
+    def fetch_recent_posts(self, limit: int = 50) -> List[Tuple]:
+        """``(topic, title, subreddit, link, upvotes, comments, timestamp)``, newest first."""
+
+    @abstractmethod
+    def fetch_posts_for_date(self, date_iso: str) -> List[Tuple]:
+        """Same shape as ``fetch_recent_posts`` for posts made on a UTC date."""
+
+    @abstractmethod
+    def fetch_all_posts(self) -> Sequence[Tuple]:
+        """``(id, topic, title, body, region, tone, persona, length, subreddit, link, upvotes, comments, timestamp)``."""
+
+    @abstractmethod
+    def fetch_stats(self) -> Tuple[int, int, int]:
+        """``(total_posts, posts_today_utc, auto_posted)``."""
+
+    @abstractmethod
+    def iter_posts_for_refresh(self) -> Iterable[Tuple[int, str]]:
+        """``(id, link)`` for posts that link to Reddit."""
+
+    @abstractmethod
+    def update_metrics(self, updates: Iterable[Tuple[int, int, int]]) -> None:
+        """Apply ``(post_id, upvotes, comments)`` updates."""
+
+    @abstractmethod
+    def iter_engagement_samples(self, after: str, until: str, after_id: int = 0) -> Iterable[Tuple]:
+        """``(title, body, persona, tone, subreddit, upvotes, comments, timestamp, id)`` of posts
+        that link to Reddit, after the ``(after, after_id)`` cursor and up to ``until``, ordered
+        by timestamp and id."""
+
+    @abstractmethod
+    def fetch_popular_combinations(self, since: str, limit: int = 3) -> List[Tuple[str, str, str, str, int]]:
+        """``(region, persona, tone, length, posts)`` most used since ``since``, most used first."""
+
+    @abstractmethod
+    def fetch_style_samples(self, limit: int = 5) -> List[Tuple[str, str, str, str]]:
+        """``(title, body, tone, persona)`` of the newest posts with a body."""
+
+    @abstractmethod
+    def fetch_best_posting_hours(self, subreddit: str, limit: int = 3) -> List[int]:
+        """UTC hours of day with the best average engagement of auto-posted posts to ``subreddit``."""
+
+    @abstractmethod
+    def fetch_topic_performance(self, limit: int = 20) -> List[Tuple[str, str, int, int, int, float, float]]:
+        """``(label, first_seen, posts, upvotes, comments, avg_upvotes, avg_comments)`` per trend
+        topic posts were logged with (``topic_key``), most engagement first."""
+
+    # Conversations and messages
+
+    @abstractmethod
+    def create_conversation(self, conversation_id: str, title: str, persona: str, tone: str) -> None:
+        pass
+
+    @abstractmethod
+    def update_conversation_timestamp(self, conversation_id: str) -> None:
+        pass
+
+    @abstractmethod
+    def add_message(
+        self,
+        conversation_id: str,
+        role: str,
+        content: str,
+        metadata: Optional[Dict[str, object]] = None,
+        body: Optional[str] = None,
+    ) -> None:
+        """Add a message whose text is ``content`` followed by ``body``.
+
+        ``body`` is the text of a post logged in the same transaction; backends that
+        deduplicate content store it once for both.
+        """
+
+    @abstractmethod
+    def get_recent_conversations(self, limit: int = 10) -> List[Tuple[str, str, str, str, str]]:
+        """``(id, title, persona, tone, updated_at)``, most recently updated first."""
+
+    @abstractmethod
+    def get_conversation_history(self, conversation_id: str, limit: int = 50) -> List[Tuple[str, str, str, str]]:
+        """``(role, content, timestamp, metadata_json)``, oldest first."""
+
+    @abstractmethod
+    def get_memory_context(self, persona: str, limit: int = 10) -> List[Tuple[str, str, str]]:
+        """``(title, content, timestamp)`` of the newest assistant messages and conversation
+        summaries for ``persona``, newest first."""
+
+    @abstractmethod
+    def fetch_memory_stats(self) -> Tuple[Dict[str, int], int, List[Tuple[str, int]]]:
+        """``(counters, conversations_active_last_7_days, top_personas)``; ``counters`` holds
+        ``conversations``, ``messages`` and ``messages_assistant``."""
+
+    @abstractmethod
+    def fetch_provider_usage(self, since: str) -> List[Tuple[str, str, int, Optional[float], Optional[int], int, int]]:
+        """Per provider/model since ``since``: ``(provider, model, calls, avg_ms, max_ms, prompt, completion)``."""
+
+    @abstractmethod
+    def fetch_topic_usage(self, since: str, limit: int = 20) -> List[Tuple[str, int, Optional[float]]]:
+        """Most generated topics since ``since``: ``(topic, generations, avg_latency_ms)``."""
+
+    # Memory compaction
+
+    @abstractmethod
+    def fetch_compactable_conversations(self, cutoff: str, limit: int = 100) -> List[str]:
+        """Conversations that still hold live messages older than ``cutoff``."""
+
+    @abstractmethod
+    def fetch_messages_before(self, conversation_id: str, cutoff: str) -> List[Tuple[int, str, str, str, str]]:
+        """``(id, role, content, timestamp, metadata_json)`` of live messages older than ``cutoff``, oldest first."""
+
+    @abstractmethod
+    def get_conversation_summary(self, conversation_id: str) -> Optional[Tuple[str, int, str]]:
+        """``(summary, message_count, through_timestamp)`` of a compacted conversation."""
+
+    @abstractmethod
+    def archive_messages(self, conversation_id: str, rows: Sequence[Tuple[int, str, str, str, str]], summary: str) -> None:
+        """Move ``fetch_messages_before`` rows to the archive and store ``summary`` in their place."""
+
+    @abstractmethod
+    def fetch_archived_messages(self, conversation_id: str) -> List[Tuple[str, str, str, str]]:
+        """``(role, content, timestamp, metadata_json)`` of archived messages, oldest first."""
+
+    # Bulk transfer
+
+    @contextmanager
+    def bulk_load(self) -> Iterator[None]:
+        """Wrap a series of ``import_posts`` calls; backends may defer index maintenance."""
+        yield
+
+    @abstractmethod
+    def fetch_post_links(self) -> Set[str]:
+        """Every non-empty post link, for deduplicating imports."""
+
+    @abstractmethod
+    def import_posts(self, rows: Iterable[Sequence]) -> int:
+        """Insert rows ordered as ``POST_EXPORT_COLUMNS``. Returns the number inserted."""
+
+    @abstractmethod
+    def export_posts(self, handle: BinaryIO) -> int:
+        """Write every post as UTF-8 CSV with a ``POST_EXPORT_COLUMNS`` header. Returns the row count."""
@@ -0,0 +1,563 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from ..constants import POSTGRES_POOL_SIZE
+from .base import POST_EXPORT_COLUMNS, StorageBackend, StorageError
+
+
+LOGGER = logging.getLogger("taskpilot.storage")
+
+# Any constant shared by every instance; serializes concurrent migrations.
+MIGRATION_LOCK_ID = 0x7A5C9110
+
+# Numbered migrations, applied in order and recorded in ``schema_migrations``. Append new
+# entries; never edit one that has shipped. Timestamps are ISO-8601 UTC text, as in the
+# SQLite schema, so rows read back identically from either backend.
+MIGRATIONS: Tuple[Tuple[int, Tuple[str, ...]], ...] = (
+    (
+        1,
+        (
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id BIGSERIAL PRIMARY KEY,
+                topic TEXT,
+                title TEXT,
+                body TEXT,
+                region TEXT,
+                tone TEXT,
+                persona TEXT,
+                length TEXT,
+                subreddit TEXT,
+                link TEXT,
+                auto_posted INTEGER NOT NULL DEFAULT 0,
+                upvotes INTEGER NOT NULL DEFAULT 0,
+                comments INTEGER NOT NULL DEFAULT 0,
+                timestamp TEXT,
+                conversation_id TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts (timestamp)",
+            """
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                title TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                persona TEXT,
+                tone TEXT,
+                topic_pattern TEXT
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at)",
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                id BIGSERIAL PRIMARY KEY,
+                conversation_id TEXT NOT NULL,
+                role TEXT,
+                content TEXT,
+                timestamp TEXT,
+                metadata JSONB NOT NULL DEFAULT '{}'
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_meta_topic ON messages ((metadata->>'topic'))",
+            "CREATE INDEX IF NOT EXISTS idx_messages_meta_provider ON messages ((metadata->>'provider'))",
+        ),
+    ),
+    (
+        2,
+        (
+            # Trend topics that posts were written for, shared by every instance. Trend
+            # snapshots themselves stay in each instance's local database.
+            """
+            CREATE TABLE IF NOT EXISTS trend_topics (
+                id BIGSERIAL PRIMARY KEY,
+                normalized TEXT NOT NULL UNIQUE,
+                label TEXT NOT NULL,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            )
+            """,
+            "ALTER TABLE posts ADD COLUMN IF NOT EXISTS trend_topic_id BIGINT REFERENCES trend_topics (id)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_trend_topic ON posts (trend_topic_id)",
+            "CREATE INDEX IF NOT EXISTS idx_posts_subreddit ON posts (subreddit)",
+            """
+            CREATE TABLE IF NOT EXISTS conversation_summaries (
+                conversation_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                through_timestamp TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_summaries_through ON conversation_summaries (through_timestamp)",
+            # Compacted messages; PostgreSQL compresses the long content values itself (TOAST)
+            """
+            CREATE TABLE IF NOT EXISTS archived_messages (
+                id BIGINT PRIMARY KEY,
+                conversation_id TEXT NOT NULL,
+                role TEXT,
+                content TEXT,
+                timestamp TEXT,
+                metadata JSONB NOT NULL DEFAULT '{}'
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_archived_messages_conversation ON archived_messages (conversation_id, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_messages_role_time ON messages (role, timestamp)",
+            "CREATE INDEX IF NOT EXISTS idx_conversations_persona ON conversations (persona)",
+        ),
+    ),
+)
+
+_POST_LIST_COLUMNS = "topic, title, subreddit, link, upvotes, comments, timestamp"
+
+
+class PostgresStorage(StorageBackend):
+    """PostgreSQL backend for deployments where several instances share history.
+
+    Connections come from a ``psycopg_pool`` pool; imports and exports stream through COPY.
+    Requires ``pip install "psycopg[binary,pool]"``.
+    """
+
+    name = "postgres"
+
+    def __init__(self, url: str, pool_size: int = POSTGRES_POOL_SIZE):
+        try:
+            from psycopg_pool import ConnectionPool
+        except ImportError as exc:
+            raise StorageError(
+                'PostgreSQL storage needs psycopg 3 with its pool: pip install "psycopg[binary,pool]"'
+            ) from exc
+        self._pool = ConnectionPool(url, min_size=1, max_size=pool_size, open=True, name="taskpilot")
+        self._local = threading.local()
+
+    @contextmanager
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        # The pool commits on a clean exit and rolls back on an exception
+        with self._pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        if getattr(self._local, "conn", None) is not None:
+            yield
+            return
+        with self._pool.connection() as conn:
+            self._local.conn = conn
+            try:
+                yield
+            finally:
+                self._local.conn = None
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def migrate(self) -> bool:
+        with self._pool.connection() as conn:
+            # Instances booting together wait here instead of racing through DDL
+            conn.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, applied_at TEXT NOT NULL)"
+            )
+            applied = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+            pending = [(version, statements) for version, statements in MIGRATIONS if version not in applied]
+            for version, statements in pending:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_migrations (version, applied_at) VALUES (%s, %s)",
+                    (version, datetime.utcnow().isoformat()),
+                )
+                LOGGER.info("PostgreSQL schema migrated to version %s", version)
+        return bool(pending)
+
+    # Posts
+
+    def log_post(self, topic: str, title: str, body: str, region: str, tone: str, persona: str, length: str,
+                 subreddit: str, link: str, auto_posted: bool, conversation_id: str = "", topic_key: str = "") -> int:
+        now = datetime.utcnow().isoformat()
+        with self._connection() as conn:
+            trend_topic_id = None
+            if topic_key:
+                trend_topic_id = conn.execute(
+                    """
+                    INSERT INTO trend_topics (normalized, label, first_seen, last_seen) VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (normalized) DO UPDATE SET last_seen = EXCLUDED.last_seen
+                    RETURNING id
+                    """,
+                    (topic_key, topic, now, now),
+                ).fetchone()[0]
+            row = conn.execute(
+                """
+                INSERT INTO posts (topic, title, body, region, tone, persona, length, subreddit, link, auto_posted,
+                                   timestamp, conversation_id, trend_topic_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
+                """,
+                (topic, title, body, region, tone, persona, length, subreddit, link, int(auto_posted),
+                 now, conversation_id, trend_topic_id),
+            ).fetchone()
+        return row[0]
+
+    def update_post_link(self, post_id: int, link: str, auto_posted: Optional[bool] = None) -> None:
+        with self._connection() as conn:
+            if auto_posted is None:
+                conn.execute("UPDATE posts SET link = %s WHERE id = %s", (link, post_id))
+            else:
+                conn.execute("UPDATE posts SET link = %s, auto_posted = %s WHERE id = %s", (link, int(auto_posted), post_id))
+
+    def fetch_recent_posts(self, limit: int = 50) -> List[Tuple]:
+        with self._connection() as conn:
+            return conn.execute(
+                f"SELECT {_POST_LIST_COLUMNS} FROM posts ORDER BY timestamp DESC, id DESC LIMIT %s", (limit,)
+            ).fetchall()
+
+    def fetch_posts_for_date(self, date_iso: str) -> List[Tuple]:
+        next_day = (date.fromisoformat(date_iso) + timedelta(days=1)).isoformat()
+        with self._connection() as conn:
+            # A range on the ISO text keeps the timestamp index usable
+            return conn.execute(
+                f"SELECT {_POST_LIST_COLUMNS} FROM posts WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp DESC, id DESC",
+                (date_iso, next_day),
+            ).fetchall()
+
+    def fetch_all_posts(self) -> Sequence[Tuple]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT id, topic, title, body, region, tone, persona, length, subreddit, link, upvotes, comments, timestamp
+                FROM posts
+                ORDER BY timestamp DESC, id DESC
+                """
+            ).fetchall()
+
+    def fetch_stats(self) -> Tuple[int, int, int]:
+        today = datetime.utcnow().date().isoformat()
+        with self._connection() as conn:
+            total, today_count, auto = conn.execute(
+                "SELECT COUNT(*), COUNT(*) FILTER (WHERE timestamp >= %s), COALESCE(SUM(auto_posted), 0) FROM posts",
+                (today,),
+            ).fetchone()
+        return total, today_count, auto
+
+    def iter_posts_for_refresh(self) -> Iterable[Tuple[int, str]]:
+        with self._connection() as conn:
+            rows = conn.execute("SELECT id, link FROM posts WHERE link LIKE %s", ("https://www.reddit.com%",)).fetchall()
+        yield from rows
+
+    def update_metrics(self, updates: Iterable[Tuple[int, int, int]]) -> None:
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.executemany(
+                "UPDATE posts SET upvotes = %s, comments = %s WHERE id = %s",
+                [(score, comments, post_id) for post_id, score, comments in updates],
+            )
+
+    def iter_engagement_samples(self, after: str, until: str, after_id: int = 0, batch_size: int = 500) -> Iterable[Tuple]:
+        last_id = after_id
+        while True:
+            with self._connection() as conn:
+                rows = conn.execute(
+                    """
+                    SELECT id, title, body, persona, tone, subreddit, upvotes, comments, timestamp
+                    FROM posts
+                    WHERE (timestamp, id) > (%s, %s) AND timestamp <= %s AND link LIKE %s
+                    ORDER BY timestamp, id
+                    LIMIT %s
+                    """,
+                    (after, last_id, until, "http%", batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield (*row[1:], row[0])
+            after, last_id = rows[-1][-1], rows[-1][0]
+
+    def fetch_popular_combinations(self, since: str, limit: int = 3) -> List[Tuple[str, str, str, str, int]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT region, persona, tone, length, COUNT(*) AS uses
+                FROM posts
+                WHERE timestamp >= %s AND COALESCE(region, '') <> '' AND COALESCE(length, '') <> ''
+                GROUP BY region, persona, tone, length
+                ORDER BY uses DESC, region, persona, tone, length
+                LIMIT %s
+                """,
+                (since, limit),
+            ).fetchall()
+
+    def fetch_style_samples(self, limit: int = 5) -> List[Tuple[str, str, str, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT title, body, tone, persona
+                FROM posts
+                WHERE TRIM(COALESCE(body, '')) <> ''
+                ORDER BY timestamp DESC, id DESC
+                LIMIT %s
+                """,
+                (limit,),
+            ).fetchall()
+
+    def fetch_best_posting_hours(self, subreddit: str, limit: int = 3) -> List[int]:
+        with self._connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT CAST(substr(timestamp, 12, 2) AS INTEGER) AS hour, AVG(upvotes + comments) AS engagement
+                FROM posts
+                WHERE subreddit = %s AND auto_posted = 1
+                GROUP BY hour
+                HAVING COUNT(*) >= 2
+                ORDER BY engagement DESC, hour
+                LIMIT %s
+                """,
+                (subreddit, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def fetch_topic_performance(self, limit: int = 20) -> List[Tuple[str, str, int, int, int, float, float]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT t.label, t.first_seen, COUNT(p.id), SUM(p.upvotes), SUM(p.comments),
+                       AVG(p.upvotes)::float8, AVG(p.comments)::float8
+                FROM posts p
+                JOIN trend_topics t ON t.id = p.trend_topic_id
+                GROUP BY t.id
+                ORDER BY SUM(p.upvotes) + SUM(p.comments) DESC, t.label
+                LIMIT %s
+                """,
+                (limit,),
+            ).fetchall()
+
+    # Conversations and messages
+
+    def create_conversation(self, conversation_id: str, title: str, persona: str, tone: str) -> None:
+        now = datetime.utcnow().isoformat()
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO conversations (id, title, created_at, updated_at, persona, tone)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (conversation_id, title, now, now, persona, tone),
+            )
+
+    def update_conversation_timestamp(self, conversation_id: str) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE conversations SET updated_at = %s WHERE id = %s", (datetime.utcnow().isoformat(), conversation_id)
+            )
+
+    def add_message(self, conversation_id: str, role: str, content: str,
+                    metadata: Optional[Dict[str, object]] = None, body: Optional[str] = None) -> None:
+        with self._connection() as conn:
+            conn.execute(
+                """
+                INSERT INTO messages (conversation_id, role, content, timestamp, metadata)
+                VALUES (%s, %s, %s, %s, %s::jsonb)
+                """,
+                (conversation_id, role, content + (body or ""), datetime.utcnow().isoformat(), json.dumps(metadata or {})),
+            )
+
+    def get_recent_conversations(self, limit: int = 10) -> List[Tuple[str, str, str, str, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT id, title, persona, tone, updated_at FROM conversations ORDER BY updated_at DESC LIMIT %s",
+                (limit,),
+            ).fetchall()
+
+    def get_conversation_history(self, conversation_id: str, limit: int = 50) -> List[Tuple[str, str, str, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT role, content, timestamp, metadata::text
+                FROM messages
+                WHERE conversation_id = %s
+                ORDER BY timestamp ASC, id ASC
+                LIMIT %s
+                """,
+                (conversation_id, limit),
+            ).fetchall()
+
+    def get_memory_context(self, persona: str, limit: int = 10) -> List[Tuple[str, str, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                (
+                    SELECT c.title, m.content, m.timestamp
+                    FROM messages m
+                    JOIN conversations c ON c.id = m.conversation_id
+                    WHERE m.role = 'assistant' AND c.persona = %s
+                    ORDER BY m.timestamp DESC, m.id DESC
+                    LIMIT %s
+                )
+                UNION ALL
+                (
+                    SELECT c.title, s.summary, s.through_timestamp
+                    FROM conversation_summaries s
+                    JOIN conversations c ON c.id = s.conversation_id
+                    WHERE c.persona = %s
+                    ORDER BY s.through_timestamp DESC
+                    LIMIT %s
+                )
+                ORDER BY 3 DESC
+                LIMIT %s
+                """,
+                (persona, limit, persona, limit, limit),
+            ).fetchall()
+
+    def fetch_memory_stats(self) -> Tuple[Dict[str, int], int, List[Tuple[str, int]]]:
+        week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+        with self._connection() as conn:
+            conversations, recent = conn.execute(
+                "SELECT COUNT(*), COUNT(*) FILTER (WHERE updated_at >= %s) FROM conversations", (week_ago,)
+            ).fetchone()
+            messages, assistant = conn.execute(
+                "SELECT COUNT(*), COUNT(*) FILTER (WHERE role = 'assistant') FROM messages"
+            ).fetchone()
+            top_personas = conn.execute(
+                """
+                SELECT COALESCE(persona, '') AS persona, COUNT(*) AS uses
+                FROM conversations
+                GROUP BY 1
+                ORDER BY uses DESC, persona
+                LIMIT 5
+                """
+            ).fetchall()
+        counters = {"conversations": conversations, "messages": messages, "messages_assistant": assistant}
+        return counters, recent, top_personas
+
+    def fetch_provider_usage(self, since: str) -> List[Tuple[str, str, int, Optional[float], Optional[int], int, int]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT metadata->>'provider', COALESCE(metadata->>'model', ''), COUNT(*),
+                       AVG((metadata->>'latency_ms')::numeric)::float8, MAX((metadata->>'latency_ms')::numeric)::bigint,
+                       COALESCE(SUM((metadata->>'prompt_tokens')::numeric), 0)::bigint,
+                       COALESCE(SUM((metadata->>'completion_tokens')::numeric), 0)::bigint
+                FROM messages
+                WHERE metadata->>'provider' IS NOT NULL AND timestamp >= %s
+                GROUP BY metadata->>'provider', metadata->>'model'
+                ORDER BY COUNT(*) DESC, metadata->>'provider', metadata->>'model'
+                """,
+                (since,),
+            ).fetchall()
+
+    def fetch_topic_usage(self, since: str, limit: int = 20) -> List[Tuple[str, int, Optional[float]]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT metadata->>'topic', COUNT(*), AVG((metadata->>'latency_ms')::numeric)::float8
+                FROM messages
+                WHERE metadata->>'topic' IS NOT NULL AND timestamp >= %s
+                GROUP BY metadata->>'topic'
+                ORDER BY COUNT(*) DESC, metadata->>'topic'
+                LIMIT %s
+                """,
+                (since, limit),
+            ).fetchall()
+
+    # Memory compaction
+
+    def fetch_compactable_conversations(self, cutoff: str, limit: int = 100) -> List[str]:
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT conversation_id FROM messages WHERE timestamp < %s LIMIT %s", (cutoff, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def fetch_messages_before(self, conversation_id: str, cutoff: str) -> List[Tuple[int, str, str, str, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT id, role, content, timestamp, metadata::text
+                FROM messages
+                WHERE conversation_id = %s AND timestamp < %s
+                ORDER BY timestamp ASC, id ASC
+                """,
+                (conversation_id, cutoff),
+            ).fetchall()
+
+    def get_conversation_summary(self, conversation_id: str) -> Optional[Tuple[str, int, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                "SELECT summary, message_count, through_timestamp FROM conversation_summaries WHERE conversation_id = %s",
+                (conversation_id,),
+            ).fetchone()
+
+    def archive_messages(self, conversation_id: str, rows: Sequence[Tuple[int, str, str, str, str]], summary: str) -> None:
+        if not rows:
+            return
+        through = max(row[3] or "" for row in rows)
+        # One transaction: the archive copy, the delete and the summary land together or not at all
+        with self._connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.executemany(
+                    """
+                    INSERT INTO archived_messages (id, conversation_id, role, content, timestamp, metadata)
+                    VALUES (%s, %s, %s, %s, %s, %s::jsonb)
+                    ON CONFLICT (id) DO NOTHING
+                    """,
+                    [
+                        (message_id, conversation_id, role, content, timestamp, metadata or "{}")
+                        for message_id, role, content, timestamp, metadata in rows
+                    ],
+                )
+            conn.execute("DELETE FROM messages WHERE id = ANY(%s)", ([row[0] for row in rows],))
+            conn.execute(
+                """
+                INSERT INTO conversation_summaries (conversation_id, summary, message_count, through_timestamp, updated_at)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (conversation_id) DO UPDATE SET
+                    summary = EXCLUDED.summary,
+                    message_count = conversation_summaries.message_count + EXCLUDED.message_count,
+                    through_timestamp = GREATEST(conversation_summaries.through_timestamp, EXCLUDED.through_timestamp),
+                    updated_at = EXCLUDED.updated_at
+                """,
+                (conversation_id, summary, len(rows), through, datetime.utcnow().isoformat()),
+            )
+
+    def fetch_archived_messages(self, conversation_id: str) -> List[Tuple[str, str, str, str]]:
+        with self._connection() as conn:
+            return conn.execute(
+                """
+                SELECT role, content, timestamp, metadata::text
+                FROM archived_messages
+                WHERE conversation_id = %s
+                ORDER BY timestamp ASC, id ASC
+                """,
+                (conversation_id,),
+            ).fetchall()
+
+    # Bulk transfer
+
+    def fetch_post_links(self) -> Set[str]:
+        with self._connection() as conn:
+            return {row[0] for row in conn.execute("SELECT link FROM posts WHERE link LIKE %s", ("http%",))}
+
+    def import_posts(self, rows: Iterable[Sequence]) -> int:
+        count = 0
+        with self._connection() as conn, conn.cursor() as cursor:
+            with cursor.copy(f"COPY posts ({', '.join(POST_EXPORT_COLUMNS)}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+                    count += 1
+        return count
+
+    def export_posts(self, handle: BinaryIO) -> int:
+        with self._connection() as conn, conn.cursor() as cursor:
+            query = f"COPY (SELECT {', '.join(POST_EXPORT_COLUMNS)} FROM posts ORDER BY id) TO STDOUT WITH (FORMAT csv, HEADER)"
+            with cursor.copy(query) as copy:
+                for chunk in copy:
+                    handle.write(chunk)
+            return max(cursor.rowcount, 0)
@@ -0,0 +1,136 @@
+import csv
+import io
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .. import database
+from .base import POST_EXPORT_COLUMNS, StorageBackend
+
+
+class SQLiteStorage(StorageBackend):
+    """The local SQLite database (``DB_FILE``), via the helpers in ``backend.database``.
+
+    Bodies go through the compressed content store and dashboard counters are maintained by
+    triggers, exactly as for the rest of the app's local state.
+    """
+
+    name = "sqlite"
+
+    def migrate(self) -> bool:
+        return database.init_db()
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        with database.write_batch():
+            yield
+
+    def log_post(self, topic: str, title: str, body: str, region: str, tone: str, persona: str, length: str,
+                 subreddit: str, link: str, auto_posted: bool, conversation_id: str = "", topic_key: str = "") -> int:
+        return database.log_post(
+            topic, title, body, region, tone, persona, length, subreddit, link, auto_posted, conversation_id, topic_key
+        )
+
+    def update_post_link(self, post_id: int, link: str, auto_posted: Optional[bool] = None) -> None:
+        database.update_post_link(post_id, link, auto_posted)
+
+    def fetch_recent_posts(self, limit: int = 50) -> List[Tuple]:
+        return database.fetch_recent_posts(limit)
+
+    def fetch_posts_for_date(self, date_iso: str) -> List[Tuple]:
+        return database.fetch_posts_for_date(date_iso)
+
+    def fetch_all_posts(self) -> Sequence[Tuple]:
+        return database.fetch_all_posts()
+
+    def fetch_stats(self) -> Tuple[int, int, int]:
+        return database.fetch_stats()
+
+    def iter_posts_for_refresh(self) -> Iterable[Tuple[int, str]]:
+        return database.iter_posts_for_refresh()
+
+    def update_metrics(self, updates: Iterable[Tuple[int, int, int]]) -> None:
+        database.update_metrics(updates)
+
+    def iter_engagement_samples(self, after: str, until: str, after_id: int = 0) -> Iterable[Tuple]:
+        return database.iter_engagement_samples(after, until, after_id)
+
+    def fetch_popular_combinations(self, since: str, limit: int = 3) -> List[Tuple[str, str, str, str, int]]:
+        return database.fetch_popular_combinations(since, limit)
+
+    def fetch_style_samples(self, limit: int = 5) -> List[Tuple[str, str, str, str]]:
+        return database.fetch_style_samples(limit)
+
+    def fetch_best_posting_hours(self, subreddit: str, limit: int = 3) -> List[int]:
+        return database.fetch_best_posting_hours(subreddit, limit)
+
+    def fetch_topic_performance(self, limit: int = 20) -> List[Tuple[str, str, int, int, int, float, float]]:
+        return database.fetch_topic_performance(limit)
+
+    def create_conversation(self, conversation_id: str, title: str, persona: str, tone: str) -> None:
+        database.create_conversation(conversation_id, title, persona, tone)
+
+    def update_conversation_timestamp(self, conversation_id: str) -> None:
+        database.update_conversation_timestamp(conversation_id)
+
+    def add_message(self, conversation_id: str, role: str, content: str,
+                    metadata: Optional[Dict[str, object]] = None, body: Optional[str] = None) -> None:
+        # The body is stored once and shared with the post that log_post writes for it
+        content_ref = database.store_content(body) if body else None
+        database.add_message(conversation_id, role, content, metadata, content_ref)
+
+    def get_recent_conversations(self, limit: int = 10) -> List[Tuple[str, str, str, str, str]]:
+        return database.get_recent_conversations(limit)
+
+    def get_conversation_history(self, conversation_id: str, limit: int = 50) -> List[Tuple[str, str, str, str]]:
+        return database.get_conversation_history(conversation_id, limit)
+
+    def get_memory_context(self, persona: str, limit: int = 10) -> List[Tuple[str, str, str]]:
+        return database.get_memory_context(persona, limit)
+
+    def fetch_memory_stats(self) -> Tuple[Dict[str, int], int, List[Tuple[str, int]]]:
+        return database.fetch_memory_stats()
+
+    def fetch_provider_usage(self, since: str) -> List[Tuple[str, str, int, Optional[float], Optional[int], int, int]]:
+        return database.fetch_provider_usage(since)
+
+    def fetch_topic_usage(self, since: str, limit: int = 20) -> List[Tuple[str, int, Optional[float]]]:
+        return database.fetch_topic_usage(since, limit)
+
+    def fetch_compactable_conversations(self, cutoff: str, limit: int = 100) -> List[str]:
+        return database.fetch_compactable_conversations(cutoff, limit)
+
+    def fetch_messages_before(self, conversation_id: str, cutoff: str) -> List[Tuple[int, str, str, str, str]]:
+        return database.fetch_messages_before(conversation_id, cutoff)
+
+    def get_conversation_summary(self, conversation_id: str) -> Optional[Tuple[str, int, str]]:
+        return database.get_conversation_summary(conversation_id)
+
+    def archive_messages(self, conversation_id: str, rows: Sequence[Tuple[int, str, str, str, str]], summary: str) -> None:
+        database.archive_messages(conversation_id, rows, summary)
+
+    def fetch_archived_messages(self, conversation_id: str) -> List[Tuple[str, str, str, str]]:
+        return database.fetch_archived_messages(conversation_id)
+
+    @contextmanager
+    def bulk_load(self) -> Iterator[None]:
+        with database.deferred_post_maintenance():
+            yield
+
+    def fetch_post_links(self) -> Set[str]:
+        return database.fetch_post_links()
+
+    def import_posts(self, rows: Iterable[Sequence]) -> int:
+        with database.write_batch():
+            return database.insert_posts(rows)
+
+    def export_posts(self, handle: BinaryIO) -> int:
+        text = io.TextIOWrapper(handle, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(POST_EXPORT_COLUMNS)
+        count = 0
+        for row in database.iter_posts_for_export():
+            writer.writerow(row)
+            count += 1
+        text.flush()
+        text.detach()
+        return count
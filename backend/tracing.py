@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+import requests
+
+from .constants import SLOW_REQUEST_MS, TRACE_EXPORT
+
+
+LOGGER = logging.getLogger("taskpilot.tracing")
+
+_current: ContextVar[Optional["Span"]] = ContextVar("taskpilot_span", default=None)
+
+
+class Span:
+    """One timed stage of a request. Children are collected so the whole tree can be exported."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "children", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, object]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.children: List["Span"] = []
+        self.error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, **attributes: object) -> None:
+        self.attributes.update(attributes)
+
+    def walk(self) -> Iterator["Span"]:
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, root: bool = False, **attributes: object) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span.
+
+    Outside a trace this is a no-op (yields ``None``) unless ``root`` starts a new trace, so
+    background work pays nothing for instrumentation shared with request handlers.
+    """
+    parent = _current.get()
+    if parent is None and not root:
+        yield None
+        return
+    trace_id = parent.trace_id if parent is not None else os.urandom(16).hex()
+    current = Span(name, trace_id, parent.span_id if parent is not None else None, attributes)
+    if parent is not None:
+        parent.children.append(current)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = f"{type(exc).__name__}: {exc}"[:300]
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current.reset(token)
+
+
+def format_tree(root: Span) -> str:
+    """Indented, human-readable rendering of a span tree."""
+    lines: List[str] = []
+
+    def render(node: Span, depth: int) -> None:
+        parts = [f"{node.name} {node.duration_ms:.1f}ms"]
+        parts += [f"{key}={value}" for key, value in node.attributes.items()]
+        if node.error:
+            parts.append(f"ERROR {node.error}")
+        lines.append("  " * depth + " ".join(parts))
+        for child in list(node.children):
+            render(child, depth + 1)
+
+    render(root, 0)
+    return "\n".join(lines)
+
+
+def _otlp_value(value: object) -> Dict[str, object]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(root: Span) -> Dict[str, object]:
+    """Encode a span tree as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    spans = []
+    for node in root.walk():
+        encoded = {
+            "traceId": node.trace_id,
+            "spanId": node.span_id,
+            "name": node.name,
+            "kind": 2 if node.parent_id is None else 1,  # SERVER for the request, INTERNAL below
+            "startTimeUnixNano": str(node.start_ns),
+            "endTimeUnixNano": str(node.end_ns or time.time_ns()),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in node.attributes.items()],
+            "status": {"code": 2, "message": node.error} if node.error else {"code": 1},
+        }
+        if node.parent_id:
+            encoded["parentSpanId"] = node.parent_id
+        spans.append(encoded)
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "taskpilot"}}]},
+                "scopeSpans": [{"scope": {"name": "taskpilot.tracing"}, "spans": spans}],
+            }
+        ]
+    }
+
+
+class TraceExporter:
+    """Ships finished traces off the request path to a JSONL file or an OTLP/HTTP collector.
+
+    ``target`` is a file path (one OTLP/JSON document per line, as the OpenTelemetry file
+    exporter writes) or an ``http(s)://`` collector base URL.
+    """
+
+    def __init__(self, target: str, max_pending: int = 1000):
+        self.target = target
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, root: Span) -> None:
+        try:
+            self._queue.put_nowait(root)
+        except queue.Full:
+            LOGGER.debug("Trace export queue full; dropping trace %s", root.trace_id)
+
+    def _run(self) -> None:
+        while True:
+            root = self._queue.get()
+            try:
+                self._write(to_otlp(root))
+            except Exception as exc:
+                LOGGER.warning("Trace export to %s failed: %s", self.target, exc)
+
+    def _write(self, document: Dict[str, object]) -> None:
+        if self.target.startswith(("http://", "https://")):
+            requests.post(f"{self.target.rstrip('/')}/v1/traces", json=document, timeout=5).raise_for_status()
+        else:
+            with open(self.target, "a", encoding="utf-8") as handle:
+                handle.write(json.dumps(document) + "\n")
+
+
+_exporter: Optional[TraceExporter] = TraceExporter(TRACE_EXPORT) if TRACE_EXPORT else None
+
+
+def finish_trace(root: Span) -> None:
+    """Export a finished request trace and log its tree when it was slow."""
+    if _exporter is not None:
+        _exporter.export(root)
+    if root.duration_ms >= SLOW_REQUEST_MS:
+        LOGGER.warning(
+            "Slow request (%.0f ms >= %.0f ms), trace %s:\n%s",
+            root.duration_ms,
+            SLOW_REQUEST_MS,
+            root.trace_id,
+            format_tree(root),
+        )
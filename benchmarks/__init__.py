@@ -0,0 +1 @@
+"""Offline benchmark harness: fake upstream servers and a load driver for the API."""
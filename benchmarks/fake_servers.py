@@ -0,0 +1,305 @@
+"""Local stand-ins for the upstream APIs TaskPilot talks to.
+
+One HTTP server answers every upstream at once (Groq/OpenAI chat completions, Gemini
+generateContent, a self-hosted OpenAI-compatible completions server, Google Trends, Bing
+News RSS and the Reddit OAuth API), routed by path. Latency, error rate and rate limit are
+configurable per upstream.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+_WORDS = (
+    "quantum solar festival marathon election robot playoff galaxy vaccine startup drought "
+    "concert merger satellite wildfire tournament museum heatwave launch summit protest "
+    "blockbuster budget crypto glacier championship reboot"
+).split()
+
+
+@dataclass
+class Behavior:
+    """How one fake upstream responds."""
+
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    rate_limit: float = 0.0  # requests per second; 0 disables the limit
+    _tokens: float = field(default=0.0, repr=False)
+    _refilled: float = field(default_factory=time.monotonic, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        self._tokens = self._capacity
+
+    @property
+    def _capacity(self) -> float:
+        # One second's worth of burst, and at least one request
+        return max(1.0, self.rate_limit)
+
+    def admit(self) -> bool:
+        """Token-bucket check; False means the caller should get a 429."""
+        if self.rate_limit <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self.rate_limit)
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def delay(self) -> None:
+        time.sleep(max(0.0, random.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+
+
+UPSTREAMS = ("groq", "openai", "google", "local", "trends", "bing", "reddit")
+
+
+def _text(words: int) -> str:
+    return " ".join(random.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _topic() -> str:
+    return f"{random.choice(_WORDS).title()} {random.choice(_WORDS)} {random.randint(1, 9999)}"
+
+
+def _chat_completion(request: Dict) -> Dict:
+    prompt = " ".join(message.get("content", "") for message in request.get("messages", []))
+    content = "\n\n".join(_text(random.randint(40, 80)) for _ in range(4))
+    return {
+        "id": f"chatcmpl-{random.getrandbits(32):x}",
+        "object": "chat.completion",
+        "model": request.get("model", ""),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split())},
+    }
+
+
+def _gemini_completion(request: Dict) -> Dict:
+    prompt = " ".join(part.get("text", "") for item in request.get("contents", []) for part in item.get("parts", []))
+    content = "\n\n".join(_text(random.randint(40, 80)) for _ in range(4))
+    return {
+        "candidates": [{"content": {"parts": [{"text": content}], "role": "model"}, "finishReason": "STOP"}],
+        "usageMetadata": {"promptTokenCount": len(prompt.split()), "candidatesTokenCount": len(content.split())},
+    }
+
+
+def _local_completions(request: Dict) -> List[Dict]:
+    """Streamed ``/v1/completions`` chunks for one prompt or a batch of them, as vLLM sends them.
+
+    Completions have different lengths and their tokens interleave, so a client must route
+    chunks by ``index`` and may see one prompt finish while others are still decoding.
+    """
+    prompts = request.get("prompt")
+    prompts = prompts if isinstance(prompts, list) else [prompts or ""]
+    tokens = [_text(random.randint(20, 60)).split() for _ in prompts]
+    chunks = []
+    for step in range(max(len(words) for words in tokens)):
+        for index, words in enumerate(tokens):
+            if step < len(words):
+                finish = "stop" if step == len(words) - 1 else None
+                text = words[step] if step == 0 else " " + words[step]
+                chunks.append({"object": "text_completion", "choices": [{"index": index, "text": text, "finish_reason": finish}]})
+    return chunks
+
+
+def _daily_trends() -> str:
+    searches = [{"title": {"query": _topic()}} for _ in range(10)]
+    # The real endpoint prefixes its JSON with an anti-XSSI line
+    return ")]}',\n" + json.dumps({"default": {"trendingSearchesDays": [{"trendingSearches": searches}]}})
+
+
+def _news_rss() -> str:
+    items = "".join(f"<item><title>{_topic()}</title><link>http://example.invalid/</link></item>" for _ in range(10))
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>News</title>{items}</channel></rss>'
+
+
+def _submission(submission_id: str, host: str) -> Dict:
+    return {
+        "kind": "t3",
+        "data": {
+            "id": submission_id,
+            "name": f"t3_{submission_id}",
+            "title": "Benchmark post",
+            "selftext": "",
+            "score": random.randint(0, 500),
+            "num_comments": random.randint(0, 80),
+            "subreddit": "benchmark",
+            "author": "bench_user",
+            "created_utc": time.time(),
+            "permalink": f"/r/benchmark/comments/{submission_id}/benchmark_post/",
+            "url": f"http://{host}/r/benchmark/comments/{submission_id}/benchmark_post/",
+        },
+    }
+
+
+class FakeUpstreams:
+    """Runs the fake upstream server on a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, behaviors: Optional[Dict[str, Behavior]] = None):
+        self.behaviors = {name: Behavior() for name in UPSTREAMS}
+        self.behaviors.update(behaviors or {})
+        self.counts: Dict[Tuple[str, int], int] = {}
+        # Prompts per request received by the local completions server
+        self.local_batches: List[int] = []
+        self._counts_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-upstreams", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables that point the app at these fakes."""
+        return {
+            "TASKPILOT_GROQ_URL": f"{self.url}/openai/v1/chat/completions",
+            "TASKPILOT_OPENAI_URL": f"{self.url}/v1/chat/completions",
+            "TASKPILOT_GOOGLE_URL": f"{self.url}/v1beta",
+            "TASKPILOT_TRENDS_URL": self.url,
+            "TASKPILOT_BING_URL": self.url,
+            "TASKPILOT_REDDIT_OAUTH_URL": self.url,
+            "TASKPILOT_REDDIT_URL": self.url,
+        }
+
+    @property
+    def local_url(self) -> str:
+        """Base URL to configure as the LOCAL server."""
+        return f"{self.url}/local/v1"
+
+    def start(self) -> "FakeUpstreams":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _count(self, upstream: str, status: int) -> None:
+        with self._counts_lock:
+            self.counts[(upstream, status)] = self.counts.get((upstream, status), 0) + 1
+
+    def _handler_class(self):
+        fakes = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):  # keep benchmark output readable
+                pass
+
+            def _route(self) -> Optional[str]:
+                path = urlparse(self.path).path
+                if path.startswith("/openai/"):
+                    return "groq"
+                if path.startswith("/v1/chat/"):
+                    return "openai"
+                if path.startswith("/v1beta/"):
+                    return "google"
+                if path.startswith("/local/"):
+                    return "local"
+                if path.startswith("/trends/"):
+                    return "trends"
+                if path.startswith("/news/"):
+                    return "bing"
+                return "reddit"
+
+            def _send(self, status: int, body: str, content_type: str = "application/json", headers=None) -> None:
+                payload = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                upstream = self._route()
+                behavior = fakes.behaviors[upstream]
+                if not behavior.admit():
+                    fakes._count(upstream, 429)
+                    self._send(429, json.dumps({"error": {"message": "Rate limit exceeded"}}), headers={"Retry-After": "1"})
+                    return
+                behavior.delay()
+                if random.random() < behavior.error_rate:
+                    fakes._count(upstream, 500)
+                    self._send(500, json.dumps({"error": {"message": "Injected upstream failure"}}))
+                    return
+                if upstream == "local":
+                    self._stream_local(json.loads(raw or b"{}"))
+                    return
+                status, body, content_type = self._respond(upstream, raw)
+                fakes._count(upstream, status)
+                self._send(status, body, content_type)
+
+            def _stream_local(self, request: Dict) -> None:
+                chunks = _local_completions(request)
+                with fakes._counts_lock:
+                    fakes.local_batches.append(len(request["prompt"]) if isinstance(request.get("prompt"), list) else 1)
+                fakes._count("local", 200)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for chunk in [*(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks), "data: [DONE]\n\n"]:
+                    payload = chunk.encode()
+                    self.wfile.write(f"{len(payload):x}\r\n".encode() + payload + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _respond(self, upstream: str, raw: bytes) -> Tuple[int, str, str]:
+                parsed = urlparse(self.path)
+                if upstream in ("groq", "openai"):
+                    return 200, json.dumps(_chat_completion(json.loads(raw or b"{}"))), "application/json"
+                if upstream == "google":
+                    return 200, json.dumps(_gemini_completion(json.loads(raw or b"{}"))), "application/json"
+                if upstream == "trends":
+                    return 200, _daily_trends(), "application/json"
+                if upstream == "bing":
+                    return 200, _news_rss(), "application/rss+xml"
+                return self._reddit(parsed.path, parse_qs(parsed.query))
+
+            def _reddit(self, path: str, query: Dict) -> Tuple[int, str, str]:
+                host = self.headers.get("Host", "localhost")
+                # PRAW calls its endpoints with a trailing slash (api/submit/, api/info/)
+                path = path.rstrip("/") or "/"
+                if path == "/api/v1/access_token":
+                    token = {"access_token": "bench-token", "token_type": "bearer", "expires_in": 3600, "scope": "*"}
+                    return 200, json.dumps(token), "application/json"
+                if path == "/api/v1/me":
+                    return 200, json.dumps({"name": "bench_user", "id": "bench", "created_utc": 0}), "application/json"
+                if path == "/api/submit":
+                    submission_id = f"{random.getrandbits(36):x}"
+                    url = f"http://{host}/r/benchmark/comments/{submission_id}/benchmark_post/"
+                    data = {"json": {"errors": [], "data": {"url": url, "id": submission_id, "name": f"t3_{submission_id}"}}}
+                    return 200, json.dumps(data), "application/json"
+                if path == "/api/info":
+                    names = ",".join(query.get("id", [])).split(",")
+                    children = [_submission(name[3:], host) for name in names if name.startswith("t3_")]
+                    return 200, json.dumps({"kind": "Listing", "data": {"children": children, "after": None}}), "application/json"
+                match = re.match(r"^(?:/r/[^/]+)?/comments/([^/]+)", path)
+                if match:
+                    listing = [
+                        {"kind": "Listing", "data": {"children": [_submission(match.group(1), host)], "after": None}},
+                        {"kind": "Listing", "data": {"children": [], "after": None}},
+                    ]
+                    return 200, json.dumps(listing), "application/json"
+                return 404, json.dumps({"message": "Not Found", "error": 404}), "application/json"
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return Handler
@@ -0,0 +1,334 @@
+"""Drive the TaskPilot API under concurrent load against local fake upstreams.
+
+Usage::
+
+    python -m benchmarks.run --concurrency 8 --duration 30
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json --tolerance 0.25
+    python -m benchmarks.run --import-budget-ms 400
+    python -m benchmarks.run --local    # generate on the fake self-hosted server
+
+The app runs in a uvicorn subprocess with its config, database and archive in a scratch
+directory, so the benchmark never touches real data or real APIs. The exit status is 1
+when ``--baseline`` is given and any endpoint's p95 regressed beyond ``--tolerance``, or
+when importing ``backend.main`` takes longer than ``--import-budget-ms``.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from .fake_servers import Behavior, FakeUpstreams
+from .startup import import_profile, print_imports
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (method, path, json body factory)
+SCENARIOS: Dict[str, Tuple[str, str, Optional[Callable[[], dict]]]] = {
+    "generate": (
+        "POST",
+        "/api/generate",
+        lambda: {
+            "region": "united_states",
+            "tone": random.choice(["Informative", "Witty", "Hype"]),
+            "length": "Short",
+            "subreddit": "benchmark",
+            "auto_post": True,
+        },
+    ),
+    "refresh": ("POST", "/api/refresh", None),
+    "history": ("GET", "/api/history?limit=50", None),
+    "summary": ("GET", "/api/summary?format=txt", None),
+}
+DEFAULT_MIX = "generate=1,refresh=1,history=6,summary=2"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _database_bytes(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.glob("*.db*"))
+
+
+def _parse_mix(text: str) -> List[Tuple[str, int]]:
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario '{name}'. Choose from: {', '.join(SCENARIOS)}")
+        mix.append((name, int(weight or 1)))
+    return mix
+
+
+class AppServer:
+    """The API under test, in a uvicorn subprocess pointed at the fakes and a scratch directory."""
+
+    def __init__(self, workdir: Path, env: Dict[str, str], workers: int = 1):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.workdir = workdir
+        self.env = {
+            **os.environ,
+            **env,
+            "TASKPILOT_CONFIG_FILE": str(workdir / "taskpilot_config.ini"),
+            "TASKPILOT_DB_FILE": str(workdir / "taskpilot.db"),
+            "TASKPILOT_ARCHIVE_DB_FILE": str(workdir / "taskpilot_archive.db"),
+        }
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+        self.launched_at = 0.0
+
+    def _wait_for(self, path: str, timeout: float) -> float:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f"API server exited with status {self.process.returncode}")
+            try:
+                requests.get(f"{self.url}{path}", timeout=1).raise_for_status()
+                return time.monotonic() - self.launched_at
+            except requests.RequestException:
+                time.sleep(0.05)
+        raise SystemExit(f"API server did not answer {path} in time")
+
+    def start(self, timeout: float = 30.0) -> float:
+        """Launch the server; returns the seconds it took to answer the liveness probe."""
+        command = [
+            sys.executable, "-m", "uvicorn", "backend.main:app",
+            "--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning", "--workers", str(self.workers),
+        ]
+        self.launched_at = time.monotonic()
+        self.process = subprocess.Popen(command, cwd=ROOT, env=self.env)
+        return self._wait_for("/api/health/live", timeout)
+
+    def wait_ready(self, timeout: float = 30.0) -> float:
+        """Seconds from launch until warm-up finished."""
+        return self._wait_for("/api/health/ready", timeout)
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def configure(self, local_url: Optional[str] = None) -> None:
+        reddit = {
+            "client_id": "bench",
+            "client_secret": "bench",
+            "username": "bench_user",
+            "password": "bench",
+            "user_agent": "taskpilot-benchmark/1.0",
+        }
+        payload = {
+            "GROQ": {"api_key": "bench", "model": "llama-3.1-8b-instant"},
+            "GOOGLE": {"api_key": "bench", "model": "gemini-2.0-flash"},
+            "OPENAI": {"api_key": "bench", "model": "gpt-4o-mini"},
+            "REDDIT": reddit,
+        }
+        if local_url:
+            payload["LOCAL"] = {"base_url": local_url, "model": "local/bench"}
+        requests.post(f"{self.url}/api/config", json=payload, timeout=30).raise_for_status()
+
+
+def _post_failure(response: requests.Response) -> Optional[str]:
+    """Auto-post failures are reported per post in a 200 response; count them as errors."""
+    try:
+        posts = response.json().get("posts") or []
+    except ValueError:
+        return "invalid JSON"
+    failed = sum(str(post.get("link", "")).startswith("Post failed:") for post in posts)
+    return f"{failed} posts failed" if failed else None
+
+
+def run_load(base_url: str, mix: List[Tuple[str, int]], concurrency: int, duration: float) -> Dict[str, Dict]:
+    """Send the weighted request mix from ``concurrency`` threads for ``duration`` seconds."""
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    results: Dict[str, Dict[str, List]] = {name: {"latencies": [], "errors": []} for name in names}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker() -> None:
+        session = requests.Session()
+        while time.monotonic() < stop_at:
+            name = random.choices(names, weights)[0]
+            method, path, body = SCENARIOS[name]
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=body() if body else None, timeout=120)
+                error = None if response.status_code < 400 else f"HTTP {response.status_code}"
+                if error is None and name == "generate":
+                    error = _post_failure(response)
+            except requests.RequestException as exc:
+                error = type(exc).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results[name]["latencies"].append(elapsed)
+                if error:
+                    results[name]["errors"].append(error)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.monotonic() - started
+
+    report = {}
+    for name, data in results.items():
+        latencies = data["latencies"]
+        report[name] = {
+            "requests": len(latencies),
+            "errors": len(data["errors"]),
+            "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+        }
+    return report
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Endpoints whose p95 grew by more than ``tolerance`` relative to ``baseline``."""
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(name)
+        if previous and previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{'endpoint':<10} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in report["endpoints"].items():
+        print(
+            f"{name:<10} {row['requests']:>6} {row['errors']:>5} {row['throughput_rps']:>8} "
+            f"{row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9}"
+        )
+    growth = report["db_bytes_after"] - report["db_bytes_before"]
+    print(
+        f"\nDatabase: {report['db_bytes_before']:,} -> {report['db_bytes_after']:,} bytes "
+        f"({growth:+,}; {report['db_bytes_per_generate']:,.0f} bytes per generate request)"
+    )
+    print("Upstream calls: " + ", ".join(f"{name} {status}: {count}" for (name, status), count in report["upstream_calls"]))
+    batches = report.get("local_batches") or []
+    if batches:
+        print(f"Local server: {sum(batches)} prompts in {len(batches)} requests ({sum(batches) / len(batches):.2f} per batch)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=int, default=3, help="Generate requests issued before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted scenarios (default {DEFAULT_MIX})")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--llm-latency", type=float, default=300.0, help="Fake LLM latency in ms")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-rate-limit", type=float, default=0.0, help="Fake LLM requests/second (0 = unlimited)")
+    parser.add_argument("--local", action="store_true", help="Pin generation to the fake self-hosted server")
+    parser.add_argument("--trends-latency", type=float, default=150.0)
+    parser.add_argument("--reddit-latency", type=float, default=100.0)
+    parser.add_argument("--reddit-error-rate", type=float, default=0.0)
+    parser.add_argument("--reddit-rate-limit", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    parser.add_argument("--baseline", type=Path, help="Compare against an earlier JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative p95 growth vs the baseline")
+    parser.add_argument("--import-budget-ms", type=float, help="Fail when importing backend.main exceeds this")
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    mix = _parse_mix(args.mix)
+    llm = dict(latency_ms=args.llm_latency, jitter_ms=args.llm_latency / 5, error_rate=args.llm_error_rate, rate_limit=args.llm_rate_limit)
+    behaviors = {
+        "groq": Behavior(**llm),
+        "openai": Behavior(**llm),
+        "google": Behavior(**llm),
+        "local": Behavior(**llm),
+        "trends": Behavior(latency_ms=args.trends_latency, jitter_ms=args.trends_latency / 5),
+        "bing": Behavior(latency_ms=args.trends_latency, jitter_ms=args.trends_latency / 5),
+        "reddit": Behavior(
+            latency_ms=args.reddit_latency,
+            jitter_ms=args.reddit_latency / 5,
+            error_rate=args.reddit_error_rate,
+            rate_limit=args.reddit_rate_limit,
+        ),
+    }
+
+    fakes = FakeUpstreams(behaviors=behaviors).start()
+    with tempfile.TemporaryDirectory(prefix="taskpilot-bench-") as scratch:
+        workdir = Path(scratch)
+        server = AppServer(workdir, fakes.environment(), args.workers)
+        try:
+            server.start()
+            server.wait_ready()
+            server.configure(fakes.local_url if args.local else None)
+            if args.local:
+                method, path, body = SCENARIOS["generate"]
+                SCENARIOS["generate"] = (method, path, lambda: {**body(), "ai_provider": "local"})
+            for _ in range(args.warmup):
+                method, path, body = SCENARIOS["generate"]
+                requests.request(method, server.url + path, json=body(), timeout=120)
+            before = _database_bytes(workdir)
+            endpoints = run_load(server.url, mix, args.concurrency, args.duration)
+            after = _database_bytes(workdir)
+        finally:
+            server.stop()
+            fakes.stop()
+
+    generates = endpoints.get("generate", {}).get("requests", 0)
+    report = {
+        "config": {key: str(value) for key, value in vars(args).items()},
+        "endpoints": endpoints,
+        "db_bytes_before": before,
+        "db_bytes_after": after,
+        "db_bytes_per_generate": (after - before) / generates if generates else 0.0,
+        "upstream_calls": sorted(fakes.counts.items()),
+        "local_batches": fakes.local_batches,
+    }
+    regressions = []
+    if args.import_budget_ms is not None:
+        import_ms, packages = import_profile()
+        report["import_ms"] = round(import_ms, 1)
+        print_imports(import_ms, packages, top=10)
+        if import_ms > args.import_budget_ms:
+            regressions.append(f"import time {import_ms:.1f} ms exceeds budget {args.import_budget_ms:.0f} ms")
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        regressions += compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
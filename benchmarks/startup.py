@@ -0,0 +1,101 @@
+"""Measure TaskPilot's cold-start cost.
+
+Usage::
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --import-budget-ms 400 --mode fast
+
+Reports the import time of ``backend.main`` (``python -X importtime``, best of several
+runs, minus what a bare interpreter imports anyway) with the packages that cost the most,
+then boots the API in a scratch directory and times how long it takes to answer
+``/api/health/live`` and ``/api/health/ready``. The exit status is 1 when the import time
+exceeds ``--import-budget-ms``.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _importtime_rows(code: str) -> List[Tuple[str, int, int, int]]:
+    """(module, depth, self us, cumulative us) for every import ``code`` triggers."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"'{code}' failed:\n{result.stderr}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # One space follows the bar, then two per nesting level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_profile(module: str = "backend.main", runs: int = 5) -> Tuple[float, List[Tuple[str, float]]]:
+    """Best-of-``runs`` import time of ``module`` in ms, and self time per top-level package."""
+    interpreter = {name for name, _, _, _ in _importtime_rows("pass")}
+    best: Optional[Tuple[float, List[Tuple[str, float]]]] = None
+    for _ in range(runs):
+        rows = [row for row in _importtime_rows(f"import {module}") if row[0] not in interpreter]
+        total_ms = sum(cumulative for _, depth, _, cumulative in rows if depth == 0) / 1000
+        by_package: Dict[str, float] = defaultdict(float)
+        for name, _, self_us, _ in rows:
+            by_package[name.split(".")[0]] += self_us / 1000
+        if best is None or total_ms < best[0]:
+            best = (total_ms, sorted(by_package.items(), key=lambda item: item[1], reverse=True))
+    return best
+
+
+def boot_profile(mode: str, timeout: float = 60.0) -> Dict[str, float]:
+    """Seconds from launching the API server until it is live and until it is ready."""
+    from .run import AppServer
+
+    with tempfile.TemporaryDirectory(prefix="taskpilot-boot-") as scratch:
+        server = AppServer(Path(scratch), {"TASKPILOT_STARTUP_MODE": mode})
+        try:
+            live = server.start(timeout)
+            ready = server.wait_ready(timeout)
+        finally:
+            server.stop()
+    return {"live_s": round(live, 3), "ready_s": round(ready, 3)}
+
+
+def print_imports(total_ms: float, packages: List[Tuple[str, float]], top: int) -> None:
+    print(f"Import time of backend.main: {total_ms:.1f} ms")
+    for name, self_ms in packages[:top]:
+        print(f"  {name:<28} {self_ms:>8.1f} ms")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Import measurements to take the best of")
+    parser.add_argument("--top", type=int, default=15, help="Slowest packages to list")
+    parser.add_argument("--mode", choices=("eager", "fast"), default=os.environ.get("TASKPILOT_STARTUP_MODE", "eager"))
+    parser.add_argument("--skip-boot", action="store_true", help="Only measure imports")
+    parser.add_argument("--import-budget-ms", type=float, help="Fail when the import time exceeds this")
+    args = parser.parse_args(argv)
+
+    total_ms, packages = import_profile(runs=args.runs)
+    print_imports(total_ms, packages, args.top)
+    if not args.skip_boot:
+        boot = boot_profile(args.mode)
+        print(f"Boot ({args.mode}): live after {boot['live_s']} s, ready after {boot['ready_s']} s")
+    if args.import_budget_ms is not None and total_ms > args.import_budget_ms:
+        print(f"REGRESSION import time {total_ms:.1f} ms exceeds budget {args.import_budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
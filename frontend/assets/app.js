@@ -151,9 +151,9 @@ if (providerSelect) {
   });
 }
 
-// Set default provider for generate form
+// Let the router pick provider and model unless the user pins one
 if (aiProviderSelect) {
-  aiProviderSelect.value = 'google'; // Default to Google (Gemini)
+  aiProviderSelect.value = '';
 }
 
 async function fetchJSON(url, options) {
@@ -170,10 +170,23 @@ async function fetchJSON(url, options) {
   return response.text();
 }
 
+// Dashboard widgets load memory stats together; share one in-flight request between them.
+let memoryStatsRequest = null;
+
+function fetchMemoryStats() {
+  if (!memoryStatsRequest) {
+    memoryStatsRequest = fetchJSON('/api/memory/stats').finally(() => {
+      setTimeout(() => {
+        memoryStatsRequest = null;
+      }, 2000);
+    });
+  }
+  return memoryStatsRequest;
+}
+
 async function loadStats() {
   try {
-    const stats = await fetchJSON('/api/stats');
-    const memoryStats = await fetchJSON('/api/memory/stats');
+    const [stats, memoryStats] = await Promise.all([fetchJSON('/api/stats'), fetchMemoryStats()]);
     statTotal.textContent = stats.total_posts;
     statToday.textContent = stats.today_posts;
     statAuto.textContent = stats.auto_posts;
@@ -216,8 +229,7 @@ async function loadHistory() {
 
 async function loadConversations() {
   try {
-    const response = await fetchJSON('/api/conversations');
-    const memoryStats = await fetchJSON('/api/memory/stats');
+    const [response, memoryStats] = await Promise.all([fetchJSON('/api/conversations'), fetchMemoryStats()]);
 
     conversationsList.innerHTML = '';
 
@@ -266,6 +278,13 @@ async function loadConversations() {
   }
 }
 
+function formatMetadata(metadata) {
+  const entries = Object.entries(metadata || {});
+  if (!entries.length) return '';
+  const text = entries.map(([key, value]) => `${key}: ${value}`).join(' · ');
+  return `<small class="metadata">${text}</small>`;
+}
+
 async function loadConversationDetail(conversationId) {
   try {
     const response = await fetchJSON(`/api/conversations/${conversationId}`);
@@ -282,7 +301,7 @@ async function loadConversationDetail(conversationId) {
               <small>${new Date(msg.timestamp).toLocaleString()}</small>
             </div>
             <div class="message-content">${msg.content.replace(/\n/g, '<br />')}</div>
-            ${msg.metadata ? `<small class="metadata">${msg.metadata}</small>` : ''}
+            ${formatMetadata(msg.metadata)}
           </div>
         `).join('')}
       </div>
@@ -402,6 +421,10 @@ function renderResult(post) {
   return card;
 }
 
+// One idempotency key per generation: submitting the same form again while it runs, or after
+// the connection dropped, reuses it so the server runs (and posts) it only once.
+let pendingGenerate = null;
+
 generateForm.addEventListener('submit', async (event) => {
   event.preventDefault();
   generateStatus.textContent = 'Generating…';
@@ -416,15 +439,21 @@ generateForm.addEventListener('submit', async (event) => {
     persona: generateForm.persona.value,
     length: generateForm.length.value,
     auto_post: generateForm.auto_post.checked,
-    ai_provider: generateForm.ai_provider ? generateForm.ai_provider.value : 'google'
+    ai_provider: (generateForm.ai_provider && generateForm.ai_provider.value) || null
   };
 
+  const body = JSON.stringify(payload);
+  if (!pendingGenerate || pendingGenerate.body !== body) {
+    pendingGenerate = { body, key: crypto.randomUUID() };
+  }
+
   try {
     const response = await fetchJSON('/api/generate', {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify(payload)
+      headers: { 'Content-Type': 'application/json', 'Idempotency-Key': pendingGenerate.key },
+      body
     });
+    pendingGenerate = null;
 
     response.posts.forEach((post) => {
       resultsList.appendChild(renderResult(post));
@@ -433,6 +462,10 @@ generateForm.addEventListener('submit', async (event) => {
     generateStatus.textContent = response.message;
     loadStats();
   } catch (error) {
+    // fetch throws a TypeError when no response arrived; any answered request gets a new key
+    if (!(error instanceof TypeError)) {
+      pendingGenerate = null;
+    }
     generateStatus.textContent = error.message;
     progressEl.value = 0;
   }